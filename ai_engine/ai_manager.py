@@ -1,32 +1,45 @@
 # AI Manager - handles AI operations
-import os
-from openai import OpenAI
+import asyncio
+from collections import defaultdict
+from datetime import date
+from typing import Any, Dict, List, Optional, Set
+
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
 
+from artifact_index import ArtifactIndex, artifact_index as default_artifact_index
+from client_factory import client_factory
+from prompt_encoder import encode_project
+from project_store import ProjectStore, project_store as default_project_store
+from prompt_registry import prompt_registry
+from response_cache import cached_create
+from risk_engine import SUBSCORE_WEIGHTS, overall_score, score_portfolio, score_project
+from risk_state import RiskState, apply_changes, merge_result, risk_state as default_risk_state
+
 load_dotenv()
 
 class AIManager:
-    def __init__(self):
-        api_key = os.getenv("OPENAI_API_KEY")
-        self.openai_client = OpenAI(api_key=api_key) if api_key else None
+    def __init__(self, openai_client: AsyncOpenAI = None, project_store: ProjectStore = None,
+                 risk_state: RiskState = None, artifact_index: ArtifactIndex = None):
+        # Every module shares the factory's pooled client
+        self.openai_client = openai_client or client_factory.get_client()
         
-        # Database connection for fetching project data
-        self.db_config = {
-            'host': os.getenv('DB_HOST', 'localhost'),
-            'port': os.getenv('DB_PORT', '5432'),
-            'database': os.getenv('DB_NAME', 'paxipm'),
-            'user': os.getenv('DB_USER'),
-            'password': os.getenv('DB_PASSWORD')
-        }
+        # Pooled access to the backend's project database
+        self.project_store = project_store or default_project_store
+        
+        # Last scored inputs/results per project; rescoring a project is serialized
+        self.risk_state = risk_state or default_risk_state
+        self._risk_locks: Dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+        
+        # Past validated artifacts, shown as examples to similar requests (None when disabled)
+        self.artifact_index = artifact_index or default_artifact_index
     
     async def generate_charter(self, projectName: str, description: str, client: str = None):
         """Generate project charter using AI"""
         try:
-            # Load prompt template
-            prompt_template = self._load_prompt_template('charter')
-            
-            # Format prompt
-            prompt = prompt_template.format(
+            # Render charter prompt
+            prompt = prompt_registry.render(
+                'charter',
                 project_title=projectName,
                 description=description,
                 client=client or "Internal"
@@ -36,7 +49,9 @@ class AIManager:
             if not self.openai_client:
                 return f"AI-generated charter for {projectName}\n\n{description}"
             
-            response = self.openai_client.chat.completions.create(
+            response = await cached_create(
+                self.openai_client,
+                "charter",
                 model="gpt-4",
                 messages=[{"role": "user", "content": prompt}]
             )
@@ -45,219 +60,190 @@ class AIManager:
             print(f"Error generating charter: {e}")
             raise
     
-    async def calculate_risk_score(self, project_id: int):
-        """Calculate risk score for a project"""
+    async def calculate_risk_score(self, project_id: int, include_summary: bool = False,
+                                   materiality: Optional[float] = None):
+        """Score a stored project locally; the LLM only writes the optional narrative"""
         try:
-            # Fetch project data from database
-            project_data = self._fetch_project_data(project_id)
-            
-            # Load risk analysis prompt
-            prompt_template = self._load_prompt_template('risk')
-            
-            # Format prompt with project data
-            prompt = prompt_template.format(
-                project_title=project_data.get('title', ''),
-                description=project_data.get('description', ''),
-                tasks_count=project_data.get('tasks_count', 0),
-                overdue_tasks=project_data.get('overdue_tasks', 0),
-                avg_progress=project_data.get('avg_progress', 0)
-            )
-            
-            # Generate risk analysis
-            if self.llm:
-                response = self.llm.invoke([HumanMessage(content=prompt)])
-                response_text = response.content
-            else:
-                # Fallback: use OpenAI client directly
-                response = self.openai_client.chat.completions.create(
-                    model="gpt-4",
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                response_text = response.choices[0].message.content
-            
-            # Parse risk score from response (0-100)
-            risk_score = self._parse_risk_score(response_text)
-            
-            return risk_score
+            async with self._risk_locks[project_id]:
+                previous = await asyncio.to_thread(self.risk_state.get, project_id)
+                return await self._score_stored(project_id, previous, include_summary, materiality)
         except Exception as e:
             print(f"Error calculating risk score: {e}")
             raise
     
-    def _load_prompt_template(self, template_name: str) -> str:
-        """Load prompt template from file"""
-        import os
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        template_path = os.path.join(base_dir, "prompts", f"{template_name}.txt")
+    async def apply_risk_changes(self, project_id: int, events: List[Dict[str, Any]],
+                                 include_summary: bool = False, materiality: Optional[float] = None):
+        """Rescore a project from change events, recomputing only the subscores they touch.
+        
+        Events are applied to the inputs of the project's last scoring. A
+        project without one is loaded and scored in full (the database is
+        expected to hold the changes already).
+        """
         try:
-            with open(template_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except FileNotFoundError:
-            # Return default template if file doesn't exist
-            return self._get_default_template(template_name)
+            async with self._risk_locks[project_id]:
+                previous = await asyncio.to_thread(self.risk_state.get, project_id)
+                if previous is None:
+                    result = await self._score_stored(project_id, None, include_summary, materiality, len(events))
+                    result["recomputed"] = sorted(SUBSCORE_WEIGHTS)
+                    return result
+                
+                inputs = previous["inputs"]
+                recomputed = apply_changes(inputs, events)
+                if previous["as_of"] != date.today().isoformat():
+                    # Overdue tasks, missed milestones and expected progress move with the date
+                    recomputed.add("schedule")
+                result = previous["result"]
+                if recomputed:
+                    result = merge_result(result, score_portfolio([inputs], subscores=recomputed)[0])
+                    result["risk_score"] = overall_score(result["subscores"])
+                return await self._settle_risk(
+                    project_id, inputs, result, previous, include_summary, materiality, len(events), recomputed
+                )
+        except Exception as e:
+            print(f"Error applying risk changes: {e}")
+            raise
     
-    def _get_default_template(self, template_name: str) -> str:
-        """Get default prompt template"""
-        if template_name == 'charter':
-            return """Generate a comprehensive project charter for the following project:
-
-Project Title: {project_title}
-Description: {description}
-Client: {client}
-
-Include:
-1. Project Overview
-2. Objectives and Goals
-3. Scope and Deliverables
-4. Timeline
-5. Key Stakeholders
-6. Success Criteria"""
-        
-        elif template_name == 'risk':
-            return """Analyze the risk level for this project and provide a risk score (0-100):
-
-Project Title: {project_title}
-Description: {description}
-Total Tasks: {tasks_count}
-Overdue Tasks: {overdue_tasks}
-Average Progress: {avg_progress}%
-
-Provide only a single number between 0-100 representing the risk score."""
-        
-        elif template_name == 'project_setup_prompt':
-            return """Generate a comprehensive project setup document for the following project:
-
-Project: {project}
-Progress: {progress}%
-
-Include:
-1. Project Overview (description, objectives, outcomes)
-2. Work Breakdown Structure (phases, deliverables, tasks)
-3. Timeline (start date, milestones, completion date)
-4. Resource Allocation (team members, skills, effort)
-5. Risk Assessment (risks, mitigation, contingencies)
-
-Return structured JSON format."""
-        
-        elif template_name == 'risk_analysis_prompt':
-            return """You are an expert PMP, ITIL, and Agile project manager.
-
-Given the following project input:
-Project Description: {project_description}
-Duration: {duration}
-Team Size: {team_size}
-
-Generate:
-1. Project Charter (executive summary, objectives, success criteria, stakeholders)
-2. Work Breakdown Structure (phases, deliverables, tasks with assignments)
-3. Key Risks (risk identification, assessment, mitigation strategies)
-
-Return results in structured JSON format."""
-        
-        elif template_name == 'reporting_prompt':
-            return """You are an expert project manager analyzing project progress data.
-
-Analyze the following project progress data:
-<Progress Data>
-{progress_data}
-</Progress Data>
-
-Based on this data:
-1. Identify risks (schedule, resource, technical, budget, quality, stakeholder)
-2. Rate overall risk score (0-100): 0-20 Very Low, 21-40 Low, 41-60 Medium, 61-80 High, 81-100 Critical
-3. Provide risk summary with key risk areas and project health
-4. Generate actionable recommendations (immediate, short-term, medium-term, strategic)
-
-Return JSON with risk_score, risk_summary, and recommendations."""
-        
-        elif template_name == 'pmo_report_prompt':
-            return """You are a professional PMO analyst generating a comprehensive project status report.
-
-Analyze the provided project information and generate a professional PMO status report.
-
-Project Information:
-{project_data}
-
-Generate a comprehensive status report that includes:
-1. Executive Summary (status, health, key highlight)
-2. Achievements & Milestones (completed milestones, deliverables, accomplishments)
-3. Blockers & Challenges (active blockers, constraints, challenges)
-4. Next Actions (immediate, short-term, decisions, resources, escalations)
-5. Metrics & KPIs (schedule, budget, scope, quality, resources)
-6. Risk Update (new risks, status changes, mitigation)
-
-Return in format:
----PLAIN TEXT REPORT---
-[Professional formatted text report]
----END PLAIN TEXT REPORT---
-
----JSON SUMMARY---
-[Structured JSON data]
----END JSON SUMMARY---"""
+    async def _score_stored(self, project_id: int, previous: Optional[dict], include_summary: bool,
+                            materiality: Optional[float], events: int = 0):
+        """Full scoring from the database"""
+        project_data = await self._fetch_project_data(project_id)
+        if 'title' not in project_data:
+            # Scoring no data would report a neutral 50 over the stored score
+            raise LookupError(f"No data for project {project_id}")
+        inputs = {"id": project_id, **project_data}
+        result = score_project(inputs)
+        return await self._settle_risk(project_id, inputs, result, previous, include_summary, materiality, events)
+    
+    async def _settle_risk(self, project_id: int, inputs: dict, result: dict, previous: Optional[dict],
+                           include_summary: bool, materiality: Optional[float], events: int,
+                           recomputed: Optional[Set[str]] = None):
+        """Attach the narrative (rewritten only on a material move), persist the state, count the run"""
+        summary = previous["summary"] if previous else None
+        summary_result = previous["summary_result"] if previous else None
+        outcome = None
+        response = dict(result)
+        if include_summary and self.openai_client:
+            if summary and not self.risk_state.is_material(summary_result, result, materiality):
+                outcome = "reused"
+            else:
+                summary = await self.summarize_risk(inputs.get('title', ''), result)
+                summary_result = {"risk_score": result["risk_score"], "subscores": result["subscores"]}
+                outcome = "generated"
+            response["summary"] = summary
+            response["summary_reused"] = outcome == "reused"
         
-        return ""
+        await asyncio.to_thread(self.risk_state.put, project_id, {
+            "inputs": inputs,
+            "result": result,
+            "as_of": date.today().isoformat(),
+            "summary": summary,
+            "summary_result": summary_result
+        })
+        self.risk_state.record(events, recomputed, outcome)
+        if recomputed is not None:
+            response["recomputed"] = sorted(recomputed)
+        return response
+    
+    async def summarize_risk(self, project_title: str, score: dict) -> str:
+        """Narrative explanation of a computed risk score"""
+        prompt = prompt_registry.render(
+            'risk_narrative',
+            project_title=project_title,
+            risk_score=score['risk_score'],
+            subscores=encode_project(score['subscores']),
+            signals=encode_project(score['signals'])
+        )
+        response = await cached_create(
+            self.openai_client,
+            "calculate-risk",
+            model="gpt-4",
+            messages=[{"role": "user", "content": prompt}]
+        )
+        return response.choices[0].message.content
     
-    def _fetch_project_data(self, project_id: int) -> dict:
-        """Fetch project data from database"""
+    async def _fetch_project_data(self, project_id: int) -> dict:
+        """Fetch the project row with its tasks, milestones and resources (one pooled query)"""
         try:
-            conn = psycopg2.connect(**self.db_config)
-            cursor = conn.cursor()
-            
-            # Fetch project
-            cursor.execute(
-                "SELECT title, description FROM projects WHERE id = %s",
-                (project_id,)
-            )
-            project = cursor.fetchone()
-            
-            # Fetch tasks stats
-            cursor.execute(
-                """SELECT 
-                    COUNT(*) as tasks_count,
-                    COUNT(CASE WHEN due_date < CURRENT_DATE AND progress < 100 THEN 1 END) as overdue_tasks,
-                    AVG(progress) as avg_progress
-                   FROM tasks WHERE project_id = %s""",
-                (project_id,)
-            )
-            stats = cursor.fetchone()
-            
-            cursor.close()
-            conn.close()
-            
-            return {
-                'title': project[0] if project else '',
-                'description': project[1] if project else '',
-                'tasks_count': stats[0] if stats else 0,
-                'overdue_tasks': stats[1] if stats else 0,
-                'avg_progress': round(stats[2], 1) if stats and stats[2] else 0
-            }
+            return await self.project_store.fetch_project(project_id)
         except Exception as e:
             print(f"Error fetching project data: {e}")
             return {}
     
+    # Past artifacts are looked up by, and recorded under, a short text of the
+    # request; these build it per kind
+    
+    @staticmethod
+    def charter_query(project_name: str, description: str, client: str = None) -> str:
+        return f"{project_name}: {description}\nClient: {client or 'Not specified'}"
+    
+    @staticmethod
+    def risk_analysis_query(project_description: str, duration: str, team_size: int) -> str:
+        return f"{project_description}\nDuration: {duration}; team size: {team_size}"
+    
+    async def with_examples(self, kind: str, query: str, params: dict) -> dict:
+        """Completion params with examples of similar past artifacts, when the index has any"""
+        if not self.artifact_index:
+            return params
+        try:
+            return await asyncio.to_thread(self.artifact_index.with_examples, kind, query, params)
+        except Exception as e:
+            print(f"Error retrieving {kind} examples: {e}")
+            return params
+    
+    async def record_artifact(self, kind: str, query: str, content: Any):
+        """Index a validated artifact so later similar requests get it as an example"""
+        if not self.artifact_index:
+            return
+        try:
+            await asyncio.to_thread(self.artifact_index.add, kind, query, content)
+        except Exception as e:
+            print(f"Error indexing {kind} artifact: {e}")
+    
+    # Completion parameters for the structured generators, shared with the
+    # streaming endpoints so both hit the same response cache entries
+    
+    async def project_setup_params(self, project: str, progress: int) -> dict:
+        prompt = prompt_registry.render('project_setup_prompt', project=project, progress=progress)
+        return await self.with_examples("project-setup", project, {
+            "model": "gpt-4",
+            "messages": [{"role": "user", "content": prompt}],
+            "response_format": {"type": "json_object"}  # Force JSON response
+        })
+    
+    async def risk_analysis_params(self, project_description: str, duration: str, team_size: int) -> dict:
+        prompt = prompt_registry.render(
+            'risk_analysis_prompt',
+            project_description=project_description,
+            duration=duration,
+            team_size=team_size
+        )
+        return await self.with_examples(
+            "risk-analysis",
+            self.risk_analysis_query(project_description, duration, team_size),
+            {
+                "model": "gpt-4",
+                "messages": [{"role": "user", "content": prompt}],
+                "response_format": {"type": "json_object"}  # Force JSON response
+            }
+        )
+    
+    def report_params(self, progress_data: str) -> dict:
+        prompt = prompt_registry.render('reporting_prompt', progress_data=progress_data)
+        return {
+            "model": "gpt-4",
+            "messages": [{"role": "user", "content": prompt}],
+            "response_format": {"type": "json_object"}  # Force JSON response
+        }
+    
     async def generate_project_setup(self, project: str, progress: int):
         """Generate project setup using structured prompt"""
         try:
-            # Load project setup prompt template
-            prompt_template = self._load_prompt_template('project_setup_prompt')
-            
-            # Format prompt
-            prompt = prompt_template.format(
-                project=project,
-                progress=progress
+            response = await cached_create(
+                self.openai_client,
+                "project-setup",
+                **await self.project_setup_params(project, progress)
             )
-            
-            # Generate using OpenAI
-            if self.llm:
-                response = self.llm.invoke([HumanMessage(content=prompt)])
-                return response.content
-            else:
-                # Fallback: use OpenAI client directly
-                response = self.openai_client.chat.completions.create(
-                    model="gpt-4",
-                    messages=[{"role": "user", "content": prompt}],
-                    response_format={"type": "json_object"}  # Force JSON response
-                )
-                return response.choices[0].message.content
+            return response.choices[0].message.content
         except Exception as e:
             print(f"Error generating project setup: {e}")
             raise
@@ -265,28 +251,12 @@ Return in format:
     async def generate_risk_analysis(self, project_description: str, duration: str, team_size: int):
         """Generate risk analysis with Charter, WBS, and Risks"""
         try:
-            # Load risk analysis prompt template
-            prompt_template = self._load_prompt_template('risk_analysis_prompt')
-            
-            # Format prompt
-            prompt = prompt_template.format(
-                project_description=project_description,
-                duration=duration,
-                team_size=team_size
+            response = await cached_create(
+                self.openai_client,
+                "risk-analysis",
+                **await self.risk_analysis_params(project_description, duration, team_size)
             )
-            
-            # Generate using OpenAI
-            if self.llm:
-                response = self.llm.invoke([HumanMessage(content=prompt)])
-                return response.content
-            else:
-                # Fallback: use OpenAI client directly
-                response = self.openai_client.chat.completions.create(
-                    model="gpt-4",
-                    messages=[{"role": "user", "content": prompt}],
-                    response_format={"type": "json_object"}  # Force JSON response
-                )
-                return response.choices[0].message.content
+            return response.choices[0].message.content
         except Exception as e:
             print(f"Error generating risk analysis: {e}")
             raise
@@ -294,26 +264,12 @@ Return in format:
     async def generate_report(self, progress_data: str):
         """Generate risk report from progress data"""
         try:
-            # Load reporting prompt template
-            prompt_template = self._load_prompt_template('reporting_prompt')
-            
-            # Format prompt
-            prompt = prompt_template.format(
-                progress_data=progress_data
+            response = await cached_create(
+                self.openai_client,
+                "reporting",
+                **self.report_params(progress_data)
             )
-            
-            # Generate using OpenAI
-            if self.llm:
-                response = self.llm.invoke([HumanMessage(content=prompt)])
-                return response.content
-            else:
-                # Fallback: use OpenAI client directly
-                response = self.openai_client.chat.completions.create(
-                    model="gpt-4",
-                    messages=[{"role": "user", "content": prompt}],
-                    response_format={"type": "json_object"}  # Force JSON response
-                )
-                return response.choices[0].message.content
+            return response.choices[0].message.content
         except Exception as e:
             print(f"Error generating report: {e}")
             raise
@@ -321,39 +277,20 @@ Return in format:
     async def generate_pmo_report(self, project_data: str):
         """Generate professional PMO status report with plain text and JSON"""
         try:
-            # Load PMO report prompt template
-            prompt_template = self._load_prompt_template('pmo_report_prompt')
-            
-            # Format prompt
-            prompt = prompt_template.format(
+            # Render PMO report prompt
+            prompt = prompt_registry.render(
+                'pmo_report_prompt',
                 project_data=project_data
             )
             
             # Generate using OpenAI (note: we can't force JSON format here as we need plain text too)
-            if self.llm:
-                response = self.llm.invoke([HumanMessage(content=prompt)])
-                return response.content
-            else:
-                # Fallback: use OpenAI client directly
-                response = self.openai_client.chat.completions.create(
-                    model="gpt-4",
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                return response.choices[0].message.content
+            response = await cached_create(
+                self.openai_client,
+                "pmo-report",
+                model="gpt-4",
+                messages=[{"role": "user", "content": prompt}]
+            )
+            return response.choices[0].message.content
         except Exception as e:
             print(f"Error generating PMO report: {e}")
             raise
-    
-    def _parse_risk_score(self, response: str) -> int:
-        """Parse risk score from AI response"""
-        try:
-            # Extract number from response
-            import re
-            numbers = re.findall(r'\d+', response)
-            if numbers:
-                score = int(numbers[0])
-                return max(0, min(100, score))  # Clamp between 0-100
-            return 50  # Default medium risk
-        except:
-            return 50
-
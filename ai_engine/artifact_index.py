@@ -0,0 +1,399 @@
+# Artifact index - hybrid vector + BM25 retrieval over past validated artifacts, for few-shot prompts
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from semantic_cache import load_embedder, tokenize
+
+try:
+    import fcntl
+except ImportError:  # No cross-process locking (Windows): run a single worker
+    fcntl = None
+
+load_dotenv()
+
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "artifacts")
+
+# BM25 parameters (the usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def _shrink(value: Any, max_items: int, max_chars: int) -> Any:
+    """Same structure with lists cut to `max_items` and strings to `max_chars`"""
+    if isinstance(value, dict):
+        return {k: _shrink(v, max_items, max_chars) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_shrink(v, max_items, max_chars) for v in value[:max_items]]
+    if isinstance(value, str) and len(value) > max_chars:
+        return value[:max_chars].rstrip() + "..."
+    return value
+
+
+def compact_example(content: Any, max_chars: int) -> str:
+    """An artifact cut down to an example of its shape and tone within `max_chars`.
+
+    JSON artifacts keep every key but only the first items of each list
+    (fewer as needed to fit), so the example stays valid JSON; text is cut
+    at a line boundary.
+    """
+    if isinstance(content, (dict, list)):
+        for max_items in (3, 2, 1):
+            text = json.dumps(_shrink(content, max_items, 160), separators=(",", ":"))
+            if len(text) <= max_chars:
+                return text
+        return text
+    text = str(content)
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind("\n", 0, max_chars)
+    return text[:cut if cut > max_chars // 2 else max_chars].rstrip() + "\n..."
+
+
+class ArtifactIndex:
+    """Append-only index of generated artifacts, searchable by meaning and by keyword.
+
+    Files under `directory`:
+      embeddings.f32   float32 matrix (dim x capacity), memory-mapped, one
+                       column per artifact; stored dimension-major so a search
+                       reads only the rows of the query's non-zero dimensions
+                       (a few dozen for the hashing embedder). The file is
+                       rewritten at double capacity when full
+      artifacts.jsonl  one line per artifact: kind, query (the request it
+                       answered) and content
+      index.json       embedder name, dimension and capacity
+      index.lock       exclusive lock held while writing
+    Columns are written before their line, so every line has its vector. BM25
+    postings live in memory and are rebuilt from artifacts.jsonl on start;
+    a different embedder re-embeds the stored queries.
+
+    Every worker process on the host can share the directory: writers hold
+    index.lock and first index the lines other workers appended, so the next
+    column (the line number) is the same in every process. Searches pick up
+    new lines the same way.
+
+    A search scores the request against past requests of the same kind:
+    `alpha` * cosine similarity + (1 - `alpha`) * BM25 normalized to the
+    best match.
+    """
+
+    def __init__(
+        self,
+        directory: str = DEFAULT_INDEX_DIR,
+        embedder=None,
+        alpha: float = 0.6,
+        fewshot_k: int = 2,
+        fewshot_max_chars: int = 3000,
+        min_similarity: float = 0.3,
+        fewshot_model: Optional[str] = None
+    ):
+        self.directory = directory
+        self.embedder = embedder or load_embedder()
+        self.alpha = alpha
+        self.fewshot_k = fewshot_k
+        self.fewshot_max_chars = fewshot_max_chars
+        self.min_similarity = min_similarity
+        self.fewshot_model = fewshot_model
+
+        self._lock = threading.Lock()
+        self._stats = {
+            "added": 0,
+            "duplicates": 0,
+            "searches": 0,
+            "search_ms_total": 0.0,
+            "injected": 0,
+            "fewshot_model_calls": 0
+        }
+        self._records: List[Dict[str, Any]] = []
+        self._kinds: List[str] = []
+        self._seen: set = set()
+        self._postings: Dict[str, Dict[int, int]] = {}
+        # Postings as (docs, tfs) arrays for scoring, dropped when a term gets a new doc
+        self._posting_arrays: Dict[str, tuple] = {}
+        self._norm: Optional[np.ndarray] = None
+        # Per-row columns, sized with the embedding matrix
+        self._kind_codes = np.zeros(0, dtype=np.int16)
+        self._lengths = np.zeros(0)
+        self._load()
+
+    @classmethod
+    def from_env(cls) -> Optional["ArtifactIndex"]:
+        """Build the index from ARTIFACT_INDEX_* environment variables (None when disabled)"""
+        if os.getenv("ARTIFACT_INDEX_ENABLED", "true").lower() in ("0", "false", "no"):
+            return None
+        return cls(
+            directory=os.getenv("ARTIFACT_INDEX_DIR") or DEFAULT_INDEX_DIR,
+            embedder=load_embedder(os.getenv("ARTIFACT_INDEX_MODEL")),
+            alpha=float(os.getenv("ARTIFACT_INDEX_ALPHA", "0.6")),
+            fewshot_k=int(os.getenv("ARTIFACT_FEWSHOT_K", "2")),
+            fewshot_max_chars=int(os.getenv("ARTIFACT_FEWSHOT_MAX_CHARS", "3000")),
+            min_similarity=float(os.getenv("ARTIFACT_FEWSHOT_MIN_SIMILARITY", "0.3")),
+            fewshot_model=os.getenv("ARTIFACT_FEWSHOT_MODEL") or None
+        )
+
+    # --- storage ---
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock on the directory, held across processes"""
+        with open(self._path("index.lock"), "a") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _open_matrix(self, capacity: int, mode: str, name: str = "embeddings.f32"):
+        self.capacity = capacity
+        self._matrix = np.memmap(self._path(name), dtype=np.float32, mode=mode,
+                                 shape=(self.embedder.dim, capacity))
+        self._kind_codes = np.concatenate([self._kind_codes, np.zeros(capacity - len(self._kind_codes), dtype=np.int16)])
+        self._lengths = np.concatenate([self._lengths, np.zeros(capacity - len(self._lengths))])
+
+    def _write_meta(self):
+        with open(self._path("index.json"), "w") as f:
+            json.dump({"embedder": self.embedder.name, "dim": self.embedder.dim, "capacity": self.capacity}, f)
+
+    def _load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with self._file_lock():
+            self._load_locked()
+
+    def _load_locked(self):
+        records = []
+        offset = 0
+        if os.path.exists(self._path("artifacts.jsonl")):
+            with open(self._path("artifacts.jsonl"), "r+b") as f:
+                for line in f:
+                    try:
+                        records.append((json.loads(line), offset))
+                    except json.JSONDecodeError:
+                        break
+                    offset += len(line)
+                # Drop a line cut short by a crash mid-write so appends stay readable
+                f.truncate(offset)
+        self._size = offset
+        meta = {}
+        if os.path.exists(self._path("index.json")):
+            with open(self._path("index.json")) as f:
+                meta = json.load(f)
+
+        same_embedder = meta.get("embedder") == self.embedder.name and meta.get("dim") == self.embedder.dim
+        if same_embedder and os.path.exists(self._path("embeddings.f32")):
+            self._open_matrix(meta["capacity"], "r+")
+        else:
+            self._open_matrix(max(1024, 1 << max(0, len(records) - 1).bit_length()), "w+")
+            for doc, (record, _) in enumerate(records):
+                self._write_vector(doc, self.embedder.embed(record["query"]))
+            self._matrix.flush()
+            self._write_meta()
+        for record, offset in records:
+            self._remember(record, offset)
+
+    def _sync(self):
+        """Index the lines other processes appended since the last read (under the file lock)"""
+        path = self._path("artifacts.jsonl")
+        if not os.path.exists(path) or os.path.getsize(path) <= self._size:
+            return
+        with open(self._path("index.json")) as f:
+            capacity = json.load(f)["capacity"]
+        if capacity != self.capacity:
+            # Another process grew the matrix into a new file
+            self._open_matrix(capacity, "r+")
+        with open(path, "r+b") as f:
+            f.seek(self._size)
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Left by a writer that crashed mid-line; nobody is writing now
+                    f.truncate(self._size)
+                    break
+                self._remember(record, self._size)
+                self._size += len(line)
+
+    def _refresh(self):
+        """Pick up artifacts added by other processes (under self._lock)"""
+        path = self._path("artifacts.jsonl")
+        if os.path.exists(path) and os.path.getsize(path) > self._size:
+            with self._file_lock():
+                self._sync()
+
+    def _write_vector(self, doc: int, vector: np.ndarray):
+        # The file starts zeroed, so only the non-zero dimensions need writing
+        dims = np.flatnonzero(vector)
+        self._matrix[dims, doc] = vector[dims]
+
+    def _grow(self):
+        old, count = self._matrix, len(self._records)
+        self._open_matrix(self.capacity * 2, "w+", "embeddings.f32.tmp")
+        self._matrix[:, :count] = old[:, :count]
+        self._matrix.flush()
+        del old
+        os.replace(self._path("embeddings.f32.tmp"), self._path("embeddings.f32"))
+        self._write_meta()
+
+    def _remember(self, record: Dict[str, Any], offset: int):
+        """Index a stored record in memory; its content stays on disk at `offset`"""
+        doc = len(self._records)
+        self._records.append({"kind": record["kind"], "query": record["query"], "offset": offset})
+        if record["kind"] not in self._kinds:
+            self._kinds.append(record["kind"])
+        self._kind_codes[doc] = self._kinds.index(record["kind"])
+        self._seen.add((record["kind"], record["query"]))
+        terms = tokenize(record["query"] + " " + record.get("keywords", ""))
+        for term in terms:
+            postings = self._postings.setdefault(term, {})
+            postings[doc] = postings.get(doc, 0) + 1
+            self._posting_arrays.pop(term, None)
+        self._lengths[doc] = len(terms)
+
+    def add(self, kind: str, query: str, content: Any, keywords: str = "") -> bool:
+        """Index a validated artifact generated for `query`; False for a repeat of a stored request"""
+        record = {"kind": kind, "query": query, "content": content, "keywords": keywords, "created_at": time.time()}
+        vector = self.embedder.embed(query)
+        line = (json.dumps(record, default=str) + "\n").encode()
+        with self._lock, self._file_lock():
+            self._sync()
+            if (kind, query) in self._seen:
+                self._stats["duplicates"] += 1
+                return False
+            doc = len(self._records)
+            if doc >= self.capacity:
+                self._grow()
+            # No msync per artifact: the pages are in the OS cache, which other
+            # and restarted processes read, and artifacts.jsonl is not fsynced either
+            self._write_vector(doc, vector)
+            with open(self._path("artifacts.jsonl"), "ab") as f:
+                f.write(line)
+            self._remember(record, self._size)
+            self._size += len(line)
+            self._stats["added"] += 1
+        return True
+
+    # --- retrieval ---
+
+    def _read(self, offset: int) -> Dict[str, Any]:
+        with open(self._path("artifacts.jsonl"), "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def _similarity(self, vector: np.ndarray, n: int) -> np.ndarray:
+        """Cosine similarity to the first `n` artifacts, summed over the query's non-zero dimensions"""
+        matrix = self._matrix.view(np.ndarray)
+        similarity = np.zeros(n, dtype=np.float32)
+        term = np.empty(n, dtype=np.float32)
+        for dim in np.flatnonzero(vector):
+            np.multiply(matrix[dim, :n], vector[dim], out=term)
+            similarity += term
+        return similarity
+
+    def _bm25(self, terms: List[str], n: int) -> np.ndarray:
+        scores = np.zeros(n, dtype=np.float32)
+        if self._norm is None or len(self._norm) != n:
+            lengths = self._lengths[:n]
+            self._norm = (BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(lengths.mean(), 1.0))).astype(np.float32)
+        norm = self._norm
+        for term in set(terms):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            if term not in self._posting_arrays:
+                self._posting_arrays[term] = (
+                    np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)),
+                    np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+                )
+            docs, tf = self._posting_arrays[term]
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + norm[docs])
+        return scores
+
+    def search(self, query: str, kind: Optional[str] = None, k: int = 3,
+               min_similarity: float = 0.0) -> List[Dict[str, Any]]:
+        """Top-k stored artifacts for `query` (of `kind` if given), best first.
+
+        Each hit carries the record plus score, similarity (cosine of the
+        requests) and bm25. Artifacts stored for this exact query are skipped
+        so a repeated request is not shown its own earlier answer.
+        """
+        start = time.perf_counter()
+        vector = self.embedder.embed(query)
+        with self._lock:
+            self._refresh()
+            n = len(self._records)
+            hits = []
+            if n:
+                similarity = self._similarity(vector, n)
+                bm25 = self._bm25(tokenize(query), n)
+                eligible = similarity >= min_similarity
+                if kind is not None:
+                    eligible &= self._kind_codes[:n] == (self._kinds.index(kind) if kind in self._kinds else -1)
+                best_bm25 = np.max(bm25, where=eligible, initial=0.0)
+                score = similarity * self.alpha
+                if best_bm25 > 0:
+                    score += bm25 * ((1 - self.alpha) / best_bm25)
+                score[~eligible] = -np.inf
+                top = np.argpartition(-score, min(k * 2, n - 1))[:k * 2] if n > k * 2 else np.arange(n)
+                for doc in top[np.argsort(-score[top])]:
+                    if score[doc] == -np.inf or len(hits) == k:
+                        break
+                    if self._records[doc]["query"] == query:
+                        continue
+                    record = self._read(self._records[doc]["offset"])
+                    hits.append({
+                        **record,
+                        "score": round(float(score[doc]), 4),
+                        "similarity": round(float(similarity[doc]), 4),
+                        "bm25": round(float(bm25[doc]), 3)
+                    })
+            self._stats["searches"] += 1
+            self._stats["search_ms_total"] += (time.perf_counter() - start) * 1000
+        return hits
+
+    def with_examples(self, kind: str, query: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Completion params with compact examples of similar past `kind` artifacts before the user prompt.
+
+        When examples are found and ARTIFACT_FEWSHOT_MODEL is set, that
+        (cheaper) model is used instead of the requested one.
+        """
+        examples = self.search(query, kind, self.fewshot_k, self.min_similarity)
+        if not examples:
+            return params
+        budget = self.fewshot_max_chars // len(examples)
+        block = [
+            "Validated outputs for similar past requests, for reference. Match their structure "
+            "and level of detail; write content for the new request only."
+        ]
+        for number, example in enumerate(examples, 1):
+            block.append(f"\nExample {number} - request: {compact_example(example['query'], 300)}")
+            block.append(compact_example(example["content"], budget))
+        messages = list(params["messages"])
+        messages.insert(len(messages) - 1, {"role": "system", "content": "\n".join(block)})
+        with self._lock:
+            self._stats["injected"] += 1
+            if self.fewshot_model:
+                self._stats["fewshot_model_calls"] += 1
+        return {**params, "messages": messages, "model": self.fewshot_model or params["model"]}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            codes = self._kind_codes[:len(self._records)]
+            stats["artifacts"] = {kind: int((codes == code).sum()) for code, kind in enumerate(self._kinds)}
+            stats["capacity"] = self.capacity
+        searches = stats["searches"]
+        stats["avg_search_ms"] = round(stats.pop("search_ms_total") / searches, 3) if searches else 0.0
+        stats["embedder"] = self.embedder.name
+        return stats
+
+
+# Global index instance (None when ARTIFACT_INDEX_ENABLED=false)
+artifact_index = ArtifactIndex.from_env()
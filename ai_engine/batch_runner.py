@@ -0,0 +1,78 @@
+# Batch runner - fans a list of requests out with bounded concurrency and streams NDJSON results
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List
+
+from logger import logger
+
+
+def ndjson_line(data: Dict[str, Any]) -> str:
+    """One NDJSON record"""
+    return json.dumps(data, default=str) + "\n"
+
+
+async def stream_batch(
+    endpoint: str,
+    items: List[Any],
+    key: Callable[[Any], str],
+    work: Callable[[Any], Awaitable[Any]],
+    concurrency: int,
+    describe: Callable[[Any], Dict[str, Any]] = lambda item: {}
+) -> AsyncIterator[str]:
+    """Yield one NDJSON line per item as its result arrives, then a summary line.
+
+    Items with the same `key` are computed once and reported for every index
+    that asked for them. A failing item produces an `error` line; the rest of
+    the batch keeps going. Pending work is cancelled if the client goes away.
+    """
+    start = time.perf_counter()
+    groups: Dict[str, List[int]] = {}
+    for index, item in enumerate(items):
+        groups.setdefault(key(item), []).append(index)
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    done: asyncio.Queue = asyncio.Queue()
+
+    async def run(group_key: str, indices: List[int]):
+        async with semaphore:
+            item_start = time.perf_counter()
+            try:
+                result = await work(items[indices[0]])
+                outcome = {"status": "ok", "result": result}
+            except Exception as e:
+                logger.log_error(endpoint, e, {"batch_indices": indices})
+                outcome = {"status": "error", "error": str(e) or type(e).__name__}
+            outcome["elapsed_ms"] = round((time.perf_counter() - item_start) * 1000, 2)
+        await done.put((indices, outcome))
+
+    tasks = [asyncio.ensure_future(run(k, indices)) for k, indices in groups.items()]
+    succeeded = failed = 0
+    try:
+        for _ in range(len(tasks)):
+            indices, outcome = await done.get()
+            for position, index in enumerate(indices):
+                if outcome["status"] == "ok":
+                    succeeded += 1
+                else:
+                    failed += 1
+                yield ndjson_line({
+                    "index": index,
+                    **describe(items[index]),
+                    **outcome,
+                    "deduplicated": position > 0
+                })
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+    logger.log_timing(endpoint, {"batch_items": len(items), "batch_unique": len(groups), "batch_ms": elapsed_ms})
+    yield ndjson_line({
+        "done": True,
+        "total": len(items),
+        "unique": len(groups),
+        "succeeded": succeeded,
+        "failed": failed,
+        "elapsed_ms": elapsed_ms
+    })
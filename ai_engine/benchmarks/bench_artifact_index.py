@@ -0,0 +1,96 @@
+# Artifact index benchmark - insert rate, hybrid top-k latency and reopen time
+#
+# Usage (from ai_engine/):
+#   python -m benchmarks.bench_artifact_index [--artifacts 10000 50000] [--queries 500] [--k 3]
+#
+# Inserts synthetic risk analyses into a fresh index directory, then runs
+# hybrid (vector + BM25) top-k searches for new project descriptions and
+# reports per-search latency (embedding included), how long reopening the
+# index takes (memory-mapped embeddings, BM25 rebuilt from artifacts.jsonl)
+# and the size of each file.
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from artifact_index import ArtifactIndex
+
+DOMAINS = [
+    "ERP rollout", "cloud migration", "data warehouse", "CRM implementation", "mobile banking app",
+    "data center consolidation", "network refresh", "HR system replacement", "e-commerce replatform",
+    "cybersecurity program", "BI dashboards", "ITSM tooling", "warehouse automation", "payroll outsourcing",
+]
+CLIENTS = ["a manufacturer", "a regional bank", "a hospital group", "a retailer", "a city council",
+           "an insurer", "a logistics company", "a university", "a telecom operator", "a utility"]
+CONSTRAINTS = ["under a fixed budget", "with offshore vendors", "in a regulated industry", "with a hard go-live",
+               "across three countries", "with legacy integrations", "during a merger", "with a small team"]
+RISKS = ["Scope creep", "Vendor delay", "Data quality", "Key person dependency", "Integration defects",
+         "Budget overrun", "Low user adoption", "Security findings"]
+
+
+def description(rng: random.Random) -> str:
+    return (f"{rng.choice(DOMAINS).capitalize()} for {rng.choice(CLIENTS)} "
+            f"{rng.choice(CONSTRAINTS)} and {rng.choice(CONSTRAINTS)} (ref {rng.randrange(10 ** 6)})")
+
+
+def analysis(rng: random.Random) -> dict:
+    return {
+        "charter": {"objective": "Deliver the platform on time", "scope": "Design, build, test, deploy"},
+        "wbs": [{"phase": phase, "tasks": [f"{phase} task {i}" for i in range(4)]}
+                for phase in ("Initiation", "Planning", "Execution", "Closure")],
+        "risks": [{"title": title, "probability": rng.choice(["Low", "Medium", "High"]),
+                   "mitigation": "Weekly review with the steering committee"} for title in rng.sample(RISKS, 4)]
+    }
+
+
+def _percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def run(count: int, queries: int, k: int):
+    rng = random.Random(count)
+    directory = tempfile.mkdtemp(prefix="paxipm_artifacts_")
+    try:
+        index = ArtifactIndex(directory)
+        start = time.perf_counter()
+        for _ in range(count):
+            index.add("risk-analysis", description(rng), analysis(rng))
+        insert_s = time.perf_counter() - start
+
+        latencies = []
+        for _ in range(queries):
+            query = description(rng)
+            start = time.perf_counter()
+            index.search(query, "risk-analysis", k)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        reopened = ArtifactIndex(directory)
+        reopen_s = time.perf_counter() - start
+        assert reopened.stats()["artifacts"] == {"risk-analysis": count}
+
+        sizes = ", ".join(f"{name} {os.path.getsize(os.path.join(directory, name)) / 2 ** 20:.1f} MB"
+                          for name in sorted(os.listdir(directory)))
+        print(f"{count:>7} artifacts  insert {count / insert_s:>7.0f}/s  "
+              f"top-{k} p50 {_percentile(latencies, 0.5):.2f} ms  p95 {_percentile(latencies, 0.95):.2f} ms  "
+              f"reopen {reopen_s:.2f} s")
+        print(f"{'':>9}{sizes}")
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the artifact retrieval index")
+    parser.add_argument("--artifacts", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+    for count in args.artifacts:
+        run(count, args.queries, args.k)
+
+
+if __name__ == "__main__":
+    main()
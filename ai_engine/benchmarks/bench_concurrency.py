@@ -0,0 +1,97 @@
+# Concurrency benchmark - in-flight LLM requests handled by one engine worker
+#
+# Usage (from ai_engine/):
+#   python -m benchmarks.bench_concurrency [--levels 10,50,100,200,400] [--latency 1.0]
+#
+# Starts the mock OpenAI server and a single uvicorn worker running main:app
+# as separate processes, fires N concurrent /chat requests per level and
+# reports wall time, throughput and latency percentiles. With async endpoints
+# the wall time per level stays close to one upstream latency until the
+# connection pool is exhausted.
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.harness import (
+    fetch_json,
+    mock_openai_env,
+    percentile,
+    post_json,
+    start_server,
+)
+
+MOCK_PORT = 8100
+ENGINE_PORT = 8101
+
+
+async def run_level(concurrency: int) -> dict:
+    """Fire `concurrency` simultaneous /chat requests and collect latencies"""
+    latencies = []
+    errors = 0
+
+    async def one_request(i: int):
+        nonlocal errors
+        start = time.perf_counter()
+        status, body = await post_json(
+            ENGINE_PORT,
+            "/chat",
+            {"message": f"Benchmark question {i}", "conversation_history": []}
+        )
+        latencies.append(time.perf_counter() - start)
+        if status != 200 or json.loads(body).get("tokens_used", 0) == 0:
+            errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_request(i) for i in range(concurrency)))
+    wall = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "wall_s": wall,
+        "throughput_rps": concurrency / wall,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "errors": errors,
+    }
+
+
+async def run(levels: list, latency: float):
+    # Warm up the engine's upstream connections
+    await run_level(5)
+
+    print(f"Mock upstream latency: {latency:.2f}s")
+    print(f"{'in-flight':>10} {'wall (s)':>9} {'req/s':>8} {'p50 (s)':>8} {'p95 (s)':>8} {'errors':>7}")
+    for level in levels:
+        fetch_json(MOCK_PORT, "/stats/reset", method="POST")
+        result = await run_level(level)
+        peak = fetch_json(MOCK_PORT, "/stats")["peak_in_flight"]
+        print(
+            f"{result['concurrency']:>10} {result['wall_s']:>9.2f} "
+            f"{result['throughput_rps']:>8.1f} {result['p50_s']:>8.2f} "
+            f"{result['p95_s']:>8.2f} {result['errors']:>7}"
+            f"   (upstream peak in-flight: {peak})"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Engine concurrency benchmark")
+    parser.add_argument("--levels", default="10,50,100,200,400")
+    parser.add_argument("--latency", type=float, default=1.0)
+    args = parser.parse_args()
+
+    mock = start_server(
+        "benchmarks.mock_openai:app",
+        MOCK_PORT,
+        {"MOCK_OPENAI_LATENCY": str(args.latency)}
+    )
+    # Measure the engine itself, not client-side quota pacing
+    engine = start_server(
+        "main:app",
+        ENGINE_PORT,
+        {**mock_openai_env(MOCK_PORT), "OPENAI_RATE_LIMIT_ENABLED": "false"}
+    )
+    try:
+        asyncio.run(run([int(level) for level in args.levels.split(",")], args.latency))
+    finally:
+        engine.terminate()
+        mock.terminate()
@@ -0,0 +1,123 @@
+# JSON extraction benchmark - ResponseValidator.extract_json against the old regex chain
+#
+# Usage (from ai_engine/):
+#   python -m benchmarks.bench_extract_json [--kb 50] [--repeat 50]
+#
+# Builds ~50 KB risk-analysis responses in the shapes the models return
+# (bare JSON, JSON in a fenced block between prose, prose with unrelated
+# braces after the object, a truncated reply, brace-heavy text with no
+# object) and times the scanner against the previous greedy-regex
+# extraction, reporting whether each result parses.
+import argparse
+import json
+import random
+import re
+import time
+from typing import Optional
+
+from validation import ResponseValidator
+
+ROLES = ["Project Manager", "Backend Developer", "QA Engineer", "Business Analyst", "DevOps Engineer"]
+
+
+def legacy_extract_json(text: str) -> Optional[str]:
+    """extract_json before the scanner: greedy regex, then two fenced-block regexes"""
+    json_match = re.search(r'\{[\s\S]*\}', text)
+    if json_match:
+        return json_match.group(0)
+    json_match = re.search(r'```json\s*(\{[\s\S]*\})\s*```', text)
+    if json_match:
+        return json_match.group(1)
+    json_match = re.search(r'```\s*(\{[\s\S]*\})\s*```', text)
+    if json_match:
+        return json_match.group(1)
+    return None
+
+
+def synthetic_wbs(target_bytes: int, seed: int = 11, indent: Optional[int] = None) -> dict:
+    """A risk-analysis payload whose JSON encoding (at `indent`) is about `target_bytes` long"""
+    random.seed(seed)
+    data = {
+        "project_charter": {
+            "executive_summary": "Deliver the new customer portal with SSO, billing and reporting {phase 1}.",
+            "objectives": ["Launch portal", "Migrate 10k users", "Cut support tickets by 30%"],
+            "success_criteria": ["99.9% uptime", "NPS > 40"],
+            "key_stakeholders": [{"name": "Dana", "role": "Sponsor", "responsibility": "Budget"}],
+        },
+        "work_breakdown_structure": {"phases": []},
+        "key_risks": [],
+    }
+    phases = data["work_breakdown_structure"]["phases"]
+    size = len(json.dumps(data, indent=indent))
+    while size < target_bytes:
+        phase = {"phase_name": f"Phase {len(phases) + 1}", "tasks": []}
+        for i in range(random.randint(5, 12)):
+            phase["tasks"].append({
+                "task_name": f"Task {len(phases) + 1}.{i + 1}",
+                "description": f"Implement component \"{random.choice(['auth', 'billing', 'ui'])}\" "
+                               f"with config {{retries: {random.randint(1, 5)}}}",
+                "assigned_role": random.choice(ROLES),
+                "estimated_hours": random.choice([4, 8, 16, 24, 40]),
+                "priority": random.choice(["Low", "Medium", "High"]),
+            })
+        phases.append(phase)
+        data["key_risks"].append({
+            "risk_name": f"Risk {len(phases)}",
+            "probability": random.choice(["Low", "Medium", "High"]),
+            "impact": random.choice(["Low", "Medium", "High"]),
+            "mitigation_strategy": "Weekly review; escalate if blocked > 2 days",
+        })
+        size = len(json.dumps(data, indent=indent))
+    return data
+
+
+def responses(kb: int) -> dict:
+    body = json.dumps(synthetic_wbs(kb * 1024, indent=2), indent=2)
+    prose = "Here is the analysis you asked for. Keys use {snake_case} as requested.\n\n"
+    return {
+        "bare": body,
+        "fenced": prose + "```json\n" + body + "\n```\n\nLet me know if you need changes.",
+        "trailing braces": prose + body + "\n\nNote: placeholders like {owner} and {date} are yours to fill.",
+        "truncated": prose + body[: len(body) * 3 // 4],
+        "no object": "{ " * (kb * 512),
+    }
+
+
+def _mean_ms(fn, text: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def _parses(extracted: Optional[str]) -> str:
+    if extracted is None:
+        return "none"
+    try:
+        json.loads(extracted)
+        return "ok"
+    except ValueError:
+        return "invalid"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON extraction from model responses")
+    parser.add_argument("--kb", type=int, default=50, help="Approximate response size in KB")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'response':<16} {'bytes':>7} {'legacy ms':>10} {'result':>8} {'scanner ms':>11} {'result':>8} {'speedup':>8}")
+    for name, text in responses(args.kb).items():
+        # The legacy regex is quadratic on brace-heavy text; keep its runs bounded
+        repeat = args.repeat if name != "no object" else max(1, args.repeat // 25)
+        legacy_ms = _mean_ms(legacy_extract_json, text, repeat)
+        scanner_ms = _mean_ms(ResponseValidator.extract_json, text, args.repeat)
+        print(
+            f"{name:<16} {len(text):>7} {legacy_ms:>10.3f} {_parses(legacy_extract_json(text)):>8} "
+            f"{scanner_ms:>11.3f} {_parses(ResponseValidator.extract_json(text)):>8} "
+            f"{legacy_ms / scanner_ms:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
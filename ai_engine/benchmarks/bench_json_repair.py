@@ -0,0 +1,69 @@
+# JSON repair benchmark - which tier fixes each kind of malformed response, and at what cost
+#
+# Usage (from ai_engine/):
+#   python -m benchmarks.bench_json_repair [--kb 20] [--repeat 20]
+#
+# Breaks a risk-analysis response the ways models do (trailing commas,
+# single quotes, Python literals, truncation, an unescaped quote, a missing
+# comma) and reports whether the local repair tier recovers it, how long
+# that takes, and -- when it does not -- how much text the targeted re-ask
+# sends back compared with regenerating the whole response. A truncated
+# reply is closed locally but reported as `cut` (not ok): the items kept
+# column shows what a local-only repair would have lost, and it goes to
+# the re-ask like the others. No API calls are made; the re-ask column is
+# the fragment size.
+import argparse
+import json
+import re
+import time
+
+from benchmarks.bench_extract_json import synthetic_wbs
+from json_repair import broken_member, repair_json
+from validation import ResponseValidator
+
+
+def corruptions(body: str) -> dict:
+    return {
+        "trailing commas": re.sub(r'(["\d\]}])(\s*[\]}])', r"\1,\2", body),
+        "single quotes": body.replace('"', "'"),
+        "python literals": body.replace('"priority": "High"', '"priority": "High", "blocking": True'),
+        "truncated 60%": body[: len(body) * 6 // 10],
+        "unescaped quote": body.replace('"Weekly review;', '"Weekly "review";', 1),
+        "missing comma": body.replace('"High",\n', '"High"\n', 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tiered repair of malformed JSON responses")
+    parser.add_argument("--kb", type=int, default=20, help="Approximate response size in KB")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    original = synthetic_wbs(args.kb * 1024, indent=2)
+    body = json.dumps(original, indent=2)
+    schema = ResponseValidator.RISK_ANALYSIS_SCHEMA
+    print(f"{len(body)} char response")
+    print(f"{'corruption':<18} {'local':>6} {'local ms':>9} {'items kept':>11} {'re-ask chars':>13} {'of response':>12}")
+    for name, text in corruptions(body).items():
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            repaired, truncated = repair_json(text)
+        local_ms = (time.perf_counter() - start) * 1000 / args.repeat
+        kept = reask = share = "-"
+        if repaired is not None:
+            data = json.loads(repaired)
+            phases = data.get("work_breakdown_structure", {}).get("phases", [])
+            kept = f"{100 * len(phases) / len(original['work_breakdown_structure']['phases']):.0f}%"
+        if repaired is None or truncated:
+            broken = broken_member(text, schema)
+            if broken is not None:
+                reask = len(broken["fragment"])
+                share = f"{100 * reask / len(text):.1f}%"
+            else:
+                reask = "regenerate"
+        status = "cut" if truncated else "ok" if repaired else "no"
+        print(f"{name:<18} {status:>6} {local_ms:>9.2f} {kept:>11} {reask:>13} {share:>12}")
+
+
+if __name__ == "__main__":
+    main()
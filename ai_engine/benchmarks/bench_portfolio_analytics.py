@@ -0,0 +1,78 @@
+# Portfolio analytics benchmark - KPI precomputation time and reporting prompt size
+#
+# Usage (from ai_engine/):
+#   python -m benchmarks.bench_portfolio_analytics [--tasks 10000] [--projects 100] [--model gpt-4]
+#
+# Builds a synthetic portfolio (tasks, milestones, budgets and staffing from
+# the risk engine benchmark, plus finish-to-start dependency chains), then
+# times compute_kpis and compares the reporting prompt built from raw rows
+# (encode_project) with the one built from precomputed KPIs (report_input).
+import argparse
+import random
+import time
+
+from benchmarks.bench_risk_engine import synthetic_portfolio
+from portfolio_analytics import compute_kpis, report_input
+from prompt_encoder import encode_project
+from token_budget import count_tokens, tiktoken
+
+
+def with_dependencies(projects: list, share: float = 0.6) -> list:
+    """Chain `share` of each project's tasks onto an earlier task"""
+    random.seed(len(projects))
+    for project in projects:
+        tasks = project["tasks"]
+        for position, task in enumerate(tasks[1:], start=1):
+            if random.random() < share:
+                task["depends_on"] = [tasks[random.randint(max(0, position - 5), position - 1)]["id"]]
+    return projects
+
+
+def _best_ms(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark KPI precomputation for reporting prompts")
+    parser.add_argument("--tasks", type=int, default=10000, help="Approximate tasks across the portfolio")
+    parser.add_argument("--projects", type=int, default=100)
+    parser.add_argument("--model", default="gpt-4", help="Model whose tokenizer is used")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    portfolio = with_dependencies(synthetic_portfolio(args.projects, max(1, args.tasks * 4 // (5 * args.projects))))
+    payload = {"portfolio": "Synthetic", "projects": portfolio}
+    task_total = sum(len(p["tasks"]) for p in portfolio)
+    edges = sum(1 for p in portfolio for t in p["tasks"] if t.get("depends_on"))
+    print(f"{len(portfolio)} projects, {task_total} tasks, {edges} dependencies")
+
+    kpi_ms = _best_ms(lambda: compute_kpis(portfolio), args.repeat)
+    print(f"compute_kpis:        {kpi_ms:8.1f} ms  ({kpi_ms * 1000 / task_total:.1f} us/task)")
+
+    raw_start = time.perf_counter()
+    raw = encode_project(payload)
+    raw_ms = (time.perf_counter() - raw_start) * 1000
+    condensed_start = time.perf_counter()
+    condensed = encode_project(report_input(payload))
+    condensed_ms = (time.perf_counter() - condensed_start) * 1000
+
+    tokenizer = "tiktoken" if tiktoken is not None else "chars/4 heuristic"
+    raw_tokens, condensed_tokens = count_tokens(raw, args.model), count_tokens(condensed, args.model)
+    print(f"Tokenizer: {tokenizer} ({args.model})")
+    print(f"raw rows prompt:     {raw_tokens:>9} tokens  (encode {raw_ms:.1f} ms)")
+    print(f"KPI prompt:          {condensed_tokens:>9} tokens  (precompute + encode {condensed_ms:.1f} ms)")
+    print(f"saved:               {100 * (1 - condensed_tokens / raw_tokens):8.1f}%")
+
+    portfolio_kpis = compute_kpis(portfolio)["portfolio"]
+    print("portfolio:", {k: portfolio_kpis[k] for k in (
+        "percent_complete", "overdue_ratio", "burn_rate_per_week", "throughput_trend", "projects_past_end_forecast"
+    )})
+
+
+if __name__ == "__main__":
+    main()
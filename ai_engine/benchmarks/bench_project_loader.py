@@ -0,0 +1,164 @@
+# Project loader benchmark - bulk portfolio loading against per-project fetches
+#
+# Usage (from ai_engine/):
+#   python -m benchmarks.bench_project_loader [--projects 1000] [--tasks 100000] [--rtt-ms 0.5] [--db /tmp/portfolio.db]
+#
+# Builds a SQLite fixture with the backend's SQLite schema (projects,
+# tasks, milestones, resources, risks and their project_id indexes), then
+# loads every project three ways through SQLiteStore:
+#   per-project      fetch_project for one id after another (one query each)
+#   per-project x5   the same calls issued concurrently over the pool
+#   bulk             fetch_projects: one query per table, grouped per project
+# and scores the bulk views with score_portfolio for the end-to-end time.
+# SQLite runs in-process, so a query costs no round trip; `--rtt-ms` adds a
+# simulated network round trip per query, as with MariaDB on another host
+# (0 measures the raw SQLite cost).
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+from project_store import SQLiteStore
+from risk_engine import score_portfolio
+
+SCHEMA = """
+CREATE TABLE projects (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, title VARCHAR(255) NOT NULL, description TEXT, client VARCHAR(255),
+    start_date DATE, end_date DATE, status VARCHAR(50) DEFAULT 'Active', risk_score INTEGER,
+    budgeted_amount DECIMAL(15, 2) DEFAULT 0.00, spent_amount DECIMAL(15, 2) DEFAULT 0.00,
+    currency_code VARCHAR(3) DEFAULT 'USD', user_id INTEGER, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, project_id INTEGER, title VARCHAR(255) NOT NULL, owner VARCHAR(255),
+    progress INTEGER DEFAULT 0, due_date DATE, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE milestones (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, project_id INTEGER, title VARCHAR(255) NOT NULL, description TEXT,
+    target_date DATE, status VARCHAR(50) DEFAULT 'Pending', created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE resources (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, project_id INTEGER, name VARCHAR(255) NOT NULL, role VARCHAR(255),
+    allocation_percent INTEGER DEFAULT 100, skills TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE risks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, project_id INTEGER, title VARCHAR(255) NOT NULL, description TEXT,
+    probability VARCHAR(50) DEFAULT 'Medium', impact VARCHAR(50) DEFAULT 'Medium', status VARCHAR(50) DEFAULT 'Open',
+    mitigation TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX idx_tasks_project_id ON tasks(project_id);
+CREATE INDEX idx_milestones_project_id ON milestones(project_id);
+CREATE INDEX idx_resources_project_id ON resources(project_id);
+CREATE INDEX idx_risks_project_id ON risks(project_id);
+"""
+
+OWNERS = [f"member{i}@example.com" for i in range(40)]
+LEVELS = ["Low", "Medium", "High"]
+
+
+def build_fixture(path: str, project_count: int, task_count: int):
+    """Write a portfolio of `project_count` projects and ~`task_count` tasks to a new SQLite file"""
+    random.seed(project_count)
+    if os.path.exists(path):
+        os.remove(path)
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    today = date.today()
+    projects, tasks, milestones, resources, risks = [], [], [], [], []
+    per_project = task_count // project_count
+    for pid in range(1, project_count + 1):
+        start = today - timedelta(days=random.randint(30, 300))
+        end = start + timedelta(days=random.randint(120, 500))
+        budget = random.randint(50, 500) * 1000
+        projects.append((pid, f"Project {pid}", "Synthetic project", str(start), str(end),
+                         budget, round(budget * random.uniform(0.1, 1.2), 2)))
+        for t in range(per_project):
+            due = start + timedelta(days=random.randint(0, (end - start).days))
+            tasks.append((pid, f"Task {pid}.{t}", random.choice(OWNERS), random.choice([0, 20, 50, 80, 100]), str(due)))
+        for m in range(5):
+            target = start + timedelta(days=(end - start).days * (m + 1) // 5)
+            milestones.append((pid, f"Milestone {m + 1}", str(target), random.choice(["Pending", "Completed"])))
+        for owner in random.sample(OWNERS, 4):
+            resources.append((pid, owner, "Engineer", random.choice([50, 100, 120])))
+        for r in range(3):
+            risks.append((pid, f"Risk {r + 1}", random.choice(LEVELS), random.choice(LEVELS), "Weekly review"))
+    db.executemany("INSERT INTO projects (id, title, description, start_date, end_date, budgeted_amount, spent_amount) "
+                   "VALUES (?, ?, ?, ?, ?, ?, ?)", projects)
+    db.executemany("INSERT INTO tasks (project_id, title, owner, progress, due_date) VALUES (?, ?, ?, ?, ?)", tasks)
+    db.executemany("INSERT INTO milestones (project_id, title, target_date, status) VALUES (?, ?, ?, ?)", milestones)
+    db.executemany("INSERT INTO resources (project_id, name, role, allocation_percent) VALUES (?, ?, ?, ?)", resources)
+    db.executemany("INSERT INTO risks (project_id, title, probability, impact, mitigation) VALUES (?, ?, ?, ?, ?)", risks)
+    db.commit()
+    db.close()
+
+
+class NetworkedStore(SQLiteStore):
+    """SQLiteStore that waits `rtt_ms` per query, like a database across the network"""
+
+    def __init__(self, path: str, pool_size: int, rtt_ms: float):
+        super().__init__(path, pool_size)
+        self.rtt = rtt_ms / 1000
+
+    async def _fetchrow(self, conn, query: str, params: tuple):
+        await asyncio.sleep(self.rtt)
+        return await super()._fetchrow(conn, query, params)
+
+    async def _fetchall(self, conn, query: str, params: tuple):
+        await asyncio.sleep(self.rtt)
+        return await super()._fetchall(conn, query, params)
+
+
+async def _timed(store: SQLiteStore, label: str, work):
+    queries = store.stats()["queries"]
+    start = time.perf_counter()
+    result = await work()
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"{label:<16} {elapsed:>10.1f} ms {store.stats()['queries'] - queries:>9} queries")
+    return result, elapsed
+
+
+async def run(path: str, project_count: int, pool_size: int, rtt_ms: float):
+    store = NetworkedStore(path, pool_size, rtt_ms) if rtt_ms > 0 else SQLiteStore(path, pool_size)
+    ids = list(range(1, project_count + 1))
+    await store.fetch_project(ids[0])  # open the pool outside the timings
+
+    print(f"simulated round trip: {rtt_ms} ms per query")
+    print(f"{'path':<16} {'time':>13} {'round trips':>17}")
+    _, sequential_ms = await _timed(store, "per-project", lambda: _sequential(store, ids))
+    await _timed(store, f"per-project x{pool_size}", lambda: asyncio.gather(*(store.fetch_project(i) for i in ids)))
+    views, bulk_ms = await _timed(store, "bulk", lambda: store.fetch_projects(ids))
+    print(f"bulk is {sequential_ms / bulk_ms:.1f}x faster than per-project")
+
+    start = time.perf_counter()
+    scores = score_portfolio(views)
+    print(f"score_portfolio on the bulk views: {(time.perf_counter() - start) * 1000:.1f} ms "
+          f"({len(scores)} projects, {sum(len(v['tasks']) for v in views)} tasks)")
+    print("pool:", store.stats())
+    await store.close()
+
+
+async def _sequential(store: SQLiteStore, ids: list):
+    return [await store.fetch_project(i) for i in ids]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk portfolio loading from SQLite")
+    parser.add_argument("--projects", type=int, default=1000)
+    parser.add_argument("--tasks", type=int, default=100000)
+    parser.add_argument("--pool-size", type=int, default=5)
+    parser.add_argument("--rtt-ms", type=float, default=0.5, help="Simulated network round trip per query")
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "paxipm_portfolio_bench.db"))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    build_fixture(args.db, args.projects, args.tasks)
+    print(f"fixture {args.db}: {args.projects} projects, {args.tasks} tasks "
+          f"(built in {time.perf_counter() - start:.1f} s)")
+    asyncio.run(run(args.db, args.projects, args.pool_size, args.rtt_ms))
+
+
+if __name__ == "__main__":
+    main()
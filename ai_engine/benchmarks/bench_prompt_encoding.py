@@ -0,0 +1,132 @@
+# Prompt encoding benchmark - tokens spent on projectData per serialization
+#
+# Usage (from ai_engine/):
+#   python -m benchmarks.bench_prompt_encoding [--sizes 10,100,1000] [--model gpt-4]
+#
+# Builds synthetic projects shaped like the backend's project payloads
+# (tasks, milestones, risks with MariaDB-style timestamps and sparse optional
+# columns) and compares the token count of str() (what the prompts used to
+# embed), json.dumps and encode_project, plus the encode time.
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+
+from prompt_encoder import encode_project
+from token_budget import count_tokens, tiktoken
+
+STATUSES = ["todo", "in_progress", "review", "done", "blocked"]
+PRIORITIES = ["low", "medium", "high", "critical"]
+OWNERS = ["alice", "bob", "carol", "dave", "erin", None, None]
+
+
+def _timestamp(day: date, with_time: bool = False) -> str:
+    if with_time:
+        return f"{day.isoformat()}T{random.randint(8, 18):02d}:{random.choice(['00', '15', '30'])}:00.000Z"
+    return f"{day.isoformat()}T00:00:00.000Z"
+
+
+def synthetic_project(task_count: int, seed: int = 7) -> dict:
+    """A project payload with `task_count` tasks and proportional milestones/risks"""
+    random.seed(seed)
+    start = date(2026, 1, 5)
+    tasks = []
+    for i in range(1, task_count + 1):
+        due = start + timedelta(days=random.randint(5, 300))
+        status = random.choice(STATUSES)
+        tasks.append({
+            "id": i,
+            "project_id": 1,
+            "title": f"Task {i}: {random.choice(['Design', 'Build', 'Test', 'Deploy', 'Review'])} "
+                     f"{random.choice(['API', 'schema', 'UI', 'reports', 'pipeline'])}",
+            "status": status,
+            "priority": random.choice(PRIORITIES),
+            "progress": 100 if status == "done" else random.choice([0, 10, 25, 50, 75, 90]),
+            "assigned_to": random.choice(OWNERS),
+            "estimated_hours": float(random.choice([4, 8, 16, 24, 40])),
+            "actual_hours": None if status == "todo" else round(random.uniform(1, 50), 2),
+            "start_date": _timestamp(due - timedelta(days=random.randint(3, 30))),
+            "due_date": _timestamp(due),
+            "completed_at": _timestamp(due, with_time=True) if status == "done" else None,
+            "description": None,
+            "created_at": _timestamp(start, with_time=True),
+            "updated_at": _timestamp(due, with_time=True),
+        })
+    milestones = [
+        {
+            "id": i,
+            "name": f"Milestone {i}",
+            "target_date": _timestamp(start + timedelta(days=30 * i)),
+            "status": random.choice(["pending", "achieved", "at_risk"]),
+            "completed_at": None,
+        }
+        for i in range(1, max(2, task_count // 20) + 1)
+    ]
+    risks = [
+        {
+            "id": i,
+            "title": f"Risk {i}",
+            "category": random.choice(["schedule", "budget", "resource", "technical"]),
+            "probability": random.choice(["low", "medium", "high"]),
+            "impact": random.choice(["low", "medium", "high"]),
+            "risk_score": random.randint(5, 95),
+            "mitigation": None if i % 3 else "Weekly review with sponsor",
+            "owner": random.choice(OWNERS),
+        }
+        for i in range(1, max(2, task_count // 10) + 1)
+    ]
+    return {
+        "id": 1,
+        "title": "ERP Migration",
+        "description": "Migrate finance and HR modules to the new ERP platform.",
+        "status": "in_progress",
+        "progress": 42.0,
+        "start_date": _timestamp(start),
+        "end_date": _timestamp(start + timedelta(days=320)),
+        "budgeted_amount": 250000.0,
+        "spent_amount": 118250.5,
+        "currency_code": "USD",
+        "client": None,
+        "tasks": tasks,
+        "milestones": milestones,
+        "risks": risks,
+    }
+
+
+def measure(project: dict, model: str, repeat: int) -> dict:
+    """Token counts per serialization and the mean encode_project time"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        encoded = encode_project(project)
+    encode_ms = (time.perf_counter() - start) * 1000 / repeat
+    return {
+        "str": count_tokens(str(project), model),
+        "json": count_tokens(json.dumps(project), model),
+        "encoded": count_tokens(encoded, model),
+        "encode_ms": encode_ms,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Token savings of encode_project over str() and JSON")
+    parser.add_argument("--sizes", default="10,100,1000", help="Comma-separated task counts")
+    parser.add_argument("--model", default="gpt-4", help="Model whose tokenizer is used")
+    parser.add_argument("--repeat", type=int, default=20, help="Encode runs averaged per size")
+    args = parser.parse_args()
+
+    tokenizer = "tiktoken" if tiktoken is not None else "chars/4 heuristic"
+    print(f"Tokenizer: {tokenizer} ({args.model})")
+    print(f"{'tasks':>6} {'str()':>9} {'json':>9} {'encoded':>9} {'vs str':>8} {'vs json':>8} {'encode ms':>10}")
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        result = measure(synthetic_project(size), args.model, args.repeat)
+        vs_str = 100 * (1 - result["encoded"] / result["str"])
+        vs_json = 100 * (1 - result["encoded"] / result["json"])
+        print(
+            f"{size:>6} {result['str']:>9} {result['json']:>9} {result['encoded']:>9} "
+            f"{vs_str:>7.1f}% {vs_json:>7.1f}% {result['encode_ms']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
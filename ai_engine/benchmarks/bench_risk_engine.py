@@ -0,0 +1,83 @@
+# Risk engine benchmark - local risk scoring latency per project and per portfolio
+#
+# Usage (from ai_engine/):
+#   python -m benchmarks.bench_risk_engine [--projects 1000] [--tasks 50] [--repeat 5]
+#
+# Builds a portfolio of synthetic projects (tasks and milestones from the
+# prompt encoding benchmark, plus budgets and resource allocations) and times
+# scoring each project on its own against scoring the whole portfolio in one
+# vectorized pass. For reference, the LLM path this replaced took one gpt-4
+# round trip (seconds) per project.
+import argparse
+import random
+import statistics
+import time
+
+from benchmarks.bench_prompt_encoding import synthetic_project
+from risk_engine import score_portfolio, score_project
+
+PEOPLE = ["alice", "bob", "carol", "dave", "erin", "frank", "grace", "heidi"]
+
+
+def synthetic_portfolio(project_count: int, task_count: int) -> list:
+    """`project_count` projects of roughly `task_count` tasks with budgets and staffing"""
+    random.seed(project_count)
+    projects = []
+    for i in range(1, project_count + 1):
+        project = synthetic_project(random.randint(max(1, task_count // 2), task_count * 2), seed=i)
+        budget = float(random.choice([50000, 120000, 400000]))
+        project.update({
+            "id": i,
+            "start_date": "2026-01-05",
+            "end_date": random.choice(["2026-06-30", "2026-12-31", "2027-06-30"]),
+            "budgeted_amount": budget,
+            "spent_amount": round(budget * random.uniform(0.1, 1.2), 2),
+            "resources": [
+                {"name": name, "allocation_percentage": random.choice([25, 50, 75, 100])}
+                for name in random.sample(PEOPLE, random.randint(2, 5))
+            ],
+        })
+        projects.append(project)
+    return projects
+
+
+def _best_ms(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark local risk scoring")
+    parser.add_argument("--projects", type=int, default=1000)
+    parser.add_argument("--tasks", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    portfolio = synthetic_portfolio(args.projects, args.tasks)
+    total_tasks = sum(len(p["tasks"]) for p in portfolio)
+    print(f"{args.projects} projects, {total_tasks} tasks")
+
+    single = []
+    for project in portfolio[:200]:
+        start = time.perf_counter()
+        score_project(project)
+        single.append((time.perf_counter() - start) * 1e6)
+    print(f"score_project:   median {statistics.median(single):8.1f} us   "
+          f"p95 {sorted(single)[int(len(single) * 0.95) - 1]:8.1f} us")
+
+    loop_ms = _best_ms(lambda: [score_project(p) for p in portfolio], args.repeat)
+    pass_ms = _best_ms(lambda: score_portfolio(portfolio), args.repeat)
+    print(f"per-project loop: {loop_ms:8.1f} ms")
+    print(f"one pass:         {pass_ms:8.1f} ms   ({loop_ms / pass_ms:.1f}x, "
+          f"{pass_ms * 1000 / args.projects:.1f} us/project)")
+
+    scores = [r["risk_score"] for r in score_portfolio(portfolio)]
+    print(f"risk_score: min {min(scores)}  median {int(statistics.median(scores))}  max {max(scores)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# Incremental risk benchmark - nightly portfolio refresh from scratch against change-driven rescoring
+#
+# Usage (from ai_engine/):
+#   python -m benchmarks.bench_risk_incremental [--projects 500] [--tasks 50000] [--changed 0.1] [--llm-seconds 8]
+#
+# Scores a SQLite fixture portfolio (see bench_project_loader) with
+# narratives once to set the baseline, then simulates a day of edits: a
+# `--changed` share of the projects get a handful of task, milestone or
+# budget change events. The refresh is then done two ways:
+#   from scratch   every project reloaded and rescored, every narrative rewritten
+#   incremental    apply_risk_changes for the changed projects only, recomputing
+#                  the subscores the events touch; narratives only on material moves
+# Narratives are stubbed; LLM time is the call count times `--llm-seconds`.
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import date
+
+from ai_manager import AIManager
+from benchmarks.bench_project_loader import build_fixture
+from project_store import SQLiteStore
+from risk_state import RiskState
+
+
+class CountingManager(AIManager):
+    """AIManager whose narratives are stubbed and counted"""
+
+    def __init__(self, store: SQLiteStore, state: RiskState):
+        super().__init__(openai_client=object(), project_store=store, risk_state=state)
+        self.narratives = 0
+
+    async def summarize_risk(self, project_title: str, score: dict) -> str:
+        self.narratives += 1
+        return f"{project_title}: risk {score['risk_score']}"
+
+
+def day_of_edits(manager: CountingManager, ids: list, share: float) -> dict:
+    """Change events per project for `share` of the portfolio"""
+    random.seed(len(ids))
+    events = {}
+    for project_id in random.sample(ids, max(1, int(len(ids) * share))):
+        inputs = manager.risk_state.get(project_id)["inputs"]
+        kind = random.random()
+        if kind < 0.7:
+            # Progress updates on a few tasks
+            events[project_id] = [
+                {"entity": "task", "data": {"id": task["id"], "progress": min(100, (task.get("progress") or 0) + 20)}}
+                for task in random.sample(inputs["tasks"], min(3, len(inputs["tasks"])))
+            ]
+        elif kind < 0.9:
+            milestone = random.choice(inputs["milestones"])
+            events[project_id] = [{"entity": "milestone", "data": {"id": milestone["id"], "status": "Completed",
+                                                                   "completed_date": date.today().isoformat()}}]
+        else:
+            spent = float(inputs.get("spent_amount") or 0)
+            events[project_id] = [{"entity": "project", "data": {"spent_amount": round(spent * 1.02, 2)}}]
+    return events
+
+
+async def run(args):
+    state_path = os.path.join(tempfile.gettempdir(), "paxipm_risk_state_bench.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(state_path + suffix):
+            os.remove(state_path + suffix)
+    store = SQLiteStore(args.db, 5)
+    manager = CountingManager(store, RiskState(state_path, args.materiality))
+    ids = list(range(1, args.projects + 1))
+    try:
+        await asyncio.gather(*(manager.calculate_risk_score(i, True) for i in ids))
+        events = day_of_edits(manager, ids, args.changed)
+        print(f"{len(events)} of {len(ids)} projects changed, {sum(len(e) for e in events.values())} events")
+
+        print(f"{'refresh':<14} {'compute s':>10} {'rescored':>9} {'narratives':>11} {'LLM s':>8}")
+        for label, work in (
+            ("from scratch", lambda: asyncio.gather(*(manager.calculate_risk_score(i, True, 0) for i in ids))),
+            ("incremental", lambda: asyncio.gather(*(
+                manager.apply_risk_changes(i, e, True) for i, e in events.items()
+            ))),
+        ):
+            narratives = manager.narratives
+            start = time.perf_counter()
+            results = await work()
+            elapsed = time.perf_counter() - start
+            calls = manager.narratives - narratives
+            print(f"{label:<14} {elapsed:>10.2f} {len(results):>9} {calls:>11} {calls * args.llm_seconds:>8.0f}")
+        print("risk state:", manager.risk_state.stats())
+    finally:
+        await store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark incremental risk rescoring against full refreshes")
+    parser.add_argument("--projects", type=int, default=500)
+    parser.add_argument("--tasks", type=int, default=50000)
+    parser.add_argument("--changed", type=float, default=0.1, help="Share of projects edited during the day")
+    parser.add_argument("--materiality", type=float, default=5.0)
+    parser.add_argument("--llm-seconds", type=float, default=8.0, help="Assumed latency of one narrative")
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "paxipm_risk_bench.db"))
+    args = parser.parse_args()
+
+    build_fixture(args.db, args.projects, args.tasks)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# Benchmark harness - runs the mock OpenAI server and the engine as local processes
+import os
+import socket
+import subprocess
+import sys
+import time
+
+# Servers are started from ai_engine/ so `main:app` resolves as it does in Docker,
+# and benchmarks that exercise engine modules directly import them from there
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ENGINE_DIR not in sys.path:
+    sys.path.insert(0, ENGINE_DIR)
+
+
+def mock_openai_env(port: int) -> dict:
+    """Environment that points the engine's OpenAI SDK at the local mock server"""
+    return {
+        "OPENAI_API_KEY": "sk-mock",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{port}/v1",
+    }
+
+
+def _port_open(port: int) -> bool:
+    """Whether something is listening on a local port"""
+    try:
+        socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+        return True
+    except OSError:
+        return False
+
+
+def start_server(app_path: str, port: int, env: dict = None) -> subprocess.Popen:
+    """Start `uvicorn app_path` as a single-worker subprocess and wait until it accepts connections"""
+    if _port_open(port):
+        raise RuntimeError(f"Port {port} is already in use; stop the stale server first")
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", app_path,
+            "--host", "127.0.0.1",
+            "--port", str(port),
+            "--log-level", "warning",
+            "--no-access-log",
+            "--backlog", "4096",
+        ],
+        cwd=ENGINE_DIR,
+        env={**os.environ, **(env or {})}
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if _port_open(port):
+            return process
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{app_path} did not start on port {port}")
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def post_json(port: int, path: str, payload: dict) -> tuple:
+    """Minimal HTTP/1.1 POST over a fresh socket, returns (status, body bytes).
+
+    The load generator deliberately avoids httpx: httpcore's pool scans every
+    connection on each request, which makes the client itself the bottleneck
+    at a few hundred concurrent connections.
+    """
+    import asyncio
+    import json
+
+    body = json.dumps(payload).encode()
+    request = (
+        f"POST {path} HTTP/1.1\r\n"
+        f"Host: 127.0.0.1:{port}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    ).encode() + body
+
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(request)
+        await writer.drain()
+        raw = await reader.read()
+    finally:
+        writer.close()
+
+    head, _, response_body = raw.partition(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    return status, response_body
+
+
+def fetch_json(port: int, path: str, method: str = "GET") -> dict:
+    """Blocking JSON request for harness bookkeeping outside the timed region"""
+    import json
+    import urllib.request
+
+    request = urllib.request.Request(f"http://127.0.0.1:{port}{path}", method=method)
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
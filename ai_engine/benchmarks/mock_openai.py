@@ -0,0 +1,162 @@
+# Mock OpenAI server - local stand-in for the chat completions API used by benchmarks
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Simulated upstream latency per completion (seconds)
+MOCK_LATENCY = float(os.getenv("MOCK_OPENAI_LATENCY", "1.0"))
+# Share of MOCK_LATENCY spent before the first streamed token
+MOCK_TTFT_SHARE = float(os.getenv("MOCK_OPENAI_TTFT_SHARE", "0.1"))
+
+app = FastAPI(title="Mock OpenAI", version="1.0.0")
+
+# Canned JSON body returned when the caller asks for response_format=json_object
+MOCK_JSON_CONTENT = {
+    "risk_score": 42,
+    "risk_summary": "Mock risk summary",
+    "recommendations": [{"action": "Review schedule", "priority": "high"}],
+}
+
+stats = {"requests": 0, "in_flight": 0, "peak_in_flight": 0, "faults_served": 0}
+
+# Injected upstream faults: the next `count` requests fail with `status`
+fault = {"count": 0, "status": 429, "retry_after": None}
+
+
+def _mock_content(body: dict) -> str:
+    """Build the completion text for a request"""
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        return json.dumps(MOCK_JSON_CONTENT)
+    prompt = str(body.get("messages", [{}])[-1].get("content", ""))
+    if "---JSON SUMMARY---" in prompt:
+        # PMO report format: plain-text section followed by a JSON section
+        return (
+            "---PLAIN TEXT REPORT---\nMock status report\n---END PLAIN TEXT REPORT---\n\n"
+            "---JSON SUMMARY---\n"
+            + json.dumps({"executive_summary": {"status": "On Track"}})
+            + "\n---END JSON SUMMARY---"
+        )
+    return "# Mock completion\n\nThis response was generated by the local mock OpenAI server."
+
+
+def _usage(body: dict, content: str) -> dict:
+    prompt_tokens = sum(len(str(m.get("content", ""))) // 4 for m in body.get("messages", []))
+    completion_tokens = len(content) // 4
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+async def _stream_chunks(body: dict):
+    """Yield chat.completion.chunk SSE frames spread over MOCK_LATENCY seconds"""
+    content = _mock_content(body)
+    words = [w + " " for w in content.split(" ")]
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+    def chunk(delta: dict, finish_reason=None, **extra) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4"),
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            **extra,
+        }
+        return f"data: {json.dumps(payload)}\n\n"
+
+    stats["in_flight"] += 1
+    stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+    try:
+        await asyncio.sleep(MOCK_LATENCY * MOCK_TTFT_SHARE)
+        yield chunk({"role": "assistant", "content": ""})
+        interval = MOCK_LATENCY * (1 - MOCK_TTFT_SHARE) / max(len(words), 1)
+        for word in words:
+            yield chunk({"content": word})
+            await asyncio.sleep(interval)
+        yield chunk({}, finish_reason="stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            usage_frame = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "gpt-4"),
+                "choices": [],
+                "usage": _usage(body, content),
+            }
+            yield f"data: {json.dumps(usage_frame)}\n\n"
+        yield "data: [DONE]\n\n"
+    finally:
+        stats["in_flight"] -= 1
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    """Return a ChatCompletion-shaped body after MOCK_LATENCY seconds (or stream it)"""
+    body = await request.json()
+    stats["requests"] += 1
+    if fault["count"] > 0:
+        fault["count"] -= 1
+        stats["faults_served"] += 1
+        headers = {"retry-after": str(fault["retry_after"])} if fault["retry_after"] is not None else {}
+        return JSONResponse(
+            {"error": {"message": "Injected fault", "type": "mock_fault", "code": None}},
+            status_code=fault["status"],
+            headers=headers
+        )
+    if body.get("stream"):
+        return StreamingResponse(_stream_chunks(body), media_type="text/event-stream")
+
+    stats["in_flight"] += 1
+    stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+    try:
+        await asyncio.sleep(MOCK_LATENCY)
+    finally:
+        stats["in_flight"] -= 1
+
+    content = _mock_content(body)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-4"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": _usage(body, content),
+    }
+
+
+@app.get("/stats")
+def get_stats():
+    """Request counters for the benchmark harness"""
+    return stats
+
+
+@app.post("/stats/reset")
+def reset_stats():
+    """Reset counters between benchmark levels"""
+    stats.update({"requests": 0, "peak_in_flight": stats["in_flight"], "faults_served": 0})
+    return stats
+
+
+@app.post("/fault")
+async def set_fault(request: Request):
+    """Fail the next `count` completions with `status` (and an optional Retry-After)"""
+    fault.update(await request.json())
+    return fault
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("MOCK_OPENAI_PORT", "8100")))
@@ -0,0 +1,237 @@
+# Chat history - keeps recent turns verbatim and folds older turns into a rolling summary
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from logger import logger
+from response_cache import cached_create
+from singleflight import SingleFlight, singleflight
+from token_budget import context_window, count_message_tokens, count_tokens
+
+SUMMARY_PROMPT = """Summarize the earlier part of a project management conversation between a user and an AI assistant.
+Keep decisions, figures, dates, names, open questions and anything the user asked to remember.
+Write at most {max_words} words of plain prose.
+
+{previous}Conversation:
+{transcript}"""
+
+
+def _fingerprint(messages: List[Dict[str, str]]) -> str:
+    material = json.dumps(messages, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _transcript(messages: List[Dict[str, str]]) -> str:
+    return "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+
+
+class ConversationHistoryManager:
+    """Builds the `messages` list for a chat turn.
+
+    The last `keep_turns` user/assistant turns are sent verbatim. Older turns
+    are folded into a rolling summary cached per conversation id; the summary
+    is only extended once `fold_batch_turns` further turns have aged out, so a
+    summarization call happens every few turns rather than on every turn. The
+    assembled list is then held under `token_ceiling` by dropping the oldest
+    verbatim messages.
+    """
+
+    def __init__(
+        self,
+        keep_turns: int = None,
+        fold_batch_turns: int = None,
+        token_ceiling: int = None,
+        summary_max_tokens: int = None,
+        max_conversations: int = None,
+        summary_model: str = None
+    ):
+        self.keep_messages = 2 * (keep_turns or int(os.getenv("CHAT_HISTORY_KEEP_TURNS", "6")))
+        self.fold_batch_messages = 2 * (fold_batch_turns or int(os.getenv("CHAT_HISTORY_FOLD_BATCH_TURNS", "4")))
+        self.token_ceiling = token_ceiling or int(os.getenv("CHAT_HISTORY_TOKEN_CEILING", "4000"))
+        self.summary_max_tokens = summary_max_tokens or int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "300"))
+        self.max_conversations = max_conversations or int(os.getenv("CHAT_SUMMARY_CACHE_SIZE", "1000"))
+        self.summary_model = summary_model or os.getenv("CHAT_SUMMARY_MODEL", "gpt-3.5-turbo")
+        # conversation key -> {"folded": message count, "fingerprint": hash of folded prefix, "summary": text}
+        self._summaries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._stats = {
+            "turns": 0,
+            "compacted_turns": 0,
+            "summaries_built": 0,
+            "summary_reuses": 0,
+            "summary_fallbacks": 0,
+            "ceiling_drops": 0,
+            "tokens_full": 0,
+            "tokens_sent": 0
+        }
+
+    @staticmethod
+    def normalize(history: Optional[List[Dict[str, str]]], message: str) -> List[Dict[str, str]]:
+        """Valid role/content pairs, without a trailing copy of the current message.
+
+        The backend stores the user's message before loading the history it
+        forwards, so the last history entry is usually the message itself.
+        """
+        cleaned = [
+            {"role": m["role"], "content": m["content"]}
+            for m in history or []
+            if m.get("role") and m.get("content")
+        ]
+        if cleaned and cleaned[-1]["role"] == "user" and cleaned[-1]["content"] == message:
+            cleaned.pop()
+        return cleaned
+
+    def _conversation_key(self, conversation_id: Any, history: List[Dict[str, str]]) -> str:
+        if conversation_id is not None:
+            return f"id:{conversation_id}"
+        # Without an id, the opening exchange identifies the conversation; the
+        # prefix fingerprint check below keeps this safe if two ever collide
+        return "fp:" + _fingerprint(history[:2])
+
+    async def build_messages(
+        self,
+        openai_client,
+        system_prompt: str,
+        history: List[Dict[str, str]],
+        message: str,
+        model: str,
+        max_tokens: int,
+        conversation_id: Any = None
+    ) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """Return (messages to send, report with full/sent token counts)"""
+        system = {"role": "system", "content": system_prompt}
+        current = {"role": "user", "content": message}
+        tokens_full = count_message_tokens([system, *history, current], model)
+        ceiling = min(self.token_ceiling, context_window(model) - max_tokens)
+
+        summary = None
+        recent = history
+        summarized = 0
+        if len(history) > self.keep_messages:
+            key = self._conversation_key(conversation_id, history)
+            aged = len(history) - self.keep_messages
+            summary, summarized = await self._summary_for(openai_client, key, history, aged)
+            recent = history[summarized:]
+
+        messages = [system]
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+        messages.extend(recent)
+        messages.append(current)
+
+        # Enforce the ceiling: oldest verbatim messages go first, the current message always stays
+        tokens_sent = count_message_tokens(messages, model)
+        first_recent = 2 if summary else 1
+        dropped = 0
+        while tokens_sent > ceiling and len(messages) - first_recent > 1:
+            removed = messages.pop(first_recent)
+            tokens_sent -= count_tokens(removed["content"], model) + 4
+            dropped += 1
+
+        report = {
+            "tokens_full": tokens_full,
+            "tokens_sent": tokens_sent,
+            "tokens_saved": max(0, tokens_full - tokens_sent),
+            "ceiling": ceiling,
+            "messages_summarized": summarized,
+            "messages_verbatim": len(recent) - dropped,
+            "messages_dropped": dropped
+        }
+        self._record(report)
+        logger.log_tokens("chat", {
+            "tokens_before": tokens_full,
+            "tokens_after": tokens_sent,
+            "budget": ceiling,
+            "summarized": [f"{summarized} messages"] if summarized else [],
+            "dropped": [f"{dropped} messages"] if dropped else []
+        })
+        return messages, report
+
+    async def _summary_for(
+        self,
+        openai_client,
+        key: str,
+        history: List[Dict[str, str]],
+        aged: int
+    ) -> Tuple[Optional[str], int]:
+        """(summary text, number of leading history messages it covers)"""
+        entry = self._summaries.get(key)
+        if entry and (entry["folded"] > aged or _fingerprint(history[:entry["folded"]]) != entry["fingerprint"]):
+            # History was edited or belongs to a different conversation: start over
+            entry = None
+
+        # Reuse the cached summary while the not-yet-folded backlog is small;
+        # those messages are simply sent verbatim in the meantime
+        if entry and aged - entry["folded"] < self.fold_batch_messages:
+            self._summaries.move_to_end(key)
+            self._stats["summary_reuses"] += 1
+            return entry["summary"], entry["folded"]
+
+        previous = entry["summary"] if entry else None
+        start = entry["folded"] if entry else 0
+        fold_key = SingleFlight.make_key("chat-summary", {"previous": previous, "messages": history[start:aged]})
+        summary = await singleflight.do(
+            fold_key,
+            lambda: self._summarize(openai_client, previous, history[start:aged])
+        )
+
+        self._summaries[key] = {"folded": aged, "fingerprint": _fingerprint(history[:aged]), "summary": summary}
+        self._summaries.move_to_end(key)
+        while len(self._summaries) > self.max_conversations:
+            self._summaries.popitem(last=False)
+        self._stats["summaries_built"] += 1
+        return summary, aged
+
+    async def _summarize(self, openai_client, previous: Optional[str], messages: List[Dict[str, str]]) -> str:
+        """Fold `messages` into `previous` with the model, or locally when it is unavailable"""
+        if openai_client:
+            try:
+                prompt = SUMMARY_PROMPT.format(
+                    max_words=int(self.summary_max_tokens * 0.75),
+                    previous=f"Summary so far:\n{previous}\n\n" if previous else "",
+                    transcript=_transcript(messages)
+                )
+                response = await cached_create(
+                    openai_client,
+                    "chat-summary",
+                    model=self.summary_model,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0,
+                    max_tokens=self.summary_max_tokens
+                )
+                return response.choices[0].message.content.strip()
+            except Exception as e:
+                logger.log_error("chat-summary", e, {"messages": len(messages)})
+                print(f"Chat Summary Error: {str(e)}")
+        self._stats["summary_fallbacks"] += 1
+        return self._local_summary(previous, messages)
+
+    def _local_summary(self, previous: Optional[str], messages: List[Dict[str, str]]) -> str:
+        """Extractive fallback: the first sentence of each message, newest kept when over budget"""
+        lines = [previous] if previous else []
+        for m in messages:
+            first = " ".join(m["content"].split())
+            first = first.split(". ")[0][:160]
+            lines.append(f"{m['role']}: {first}")
+        while len(lines) > 1 and count_tokens("\n".join(lines)) > self.summary_max_tokens:
+            lines.pop(0)
+        return "\n".join(lines)
+
+    def _record(self, report: Dict[str, Any]):
+        self._stats["turns"] += 1
+        self._stats["compacted_turns"] += int(report["tokens_saved"] > 0)
+        self._stats["ceiling_drops"] += report["messages_dropped"]
+        self._stats["tokens_full"] += report["tokens_full"]
+        self._stats["tokens_sent"] += report["tokens_sent"]
+
+    def stats(self) -> Dict[str, Any]:
+        """Turn counters, summary cache usage and cumulative tokens saved"""
+        stats = dict(self._stats)
+        stats["tokens_saved"] = stats["tokens_full"] - stats["tokens_sent"]
+        stats["cached_conversations"] = len(self._summaries)
+        return stats
+
+
+# Global manager shared by /chat and /chat/stream
+history_manager = ConversationHistoryManager()
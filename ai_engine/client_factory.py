@@ -0,0 +1,176 @@
+# Client factory - one pooled, instrumented OpenAI client shared by every call site
+import os
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+
+load_dotenv()
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Read timeout (seconds) per engine endpoint; long structured generations get more room.
+# Override with OPENAI_ENDPOINT_TIMEOUTS="chat=20,pmo-report=240".
+ENDPOINT_TIMEOUTS = {
+    "chat": 45.0,
+    "chat-summary": 30.0,
+    "calculate-risk": 30.0,
+    "analyze-risk": 45.0,
+    "charter": 90.0,
+    "generate-charter": 90.0,
+    "reporting": 90.0,
+    "project-setup": 120.0,
+    "risk-analysis": 120.0,
+    "lessons-learned": 120.0,
+    "pmo-report": 180.0,
+}
+
+
+def parse_endpoint_seconds(value: str) -> Dict[str, float]:
+    """Parse "endpoint=seconds,..." overrides"""
+    timeouts = {}
+    for item in value.split(","):
+        if "=" in item:
+            endpoint, seconds = item.split("=", 1)
+            timeouts[endpoint.strip()] = float(seconds)
+    return timeouts
+
+
+class PooledTransport(httpx.AsyncHTTPTransport):
+    """httpx transport that records how long requests wait for a pooled connection.
+
+    Acquire time runs from the moment a request enters the pool until its
+    headers start going out, so it includes queueing behind `max_connections`
+    and any new TCP/TLS handshake (counted separately as `connects`).
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._stats = {
+            "requests": 0,
+            "connects": 0,
+            "acquire_ms_total": 0.0,
+            "acquire_ms_max": 0.0,
+            "errors": 0
+        }
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        acquired = False
+        upstream_trace = request.extensions.get("trace")
+
+        async def trace(name: str, info: Dict[str, Any]):
+            nonlocal acquired
+            if name == "connection.connect_tcp.started":
+                self._stats["connects"] += 1
+            elif not acquired and name.endswith("send_request_headers.started"):
+                acquired = True
+                wait_ms = (time.perf_counter() - start) * 1000
+                self._stats["acquire_ms_total"] += wait_ms
+                self._stats["acquire_ms_max"] = max(self._stats["acquire_ms_max"], wait_ms)
+            if upstream_trace is not None:
+                await upstream_trace(name, info)
+
+        request.extensions["trace"] = trace
+        self._stats["requests"] += 1
+        try:
+            return await super().handle_async_request(request)
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        """Live connection counts plus cumulative acquire-time counters.
+
+        The live counts read httpx/httpcore pool internals, which differ
+        between 1.x releases; they are None when unavailable.
+        """
+        stats = dict(self._stats)
+        stats["acquire_ms_avg"] = round(stats["acquire_ms_total"] / stats["requests"], 3) if stats["requests"] else 0.0
+        stats["acquire_ms_total"] = round(stats["acquire_ms_total"], 3)
+        stats["acquire_ms_max"] = round(stats["acquire_ms_max"], 3)
+        stats.update({"connections": None, "active": None, "idle": None, "queued": None})
+        pool = getattr(self, "_pool", None)
+        try:
+            connections = pool.connections
+            idle = sum(1 for c in connections if c.is_idle())
+            stats["connections"] = len(connections)
+            stats["active"] = len(connections) - idle
+            stats["idle"] = idle
+            stats["queued"] = sum(1 for r in getattr(pool, "_requests", ()) if r.is_queued())
+        except (AttributeError, TypeError):
+            pass  # /metrics is polled; the None counts say enough
+        return stats
+
+
+class ClientFactory:
+    """Builds the process-wide AsyncOpenAI client on first use.
+
+    Every module asks the factory instead of constructing its own client, so
+    all calls in a worker share one keep-alive pool. Uvicorn workers are
+    separate processes and each keep their own pool.
+    """
+
+    def __init__(self):
+        self.api_key = os.getenv("OPENAI_API_KEY")
+        self.max_connections = int(os.getenv("OPENAI_MAX_CONNECTIONS", "500"))
+        self.max_keepalive = int(os.getenv("OPENAI_MAX_KEEPALIVE", str(self.max_connections)))
+        self.keepalive_expiry = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+        self.connect_timeout = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+        self.default_timeout = float(os.getenv("OPENAI_DEFAULT_TIMEOUT", "60"))
+        self.http2 = HTTP2_AVAILABLE and os.getenv("OPENAI_HTTP2", "true").lower() == "true"
+        self.endpoint_timeouts = dict(ENDPOINT_TIMEOUTS)
+        self.endpoint_timeouts.update(parse_endpoint_seconds(os.getenv("OPENAI_ENDPOINT_TIMEOUTS", "")))
+        self._transport: Optional[PooledTransport] = None
+        self._client: Optional[AsyncOpenAI] = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key) and self.api_key != "your_openai_api_key_here"
+
+    def get_client(self) -> Optional[AsyncOpenAI]:
+        """The shared client, or None when OPENAI_API_KEY is not configured"""
+        if self._client is None and self.configured:
+            self._transport = PooledTransport(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive,
+                    keepalive_expiry=self.keepalive_expiry
+                )
+            )
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                # Fallback only; call sites pass timeout_for(endpoint) per request
+                timeout=httpx.Timeout(self.default_timeout, connect=self.connect_timeout),
+                # Retries and backoff are handled by resilience.resilient.call
+                max_retries=0,
+                http_client=httpx.AsyncClient(transport=self._transport)
+            )
+        return self._client
+
+    def timeout_for(self, endpoint: str) -> httpx.Timeout:
+        """Request timeout for an engine endpoint"""
+        seconds = self.endpoint_timeouts.get(endpoint, self.default_timeout)
+        return httpx.Timeout(seconds, connect=self.connect_timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool configuration and live/cumulative pool counters"""
+        stats = {
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "max_keepalive": self.max_keepalive
+        }
+        if self._transport is not None:
+            stats.update(self._transport.stats())
+        return stats
+
+
+# Global factory shared by main.py, AIManager and the streaming helpers
+client_factory = ClientFactory()
@@ -0,0 +1,334 @@
+# Job queue - SQLite-backed persistent queue for long-running generations
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from logger import logger
+
+load_dotenv()
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "jobs.db")
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+
+class QueueFullError(Exception):
+    """Raised on submit when the queued backlog is at its limit"""
+    pass
+
+
+class JobQueue:
+    """Durable job queue shared by every worker process on the host.
+
+    Jobs are rows in SQLite. A worker claims one by leasing it; a job whose
+    lease runs out (its worker crashed mid-job) is claimed again, up to
+    `max_attempts` times. On a clean shutdown the jobs still running are
+    put back in the queue at once rather than waiting out their lease. Results stay readable for
+    `retention_seconds` after the job finishes.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_DB_PATH,
+        workers: int = 2,
+        max_queued: int = 500,
+        lease_seconds: float = 600,
+        max_attempts: int = 3,
+        retention_seconds: float = 86400,
+        poll_interval: float = 0.5
+    ):
+        self.path = path
+        self.workers = workers
+        self.max_queued = max_queued
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retention_seconds = retention_seconds
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "rejected": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "reclaimed": 0,
+            "wait_ms_total": 0.0,
+            "run_ms_total": 0.0
+        }
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                lease_until REAL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        """Build the queue from AI_JOBS_* environment variables"""
+        return cls(
+            path=os.getenv("AI_JOBS_SQLITE_PATH") or DEFAULT_DB_PATH,
+            workers=int(os.getenv("AI_JOBS_WORKERS", "2")),
+            max_queued=int(os.getenv("AI_JOBS_MAX_QUEUED", "500")),
+            lease_seconds=float(os.getenv("AI_JOBS_LEASE_SECONDS", "600")),
+            max_attempts=int(os.getenv("AI_JOBS_MAX_ATTEMPTS", "3")),
+            retention_seconds=float(os.getenv("AI_JOBS_RETENTION_SECONDS", "86400"))
+        )
+
+    def register(self, kind: str, handler: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]):
+        """Route jobs of `kind` to `handler(payload) -> result dict`"""
+        self._handlers[kind] = handler
+
+    # --- blocking SQLite operations (run via asyncio.to_thread) ---
+
+    def _insert(self, kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                depth = self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+                if depth >= self.max_queued:
+                    raise QueueFullError(f"Job queue is full ({depth} queued)")
+                job_id = uuid.uuid4().hex
+                self._db.execute(
+                    "INSERT INTO jobs (id, kind, payload, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+                    (job_id, kind, json.dumps(payload, default=str), time.time())
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return {"job_id": job_id, "status": "queued", "queue_depth": depth + 1}
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # Expired leases belong to workers that died mid-job
+                expired = self._db.execute(
+                    "UPDATE jobs SET status = 'queued', worker = NULL, lease_until = NULL "
+                    "WHERE status = 'running' AND lease_until < ?",
+                    (now,)
+                ).rowcount
+                self._stats["reclaimed"] += expired
+                self._db.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'Exceeded maximum attempts', finished_at = ? "
+                    "WHERE status = 'queued' AND attempts >= ?",
+                    (now, self.max_attempts)
+                )
+                row = self._db.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' AND kind IN (%s) ORDER BY created_at LIMIT 1"
+                    % ",".join("?" * len(self._handlers)),
+                    tuple(self._handlers)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, "
+                        "attempts = attempts + 1, started_at = ? WHERE id = ?",
+                        (self.worker_id, now + self.lease_seconds, now, row["id"])
+                    )
+                self._db.execute("COMMIT")
+                return row
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None):
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL "
+                "WHERE id = ? AND worker = ?",
+                (status, json.dumps(result, default=str) if result is not None else None,
+                 error, time.time(), job_id, self.worker_id)
+            )
+
+    def _release(self) -> int:
+        """Requeue this worker's running jobs; the interrupted run does not count as an attempt"""
+        with self._lock:
+            return self._db.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, lease_until = NULL, started_at = NULL, "
+                "attempts = MAX(attempts - 1, 0) WHERE status = 'running' AND worker = ?",
+                (self.worker_id,)
+            ).rowcount
+
+    def _get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = {
+                "job_id": row["id"],
+                "kind": row["kind"],
+                "status": row["status"],
+                "attempts": row["attempts"],
+                "created_at": row["created_at"],
+                "started_at": row["started_at"],
+                "finished_at": row["finished_at"]
+            }
+            if row["status"] == "queued":
+                job["position"] = self._db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at <= ?",
+                    (row["created_at"],)
+                ).fetchone()[0]
+            if row["result"] is not None:
+                job["result"] = json.loads(row["result"])
+            if row["error"] is not None:
+                job["error"] = row["error"]
+            return job
+
+    def _purge(self):
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?",
+                (time.time() - self.retention_seconds,)
+            )
+
+    def _depths(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        depths = {"queued": 0, "running": 0, "succeeded": 0, "failed": 0}
+        depths.update({status: count for status, count in rows})
+        return depths
+
+    # --- async API ---
+
+    async def submit(self, kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Persist a job; raises QueueFullError when the backlog is at `max_queued`"""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        try:
+            job = await asyncio.to_thread(self._insert, kind, payload)
+        except QueueFullError:
+            self._stats["rejected"] += 1
+            raise
+        self._stats["submitted"] += 1
+        if self._wake is not None:
+            self._wake.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._get, job_id)
+
+    async def watch(self, job_id: str):
+        """Yield the job each time its status changes, ending at a terminal status"""
+        last_status = None
+        while True:
+            job = await self.get(job_id)
+            if job is None:
+                return
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield job
+            if job["status"] in TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        """Start the worker tasks on the running event loop"""
+        if self._tasks:
+            return
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.ensure_future(self._janitor()))
+
+    async def stop(self):
+        """Cancel the workers and requeue the jobs they were running"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        try:
+            released = await asyncio.to_thread(self._release)
+        except sqlite3.Error as e:
+            print(f"Job Queue Error: {str(e)}")
+            return
+        if released:
+            print(f"Job Queue: requeued {released} running job(s) on shutdown")
+
+    async def _worker(self):
+        while True:
+            try:
+                row = await asyncio.to_thread(self._claim) if self._handlers else None
+            except sqlite3.Error as e:
+                print(f"Job Queue Error: {str(e)}")
+                row = None
+            if row is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval * 4)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(row)
+
+    async def _run(self, row: sqlite3.Row):
+        job_id, kind = row["id"], row["kind"]
+        started = time.time()
+        self._stats["wait_ms_total"] += (started - row["created_at"]) * 1000
+        try:
+            result = await self._handlers[kind](json.loads(row["payload"]))
+            # Endpoint handlers report their own failures in-band
+            if isinstance(result, dict) and result.get("status") == "error":
+                status, error = "failed", result.get("error") or "Generation failed"
+            else:
+                status, error = "succeeded", None
+        except Exception as e:
+            logger.log_error(f"job:{kind}", e, {"job_id": job_id})
+            print(f"Job Error ({kind}): {str(e)}")
+            status, result, error = "failed", None, str(e) or type(e).__name__
+        self._stats[status] += 1
+        self._stats["run_ms_total"] += (time.time() - started) * 1000
+        await asyncio.to_thread(self._finish, job_id, status, result, error)
+
+    async def _janitor(self):
+        while True:
+            await asyncio.sleep(300)
+            try:
+                await asyncio.to_thread(self._purge)
+            except sqlite3.Error as e:
+                print(f"Job Queue Error: {str(e)}")
+
+    async def stats(self) -> Dict[str, Any]:
+        """Queue depth by status plus this worker's throughput and latency counters"""
+        depths = await asyncio.to_thread(self._depths)
+        finished = self._stats["succeeded"] + self._stats["failed"]
+        return {
+            "depth": depths,
+            "max_queued": self.max_queued,
+            "utilization": round(depths["queued"] / self.max_queued, 3) if self.max_queued else 0.0,
+            "workers": self.workers,
+            **{k: v for k, v in self._stats.items() if not k.endswith("_total")},
+            "avg_wait_ms": round(self._stats["wait_ms_total"] / finished, 2) if finished else 0.0,
+            "avg_run_ms": round(self._stats["run_ms_total"] / finished, 2) if finished else 0.0
+        }
+
+
+# Global queue; workers are started with the app
+job_queue = JobQueue.from_env()
@@ -0,0 +1,425 @@
+# JSON repair - tolerant local parsing and targeted re-asks for malformed model output
+import json
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from response_cache import cached_create
+
+# Where the response object starts: a brace followed by a (possibly
+# single-quoted or bare) key, or an empty object; "{placeholder}" in prose is skipped
+_OBJECT_START = re.compile(r"\{\s*(?:[\"'}]|[A-Za-z_]\w*\s*:)")
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+_BARE = re.compile(r"[A-Za-z0-9_+\-.]+")
+_LITERALS = {
+    "true": "true", "false": "false", "null": "null",
+    "True": "true", "False": "false", "None": "null",
+    "NaN": "null", "Infinity": "null", "-Infinity": "null", "undefined": "null"
+}
+_PLAIN = re.compile(r"[^\"'\\\x00-\x1f]+")
+_CONTROL = {"\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+
+REPAIR_MODEL = os.getenv("JSON_REPAIR_MODEL", "gpt-3.5-turbo")
+# Longest fragment sent back to the model; longer breakage is regenerated instead
+REPAIR_FRAGMENT_CHARS = int(os.getenv("JSON_REPAIR_FRAGMENT_CHARS", "8000"))
+
+REPAIR_PROMPT = """The JSON below was cut out of a larger object and does not parse ({error}).
+Return one JSON object with exactly the key "{key}" and its corrected value.
+Fix only syntax and structure: keep every name, text and number as written.
+The value must match this JSON schema: {schema}
+
+{fragment}"""
+
+
+class TruncatedJSONError(json.JSONDecodeError):
+    """The reply was cut off before its object closed.
+
+    Local repair could close it, but only by dropping whatever the model
+    never wrote, so it is not a success: callers escalate to the re-ask
+    tier (or regenerate). `partial` holds the salvaged object.
+    """
+
+    def __init__(self, error: json.JSONDecodeError, partial: Any = None):
+        super().__init__(f"Truncated response: {error.msg}", error.doc, error.pos)
+        self.partial = partial
+
+
+class RepairStats:
+    """Attempts, successes and latency per parsing tier.
+
+    Tiers: `strict` (json.loads), `local` (repair_json, only when strict
+    fails) and `reask` (a targeted re-ask of the cheap model with the broken
+    fragment, only when local repair fails). A truncated reply counts as a
+    local failure even though repair could close it.
+    """
+
+    TIERS = ("strict", "local", "reask")
+
+    def __init__(self):
+        self._stats = {tier: {"attempts": 0, "successes": 0, "total_ms": 0.0} for tier in self.TIERS}
+
+    def record(self, tier: str, ok: bool, elapsed_ms: float):
+        stats = self._stats[tier]
+        stats["attempts"] += 1
+        stats["successes"] += int(ok)
+        stats["total_ms"] += elapsed_ms
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-tier counters with success rate and mean latency"""
+        report = {}
+        for tier, s in self._stats.items():
+            attempts = s["attempts"]
+            report[tier] = {
+                "attempts": attempts,
+                "successes": s["successes"],
+                "success_rate": round(s["successes"] / attempts, 4) if attempts else None,
+                "avg_ms": round(s["total_ms"] / attempts, 3) if attempts else None
+            }
+        return report
+
+
+# Global counters shared by the validators and the re-ask tier
+repair_stats = RepairStats()
+
+
+def _read_string(text: str, i: int) -> Tuple[str, int, bool]:
+    """JSON encoding of the string literal opening at `i` (either quote style).
+
+    Returns (literal, index after it, terminated). Raw control characters
+    are escaped, `\\'` is unescaped and unknown escapes keep their backslash.
+    """
+    quote = text[i]
+    n = len(text)
+    parts = ['"']
+    j = i + 1
+    while j < n:
+        plain = _PLAIN.match(text, j)
+        if plain:
+            parts.append(plain.group(0))
+            j = plain.end()
+            if j >= n:
+                break
+        char = text[j]
+        if char == "\\":
+            if j + 1 >= n:
+                break
+            escaped = text[j + 1]
+            if escaped == "'":
+                parts.append("'")
+            elif escaped == "u":
+                if re.fullmatch(r"[0-9a-fA-F]{4}", text[j + 2:j + 6]):
+                    parts.append(text[j:j + 6])
+                    j += 6
+                    continue
+                if j + 6 > n:
+                    break
+                parts.append("\\\\u")
+            elif escaped in '"\\/bfnrt':
+                parts.append(char + escaped)
+            else:
+                parts.append("\\\\" + escaped)
+            j += 2
+            continue
+        if char == quote:
+            parts.append('"')
+            return "".join(parts), j + 1, True
+        if char == '"':
+            parts.append('\\"')
+        elif char < " ":
+            parts.append(_CONTROL.get(char) or "\\u%04x" % ord(char))
+        else:
+            parts.append(char)
+        j += 1
+    parts.append('"')
+    return "".join(parts), n, False
+
+
+def repair_json(text: str) -> Tuple[Optional[str], bool]:
+    """Rewrite the first JSON object in `text` into valid JSON.
+
+    Returns (json or None, truncated); `truncated` is True when the object
+    never closed and the result was cut back to its last complete value.
+
+    Fixes what models commonly get wrong without guessing at content:
+    trailing commas, single-quoted strings, unquoted keys, Python literals
+    (True/False/None), comments, raw newlines inside strings, and
+    truncation -- an unterminated string is closed, a dangling key or
+    partial literal is dropped and open arrays/objects are closed. Anything
+    else (a missing comma, an unescaped quote inside a string) is ambiguous
+    and returns None.
+    """
+    match = _OBJECT_START.search(text or "")
+    if not match:
+        return None, False
+    out: List[str] = []
+    # One [closer, state] per open container; state is what comes next:
+    # key / colon / value (after ':' or ',' or '[') / next (',' or closer)
+    stack: List[List[str]] = []
+    safe_len, safe_closers = 0, ""
+    i, n = match.start(), len(text)
+
+    while i < n:
+        char = text[i]
+        if char in " \t\r\n":
+            i += 1
+            continue
+        if text.startswith("//", i):
+            end = text.find("\n", i)
+            i = n if end < 0 else end
+            continue
+        if text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+            continue
+
+        frame = stack[-1] if stack else None
+        state = frame[1] if frame else "value"
+
+        if char in "}]":
+            if frame is None or frame[0] != char:
+                return None, False
+            if state == "colon" or (state == "value" and char == "}" and out[-1] == ":"):
+                return None, False
+            if out[-1] == ",":
+                out.pop()
+            out.append(stack.pop()[0])
+            i += 1
+            if not stack:
+                return "".join(out), False
+            stack[-1][1] = "next"
+            safe_len, safe_closers = len(out), "".join(f[0] for f in reversed(stack))
+            continue
+
+        if char == ",":
+            if state != "next":
+                return None, False
+            out.append(",")
+            frame[1] = "key" if frame[0] == "}" else "value"
+            i += 1
+            continue
+
+        if char == ":":
+            if state != "colon":
+                return None, False
+            out.append(":")
+            frame[1] = "value"
+            i += 1
+            continue
+
+        if state in ("next", "colon"):
+            return None, False
+
+        if state == "key":
+            if char in "\"'":
+                literal, i, terminated = _read_string(text, i)
+                if not terminated:
+                    break
+            else:
+                bare = _BARE.match(text, i)
+                if not bare:
+                    return None, False
+                literal, i = json.dumps(bare.group(0)), bare.end()
+            out.append(literal)
+            frame[1] = "colon"
+            continue
+
+        # A value
+        if char in "{[":
+            out.append(char)
+            stack.append(["}" if char == "{" else "]", "key" if char == "{" else "value"])
+            i += 1
+            safe_len, safe_closers = len(out), "".join(f[0] for f in reversed(stack))
+            continue
+        if char in "\"'":
+            literal, i, _ = _read_string(text, i)
+            out.append(literal)
+        else:
+            bare = _BARE.match(text, i)
+            if not bare:
+                return None, False
+            word = bare.group(0)
+            if bare.end() >= n:
+                break  # partial literal at the cut
+            if word in _LITERALS:
+                out.append(_LITERALS[word])
+            elif _NUMBER.fullmatch(word):
+                out.append(word)
+            else:
+                return None, False
+            i = bare.end()
+        if frame is not None:
+            frame[1] = "next"
+        safe_len, safe_closers = len(out), "".join(f[0] for f in reversed(stack))
+
+    # Truncated: cut back to the last complete value and close what is open
+    del out[safe_len:]
+    if out and out[-1] == ",":
+        out.pop()
+    return ("".join(out) + safe_closers if out else None), True
+
+
+def loads_tolerant(text: str, local: bool = True) -> Any:
+    """json.loads, falling back to repair_json; raises the original error if both fail.
+
+    A reply that was cut off raises TruncatedJSONError (a JSONDecodeError)
+    instead of returning the closed-off remainder. `local=False` skips the
+    repair tier, e.g. for a reply that stopped at max_tokens.
+    """
+    start = time.perf_counter()
+    try:
+        data = json.loads(text)
+        repair_stats.record("strict", True, _elapsed_ms(start))
+        return data
+    except json.JSONDecodeError as error:
+        repair_stats.record("strict", False, _elapsed_ms(start))
+        if not local:
+            raise
+        start = time.perf_counter()
+        repaired, truncated = repair_json(text)
+        try:
+            data = json.loads(repaired) if repaired is not None else None
+        except json.JSONDecodeError:
+            data = None
+        ok = isinstance(data, dict) and not truncated
+        repair_stats.record("local", ok, _elapsed_ms(start))
+        if truncated:
+            raise TruncatedJSONError(error, data if isinstance(data, dict) else None)
+        if not ok:
+            raise error
+        return data
+
+
+def _parse_error(text: str, start: int) -> json.JSONDecodeError:
+    try:
+        json.JSONDecoder().raw_decode(text, start)
+    except json.JSONDecodeError as error:
+        return error
+    return json.JSONDecodeError("Unexpected data", text, len(text))
+
+
+def _members(text: str, start: int, names: List[str]) -> List[Tuple[int, str]]:
+    """Positions of `"name":` for the schema's top-level properties, in text order"""
+    pattern = re.compile(r"[\"']?(%s)[\"']?\s*:" % "|".join(re.escape(name) for name in names))
+    return [(m.start(), m.group(1)) for m in pattern.finditer(text, start)]
+
+
+def broken_member(text: str, schema: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Split a malformed response around the top-level member holding the parse error.
+
+    Returns {"key", "fragment", "error", "before", "after"}: the member's
+    name, its raw text (`"key": ...`), the parse error, and the members
+    parsed from before and after it. None when the breakage is not inside
+    a recognizable member or the fragment is too long to re-ask.
+    """
+    match = _OBJECT_START.search(text or "")
+    names = list(schema.get("properties", {}))
+    if not match or not names:
+        return None
+    start = match.start()
+    error = _parse_error(text, start)
+    members = _members(text, start, names)
+    before = [m for m in members if m[0] <= error.pos]
+    if not before:
+        return None
+    member_start, key = before[-1]
+    after = [m for m in members if m[0] > error.pos]
+    member_end = after[0][0] if after else len(text)
+    fragment = text[member_start:member_end].rstrip().rstrip(",")
+    if not after and fragment.count("}") > fragment.count("{"):
+        # Last member: drop the root object's closing brace (and a closing fence)
+        fragment = re.sub(r"\}\s*(?:```\s*)?$", "", fragment).rstrip()
+    if len(fragment) > REPAIR_FRAGMENT_CHARS:
+        return None
+
+    def parse(part: str) -> Dict[str, Any]:
+        # The parts are cut mid-object, so go straight to repair (and keep them out of the stats)
+        repaired, _ = repair_json(part)
+        try:
+            data = json.loads(repaired) if repaired is not None else None
+        except json.JSONDecodeError:
+            data = None
+        return data if isinstance(data, dict) else {}
+
+    return {
+        "key": key,
+        "fragment": fragment,
+        "error": f"{error.msg} near character {error.pos - member_start}",
+        "before": parse(text[start:member_start]),
+        "after": parse("{" + text[member_end:]) if after else {}
+    }
+
+
+async def reask_repair(openai_client, endpoint: str, text: str, schema: Dict[str, Any]) -> Optional[str]:
+    """Fix a malformed response by re-asking the cheap model for the broken member only.
+
+    Returns the merged response as JSON text (for the endpoint's validator),
+    or None when the breakage cannot be isolated or the re-ask fails too.
+    """
+    start = time.perf_counter()
+    merged = None
+    try:
+        broken = broken_member(text, schema)
+        if broken is not None:
+            key = broken["key"]
+            prompt = REPAIR_PROMPT.format(
+                error=broken["error"],
+                key=key,
+                schema=json.dumps(schema["properties"][key], separators=(",", ":")),
+                fragment="{" + broken["fragment"] + "}"
+            )
+            response = await cached_create(
+                openai_client,
+                f"{endpoint}-repair",
+                model=REPAIR_MODEL,
+                messages=[
+                    {"role": "system", "content": "You repair malformed JSON. Respond only with valid JSON."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0,
+                max_tokens=min(4000, len(broken["fragment"]) // 3 + 200),
+                response_format={"type": "json_object"}
+            )
+            fixed = loads_tolerant(response.choices[0].message.content or "")
+            if isinstance(fixed, dict) and key in fixed:
+                merged = {**broken["before"], key: fixed[key], **broken["after"]}
+    except Exception as e:
+        print(f"JSON repair re-ask failed ({endpoint}): {str(e)}")
+    repair_stats.record("reask", merged is not None, _elapsed_ms(start))
+    return json.dumps(merged) if merged is not None else None
+
+
+async def parse_with_repair(openai_client, endpoint: str, text: str, schema: Dict[str, Any],
+                            truncated: bool = False) -> Dict[str, Any]:
+    """All three tiers for callers without a ResponseValidator method; raises ValueError if none works.
+
+    `truncated` marks a reply that stopped at max_tokens: only a strictly
+    valid object is accepted from it, anything else goes to the re-ask.
+    An object missing one of the schema's required properties counts as
+    unrepaired rather than being passed on for defaults to be filled in.
+    """
+    try:
+        data = loads_tolerant(text, local=not truncated)
+        if isinstance(data, dict) and not _missing_required(data, schema):
+            return data
+        if isinstance(data, dict):
+            # Complete but incomplete in content: a syntax re-ask cannot add what is missing
+            raise ValueError(f"Response from {endpoint} lacks {', '.join(_missing_required(data, schema))}")
+    except json.JSONDecodeError:
+        pass
+    repaired = await reask_repair(openai_client, endpoint, text, schema)
+    if repaired is None:
+        raise ValueError(f"Unrepairable JSON response from {endpoint}")
+    data = json.loads(repaired)
+    missing = _missing_required(data, schema)
+    if missing:
+        raise ValueError(f"Repaired response from {endpoint} lacks {', '.join(missing)}")
+    return data
+
+
+def _missing_required(data: Dict[str, Any], schema: Dict[str, Any]) -> List[str]:
+    return [name for name in schema.get("required", ()) if data.get(name) is None]
+
+
+def _elapsed_ms(start: float) -> float:
+    return (time.perf_counter() - start) * 1000
@@ -57,6 +57,19 @@ class AILogger:
             error_msg += f", Context: {context}"
         self.logger.error(error_msg, exc_info=True)
     
+    def log_timing(self, endpoint: str, timings: dict):
+        """Log per-stage timings (milliseconds)"""
+        stages = ", ".join(f"{stage}={ms}ms" for stage, ms in timings.items())
+        self.logger.info(f"AI Timing - Endpoint: {endpoint}, {stages}")
+    
+    def log_tokens(self, endpoint: str, report: dict):
+        """Log prompt token budgeting (before/after counts and reduced fields)"""
+        self.logger.info(
+            f"AI Tokens - Endpoint: {endpoint}, Before: {report.get('tokens_before')}, "
+            f"After: {report.get('tokens_after')}, Budget: {report.get('budget')}, "
+            f"Summarized: {report.get('summarized')}, Dropped: {report.get('dropped')}"
+        )
+    
     def log_validation(self, endpoint: str, is_valid: bool, errors: list):
         """Log validation results"""
         status = "PASSED" if is_valid else "FAILED"
@@ -1,10 +1,35 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import os
 import openai
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
+import json
+import time
+import asyncio
+
+from ai_manager import AIManager
+from batch_runner import stream_batch
+from chat_history import history_manager
+from client_factory import client_factory
+from job_queue import QueueFullError, job_queue
+from json_repair import loads_tolerant, parse_with_repair, reask_repair, repair_stats
+from pipeline import StructuredPipeline
+from portfolio_analytics import report_input
+from prompt_encoder import encode_project
+from prompt_registry import prompt_registry
+from rate_limiter import rate_limiter
+from semantic_cache import StoreOnComplete, semantic_cache
+from resilience import resilient
+from response_cache import cached_create, response_cache
+from risk_engine import score_portfolio
+from singleflight import SingleFlight, singleflight
+from stream_validator import EMIT_PATHS, StreamingValidator
+from streaming import SSE_HEADERS, sse_event, stream_completion
+from token_budget import count_message_tokens, token_budgeter
+from validation import ResponseValidator
 
 # Load environment variables
 load_dotenv()
@@ -24,13 +49,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize OpenAI client
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if OPENAI_API_KEY and OPENAI_API_KEY != "your_openai_api_key_here":
+# Initialize OpenAI client: one pooled client per worker, shared by every call site
+if client_factory.configured:
     try:
-        from openai import OpenAI
-        openai_client = OpenAI(api_key=OPENAI_API_KEY)
-        print("✅ OpenAI API configured successfully")
+        openai_client = client_factory.get_client()
+        print(f"✅ OpenAI API configured successfully (HTTP/2: {client_factory.http2})")
     except Exception as e:
         print(f"⚠️  OpenAI initialization error: {e}")
         openai_client = None
@@ -38,6 +61,38 @@ else:
     print("⚠️  Warning: OPENAI_API_KEY not found or not configured. AI features will use placeholder responses.")
     openai_client = None
 
+# Structured generators share the engine's client and run through
+# generate -> extract -> validate pipelines
+ai_manager = AIManager(openai_client=openai_client)
+
+project_setup_pipeline = StructuredPipeline(
+    "project-setup",
+    ai_manager.generate_project_setup,
+    ResponseValidator.validate_project_setup,
+    extract=ResponseValidator.extract_json,
+    repair=lambda text: reask_repair(openai_client, "project-setup", text, ResponseValidator.PROJECT_SETUP_SCHEMA)
+)
+risk_analysis_pipeline = StructuredPipeline(
+    "risk-analysis",
+    ai_manager.generate_risk_analysis,
+    ResponseValidator.validate_risk_analysis,
+    extract=ResponseValidator.extract_json,
+    repair=lambda text: reask_repair(openai_client, "risk-analysis", text, ResponseValidator.RISK_ANALYSIS_SCHEMA)
+)
+reporting_pipeline = StructuredPipeline(
+    "reporting",
+    ai_manager.generate_report,
+    ResponseValidator.validate_reporting,
+    extract=ResponseValidator.extract_json,
+    repair=lambda text: reask_repair(openai_client, "reporting", text, ResponseValidator.REPORTING_SCHEMA)
+)
+# PMO reports carry a plain-text section too; validate_pmo_report splits them itself
+pmo_report_pipeline = StructuredPipeline(
+    "pmo-report",
+    ai_manager.generate_pmo_report,
+    ResponseValidator.validate_pmo_report
+)
+
 class CharterRequest(BaseModel):
     projectName: str
     description: str
@@ -47,17 +102,50 @@ class RiskRequest(BaseModel):
     projectId: int
     projectData: dict
 
+class RiskBatchRequest(BaseModel):
+    items: List[RiskRequest]
+    max_concurrency: Optional[int] = None
+
 class ProjectSetupRequest(BaseModel):
-    projectName: str
-    description: str
+    project: str
+    progress: int
+
+class RiskAnalysisRequest(BaseModel):
+    project_description: str
     duration: str
-    teamSize: int
+    team_size: int
+
+class ReportingRequest(BaseModel):
+    progress_data: Any = None
+    project_ids: Optional[List[int]] = None
+
+class PMOReportRequest(BaseModel):
+    project_data: Any = None
+    project_ids: Optional[List[int]] = None
+
+class CalculateRiskRequest(BaseModel):
+    project_id: int
+    include_summary: bool = False
+    materiality: Optional[float] = None
+
+class RiskChangesRequest(BaseModel):
+    events: List[Dict[str, Any]]
+    include_summary: bool = False
+    materiality: Optional[float] = None
+
+class PortfolioRiskRequest(BaseModel):
+    projects: Optional[List[Dict[str, Any]]] = None
+    project_ids: Optional[List[int]] = None
 
 class ChatRequest(BaseModel):
     message: str
     conversation_history: Optional[List[Dict[str, str]]] = []
+    conversation_id: Optional[Any] = None
     project_context: Optional[Dict[str, Any]] = None
     language: str = "en"
+    # Semantic cache namespace (the backend sends the user); answers are never
+    # shared across tenants, and requests without one bypass the cache
+    tenant: Optional[str] = None
 
 class LessonsLearnedRequest(BaseModel):
     project_id: Optional[int] = None
@@ -68,23 +156,32 @@ def root():
     """Health check endpoint"""
     return {
         "message": "PaxiPM AI Engine Running",
-        "openai_configured": bool(OPENAI_API_KEY)
+        "openai_configured": client_factory.configured
     }
 
-@app.post("/generate-charter")
-def generate_charter(req: CharterRequest):
-    """
-    Generate AI-powered project charter
-    
-    Args:
-        req: CharterRequest with projectName and description
-        
-    Returns:
-        JSON with projectName and generated charter text
-    """
-    if not openai_client:
-        # Fallback placeholder response
-        charter_text = f"""# Project Charter: {req.projectName}
+@app.get("/metrics")
+async def metrics():
+    """Engine performance counters"""
+    return {
+        "response_cache": response_cache.stats() if response_cache else {"enabled": False},
+        "singleflight": singleflight.stats(),
+        "prompt_registry": prompt_registry.stats(),
+        "token_budget": token_budgeter.stats(),
+        "chat_history": history_manager.stats(),
+        "openai_pool": client_factory.stats(),
+        "resilience": resilient.stats(),
+        "rate_limiter": rate_limiter.stats() if rate_limiter else {"enabled": False},
+        "job_queue": await job_queue.stats(),
+        "json_repair": repair_stats.stats(),
+        "project_store": ai_manager.project_store.stats(),
+        "risk_state": ai_manager.risk_state.stats(),
+        "semantic_cache": semantic_cache.stats() if semantic_cache else {"enabled": False},
+        "artifact_index": ai_manager.artifact_index.stats() if ai_manager.artifact_index else {"enabled": False}
+    }
+
+def _placeholder_charter(req: CharterRequest) -> str:
+    """Charter returned when OpenAI is not configured"""
+    return f"""# Project Charter: {req.projectName}
 
 ## Project Description
 {req.description}
@@ -111,20 +208,17 @@ Project timeline will be determined based on detailed planning phase.
 ---
 *Note: This is a placeholder response. Configure OPENAI_API_KEY in .env for AI-generated content.*
 """
-        return {"projectName": req.projectName, "charter": charter_text}
-    
-    try:
-        # OpenAI API call using new client format
-        response = openai_client.chat.completions.create(
-            model="gpt-4",  # or gpt-3.5-turbo for faster/cheaper
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert project management consultant. Generate professional project charters following PMP standards."
-                },
-                {
-                    "role": "user",
-                    "content": f"""Generate a comprehensive project charter for:
+
+def _charter_messages(req: CharterRequest) -> List[Dict[str, str]]:
+    """Prompt messages for charter generation (shared by the streaming endpoint)"""
+    return [
+        {
+            "role": "system",
+            "content": "You are an expert project management consultant. Generate professional project charters following PMP standards."
+        },
+        {
+            "role": "user",
+            "content": f"""Generate a comprehensive project charter for:
 
 Project Name: {req.projectName}
 Description: {req.description}
@@ -139,13 +233,48 @@ Include:
 6. Timeline Overview
 
 Format as professional markdown."""
-                }
-            ],
-            temperature=0.7,
-            max_tokens=1500
-        )
+        }
+    ]
+
+async def _charter_params(req: CharterRequest) -> Dict[str, Any]:
+    """Completion params for charter generation, with examples of similar past charters"""
+    return await ai_manager.with_examples(
+        "charter",
+        AIManager.charter_query(req.projectName, req.description, req.client),
+        {"model": "gpt-4", "messages": _charter_messages(req), "temperature": 0.7, "max_tokens": 1500}
+    )
+
+@app.post("/generate-charter")
+async def generate_charter(req: CharterRequest):
+    """
+    Generate AI-powered project charter
+    
+    Concurrent requests with an identical payload share one generation.
+    
+    Args:
+        req: CharterRequest with projectName and description
+        
+    Returns:
+        JSON with projectName and generated charter text
+    """
+    key = SingleFlight.make_key("generate-charter", req.model_dump())
+    return await singleflight.do(key, lambda: _generate_charter(req))
+
+async def _generate_charter(req: CharterRequest):
+    if not openai_client:
+        # Fallback placeholder response
+        charter_text = _placeholder_charter(req)
+        return {"projectName": req.projectName, "charter": charter_text}
+    
+    try:
+        # OpenAI API call using new client format
+        response = await cached_create(openai_client, "generate-charter", **await _charter_params(req))
         
         charter_text = response.choices[0].message.content.strip()
+        if response.choices[0].finish_reason == "stop":
+            await ai_manager.record_artifact(
+                "charter", AIManager.charter_query(req.projectName, req.description, req.client), charter_text
+            )
         return {"projectName": req.projectName, "charter": charter_text}
         
     except Exception as e:
@@ -154,17 +283,94 @@ Format as professional markdown."""
         charter_text = f"# Project Charter: {req.projectName}\n\n{req.description}\n\n[AI generation temporarily unavailable]"
         return {"projectName": req.projectName, "charter": charter_text}
 
+@app.post("/generate-charter/stream")
+async def generate_charter_stream(req: CharterRequest):
+    """
+    Stream an AI-generated project charter as Server-Sent Events
+    
+    Args:
+        req: CharterRequest with projectName and description
+        
+    Returns:
+        text/event-stream of `delta` frames ({"content"}) followed by a `done`
+        frame with projectName, tokens_used and ttft_ms
+    """
+    if not openai_client:
+        events = _single_event_stream(_placeholder_charter(req), {"projectName": req.projectName})
+    else:
+        events = stream_completion(
+            openai_client,
+            "generate-charter",
+            done_fields={"projectName": req.projectName},
+            **await _charter_params(req)
+        )
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
+RISK_UNAVAILABLE = {
+    "risk_score": 50,
+    "risk_summary": "Risk analysis temporarily unavailable.",
+    "recommendations": ["Check project data quality", "Retry analysis later"]
+}
+
 @app.post("/analyze-risk")
-def analyze_risk(req: RiskRequest):
+async def analyze_risk(req: RiskRequest):
     """
     Enhanced risk prediction using AI with predictive analytics
     
+    Dashboard widgets often request the same project at once; concurrent
+    requests with an identical payload share one upstream call.
+    
     Args:
         req: RiskRequest with projectId and projectData
         
     Returns:
         JSON with risk_score (0-100), risk_summary, recommendations, and predictive insights
     """
+    key = SingleFlight.make_key("analyze-risk", req.model_dump())
+    try:
+        return await singleflight.do(key, lambda: _analyze_risk(req))
+    except Exception as e:
+        print(f"Risk Analysis Error: {str(e)}")
+        return RISK_UNAVAILABLE
+
+# Fan-out limits for /analyze-risk/batch
+RISK_BATCH_CONCURRENCY = int(os.getenv("RISK_BATCH_CONCURRENCY", "8"))
+RISK_BATCH_MAX_ITEMS = int(os.getenv("RISK_BATCH_MAX_ITEMS", "1000"))
+
+@app.post("/analyze-risk/batch")
+async def analyze_risk_batch(req: RiskBatchRequest):
+    """
+    Risk analysis for many projects in one request
+    
+    Args:
+        req: RiskBatchRequest with items (RiskRequest list) and optional max_concurrency
+        
+    Returns:
+        application/x-ndjson stream: one line per item as it completes
+        ({"index", "projectId", "status": "ok"|"error", "result"|"error",
+        "elapsed_ms", "deduplicated"}), then a {"done": true, ...} summary line
+    """
+    if len(req.items) > RISK_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {RISK_BATCH_MAX_ITEMS} items")
+    
+    concurrency = min(req.max_concurrency or RISK_BATCH_CONCURRENCY, RISK_BATCH_CONCURRENCY)
+    
+    def key(item: RiskRequest) -> str:
+        return SingleFlight.make_key("analyze-risk", item.model_dump())
+    
+    lines = stream_batch(
+        "analyze-risk-batch",
+        req.items,
+        key=key,
+        # Shares in-flight calls (and the response cache) with /analyze-risk
+        work=lambda item: singleflight.do(key(item), lambda: _analyze_risk(item)),
+        concurrency=concurrency,
+        describe=lambda item: {"projectId": item.projectId}
+    )
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+async def _analyze_risk(req: RiskRequest):
+    """Risk analysis for one project; upstream errors propagate to the caller"""
     if not openai_client:
         # Fallback placeholder response
         return {
@@ -177,21 +383,31 @@ def analyze_risk(req: RiskRequest):
             ]
         }
     
-    try:
-        # Prepare project data summary for AI
-        project_summary = f"Project ID: {req.projectId}\n"
-        project_summary += f"Project Data: {str(req.projectData)}"
-        
-        response = openai_client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a risk analysis expert. Analyze project data and provide risk scores (0-100), summaries, and actionable recommendations. Always respond with valid JSON."
-                },
-                {
-                    "role": "user",
-                    "content": f"""Analyze the following project data and provide comprehensive risk assessment with predictive insights:
+    # Prepare project data summary for AI, shrunk to the input token budget
+    # (CPU-bound on large projects, so off the event loop)
+    project_data, _ = await asyncio.to_thread(
+        token_budgeter.fit,
+        req.projectData,
+        model="gpt-4",
+        max_tokens=800,
+        endpoint="analyze-risk",
+        serialize=encode_project
+    )
+    project_summary = f"Project ID: {req.projectId}\n"
+    project_summary += f"Project Data:\n{await asyncio.to_thread(encode_project, project_data)}"
+    
+    response = await cached_create(
+        openai_client,
+        "analyze-risk",
+        model="gpt-4",
+        messages=[
+            {
+                "role": "system",
+                "content": "You are a risk analysis expert. Analyze project data and provide risk scores (0-100), summaries, and actionable recommendations. Always respond with valid JSON."
+            },
+            {
+                "role": "user",
+                "content": f"""Analyze the following project data and provide comprehensive risk assessment with predictive insights:
 
 1. Risk Score (0-100): Integer score based on current and predicted risks
 2. Risk Summary: Detailed summary of identified risks
@@ -206,110 +422,140 @@ Project Data:
 
 Respond ONLY with valid JSON format (no markdown, no code blocks):
 {{
-    "risk_score": <integer 0-100>,
-    "risk_summary": "<text>",
-    "risk_categories": {{
-        "schedule": <score 0-100>,
-        "budget": <score 0-100>,
-        "resource": <score 0-100>,
-        "technical": <score 0-100>,
-        "stakeholder": <score 0-100>
-    }},
-    "recommendations": [
-        {{"action": "<text>", "priority": "<high|medium|low>"}}
-    ],
-    "predictive_insights": {{
-        "trend": "<increasing|stable|decreasing>",
-        "predicted_risks": ["<risk1>", "<risk2>"],
-        "early_warnings": ["<warning1>", "<warning2>"]
-    }}
+"risk_score": <integer 0-100>,
+"risk_summary": "<text>",
+"risk_categories": {{
+    "schedule": <score 0-100>,
+    "budget": <score 0-100>,
+    "resource": <score 0-100>,
+    "technical": <score 0-100>,
+    "stakeholder": <score 0-100>
+}},
+"recommendations": [
+    {{"action": "<text>", "priority": "<high|medium|low>"}}
+],
+"predictive_insights": {{
+    "trend": "<increasing|stable|decreasing>",
+    "predicted_risks": ["<risk1>", "<risk2>"],
+    "early_warnings": ["<warning1>", "<warning2>"]
+}}
 }}"""
-                }
-            ],
-            temperature=0.5,
-            max_tokens=800,
-            response_format={"type": "json_object"}
-        )
-        
-        # Parse AI response
-        import json
-        ai_response = response.choices[0].message.content.strip()
-        
-        # Parse JSON response
-        try:
-            risk_data = json.loads(ai_response)
-            return risk_data
-        except json.JSONDecodeError:
-            # Fallback if JSON parsing fails
-            return {
-                "risk_score": 50,
-                "risk_summary": ai_response[:200] if ai_response else "Analysis unavailable",
-                "recommendations": ["Review AI response for detailed recommendations"]
             }
-            
-    except Exception as e:
-        print(f"Risk Analysis Error: {str(e)}")
-        return {
-            "risk_score": 50,
-            "risk_summary": "Risk analysis temporarily unavailable.",
-            "recommendations": ["Check project data quality", "Retry analysis later"]
-        }
+        ],
+        temperature=0.5,
+        max_tokens=800,
+        response_format={"type": "json_object"}
+    )
+    
+    # Parse AI response; malformed JSON is repaired (locally, then by re-asking
+    # for the broken member) instead of being replaced with a placeholder. A
+    # cut-off reply or one missing required fields raises instead of going out
+    ai_response = response.choices[0].message.content.strip()
+    data = await parse_with_repair(
+        openai_client,
+        "analyze-risk",
+        ai_response,
+        ResponseValidator.ANALYZE_RISK_SCHEMA,
+        truncated=response.choices[0].finish_reason == "length"
+    )
+    return ResponseValidator.validate_and_fix(data, ResponseValidator.ANALYZE_RISK_SCHEMA)
+
+CHAT_PLACEHOLDER = "I'm an AI assistant for project management. I can help you with:\n- Project planning and setup\n- Risk analysis\n- Progress reporting\n- Project management best practices\n\nTo enable full AI capabilities, please configure OPENAI_API_KEY in your environment."
+
+async def _chat_messages(req: ChatRequest) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+    """System prompt, compacted conversation history and the new user message"""
+    # Build system prompt based on project context
+    system_prompt = "You are an expert AI assistant for project management (PMP, ITIL, Agile, SAFe). You help project managers with:\n"
+    system_prompt += "- Project planning and charter generation\n"
+    system_prompt += "- Risk analysis and mitigation strategies\n"
+    system_prompt += "- Progress reporting and status updates\n"
+    system_prompt += "- Resource management and allocation\n"
+    system_prompt += "- Best practices in project management\n"
+    system_prompt += "- IT infrastructure and software delivery projects\n\n"
+    system_prompt += "Provide clear, actionable advice based on project management frameworks."
+    
+    # Add project context if available
+    if req.project_context:
+        project_info = f"\nCurrent Project Context:\n"
+        project_info += f"- Title: {req.project_context.get('title', 'N/A')}\n"
+        project_info += f"- Description: {req.project_context.get('description', 'N/A')[:200]}\n"
+        project_info += f"- Status: {req.project_context.get('status', 'N/A')}\n"
+        if req.project_context.get('risk_score') is not None:
+            project_info += f"- Risk Score: {req.project_context.get('risk_score')}/100\n"
+        system_prompt += project_info
+    
+    # Recent turns verbatim, older turns folded into a rolling summary
+    return await history_manager.build_messages(
+        openai_client,
+        system_prompt,
+        history_manager.normalize(req.conversation_history, req.message),
+        req.message,
+        model="gpt-4",
+        max_tokens=1000,
+        conversation_id=req.conversation_id
+    )
+
+def _chat_cache_context(req: ChatRequest) -> Dict[str, Any]:
+    """Everything besides the question that shapes a chat answer: the project fields in the prompt, language and prior turns"""
+    context = req.project_context or {}
+    return {
+        "language": req.language,
+        "project": {
+            "title": context.get('title'),
+            "description": (context.get('description') or '')[:200],
+            "status": context.get('status'),
+            "risk_score": context.get('risk_score')
+        },
+        "history": history_manager.normalize(req.conversation_history, req.message)
+    }
+
+async def _semantic_lookup(req: ChatRequest) -> Optional[Dict[str, Any]]:
+    """Semantic cache probe for a chat request (None when the cache is disabled or no tenant is given)"""
+    if not semantic_cache or not req.tenant:
+        return None
+    return await asyncio.to_thread(
+        semantic_cache.lookup, req.tenant, req.message, _chat_cache_context(req)
+    )
 
 @app.post("/chat")
-def chat(req: ChatRequest):
+async def chat(req: ChatRequest):
     """
     AI Chat Assistant endpoint
     
+    A question close enough to one already answered for the same tenant,
+    project context and prior turns is answered from the semantic cache.
+    
     Args:
-        req: ChatRequest with message, conversation_history, project_context, and language
+        req: ChatRequest with message, conversation_history, project_context, language and tenant
         
     Returns:
-        JSON with response message from AI
+        JSON with response message from AI (plus semantic_cache on a cache hit)
     """
     if not openai_client:
         # Fallback placeholder response
         return {
-            "response": "I'm an AI assistant for project management. I can help you with:\n- Project planning and setup\n- Risk analysis\n- Progress reporting\n- Project management best practices\n\nTo enable full AI capabilities, please configure OPENAI_API_KEY in your environment.",
+            "response": CHAT_PLACEHOLDER,
             "tokens_used": 0
         }
     
     try:
-        # Build system prompt based on project context
-        system_prompt = "You are an expert AI assistant for project management (PMP, ITIL, Agile, SAFe). You help project managers with:\n"
-        system_prompt += "- Project planning and charter generation\n"
-        system_prompt += "- Risk analysis and mitigation strategies\n"
-        system_prompt += "- Progress reporting and status updates\n"
-        system_prompt += "- Resource management and allocation\n"
-        system_prompt += "- Best practices in project management\n"
-        system_prompt += "- IT infrastructure and software delivery projects\n\n"
-        system_prompt += "Provide clear, actionable advice based on project management frameworks."
-        
-        # Add project context if available
-        if req.project_context:
-            project_info = f"\nCurrent Project Context:\n"
-            project_info += f"- Title: {req.project_context.get('title', 'N/A')}\n"
-            project_info += f"- Description: {req.project_context.get('description', 'N/A')[:200]}\n"
-            project_info += f"- Status: {req.project_context.get('status', 'N/A')}\n"
-            if req.project_context.get('risk_score') is not None:
-                project_info += f"- Risk Score: {req.project_context.get('risk_score')}/100\n"
-            system_prompt += project_info
-        
-        # Build messages array with conversation history
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        # Add conversation history
-        for msg in req.conversation_history:
-            if msg.get("role") and msg.get("content"):
-                messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
+        # Paraphrases of an answered question are served without calling the model
+        probe = await _semantic_lookup(req)
+        if probe and probe["hit"]:
+            return {
+                "response": probe["hit"]["answer"],
+                "tokens_used": 0,
+                "tokens_saved": probe["hit"]["tokens"],
+                "semantic_cache": {"hit": True, "similarity": probe["hit"]["similarity"]}
+            }
         
-        # Add current user message
-        messages.append({"role": "user", "content": req.message})
+        start = time.perf_counter()
+        messages, history_report = await _chat_messages(req)
         
         # Call OpenAI API
-        response = openai_client.chat.completions.create(
+        response = await cached_create(
+            openai_client,
+            "chat",
             model="gpt-4",
             messages=messages,
             temperature=0.7,
@@ -319,9 +565,15 @@ def chat(req: ChatRequest):
         ai_response = response.choices[0].message.content.strip()
         tokens_used = response.usage.total_tokens if hasattr(response, 'usage') else 0
         
+        if probe and response.choices[0].finish_reason == "stop":
+            await asyncio.to_thread(
+                semantic_cache.store, probe, ai_response, tokens_used, (time.perf_counter() - start) * 1000
+            )
+        
         return {
             "response": ai_response,
-            "tokens_used": tokens_used
+            "tokens_used": tokens_used,
+            "tokens_saved": history_report["tokens_saved"]
         }
         
     except Exception as e:
@@ -331,8 +583,42 @@ def chat(req: ChatRequest):
             "tokens_used": 0
         }
 
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """
+    AI Chat Assistant endpoint streamed as Server-Sent Events
+    
+    Args:
+        req: ChatRequest with message, conversation_history, project_context, and language
+        
+    Returns:
+        text/event-stream of `delta` frames ({"content"}) followed by a `done`
+        frame with tokens_used, tokens_saved and ttft_ms
+    """
+    probe = await _semantic_lookup(req) if openai_client else None
+    if not openai_client:
+        events = _single_event_stream(CHAT_PLACEHOLDER)
+    elif probe and probe["hit"]:
+        events = _single_event_stream(probe["hit"]["answer"], {
+            "tokens_saved": probe["hit"]["tokens"],
+            "semantic_cache": {"hit": True, "similarity": probe["hit"]["similarity"]}
+        })
+    else:
+        messages, history_report = await _chat_messages(req)
+        events = stream_completion(
+            openai_client,
+            "chat",
+            done_fields={"tokens_saved": history_report["tokens_saved"]},
+            observer=StoreOnComplete(semantic_cache, probe, count_message_tokens(messages)) if probe else None,
+            model="gpt-4",
+            messages=messages,
+            temperature=0.7,
+            max_tokens=1000
+        )
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
 @app.post("/lessons-learned")
-def lessons_learned(req: LessonsLearnedRequest):
+async def lessons_learned(req: LessonsLearnedRequest):
     """
     Generate lessons learned report for a project
     
@@ -368,13 +654,22 @@ def lessons_learned(req: LessonsLearnedRequest):
         }
     
     try:
-        # Prepare project data summary for AI
+        # Prepare project data summary for AI, shrunk to the input token budget
+        # (CPU-bound on large projects, so off the event loop)
+        project_data, _ = await asyncio.to_thread(
+            token_budgeter.fit,
+            req.project_data,
+            model="gpt-4",
+            max_tokens=2000,
+            endpoint="lessons-learned",
+            serialize=encode_project
+        )
         project_summary = f"Project ID: {req.project_id}\n" if req.project_id else ""
-        project_summary += f"Project Data: {str(req.project_data)}"
+        project_summary += f"Project Data:\n{await asyncio.to_thread(encode_project, project_data)}"
         
-        response = openai_client.chat.completions.create(
-            model="gpt-4",
-            messages=[
+        params = await ai_manager.with_examples("lessons-learned", project_summary, {
+            "model": "gpt-4",
+            "messages": [
                 {
                     "role": "system",
                     "content": "You are a project management expert specializing in lessons learned analysis. Analyze project data and provide comprehensive lessons learned reports with actionable insights."
@@ -398,17 +693,21 @@ Provide a detailed analysis including:
 Format as structured JSON with clear sections."""
                 }
             ],
-            temperature=0.7,
-            max_tokens=2000,
-            response_format={"type": "json_object"}
-        )
+            "temperature": 0.7,
+            "max_tokens": 2000,
+            "response_format": {"type": "json_object"}
+        })
+        response = await cached_create(openai_client, "lessons-learned", **params)
         
         # Parse AI response
         import json
         ai_response = response.choices[0].message.content.strip()
         
         try:
-            lessons_data = json.loads(ai_response)
+            # A reply cut off at max_tokens is not patched up into a partial report
+            lessons_data = loads_tolerant(ai_response, local=response.choices[0].finish_reason != "length")
+            if isinstance(lessons_data, dict):
+                await ai_manager.record_artifact("lessons-learned", project_summary, lessons_data)
             return {
                 "status": "success",
                 "data": lessons_data
@@ -441,6 +740,387 @@ Format as structured JSON with clear sections."""
             }
         }
 
+async def _single_event_stream(content: str, done_fields: dict = None):
+    """SSE stream for a response known up front (placeholders, semantic cache hits)"""
+    yield sse_event("delta", {"content": content})
+    yield sse_event("done", {**(done_fields or {}), "tokens_used": 0})
+
+def _structured_unavailable() -> dict:
+    """Response for structured endpoints when no OpenAI client is configured"""
+    return {
+        "status": "error",
+        "error": "AI generation requires OpenAI API configuration",
+        "data": None
+    }
+
+def _report_prompt_text(value: Any) -> str:
+    """Pass strings through; encode structured payloads compactly, with task and milestone rows replaced by precomputed KPIs"""
+    return encode_project(report_input(value))
+
+async def _report_source(data: Any, project_ids: Optional[List[int]]) -> Any:
+    """The payload to report on: the request's data, or the listed projects loaded in bulk"""
+    if project_ids:
+        return {"projects": await ai_manager.project_store.fetch_projects(project_ids)}
+    return data
+
+@app.post("/project-setup")
+async def project_setup(req: ProjectSetupRequest):
+    """
+    Generate project setup (overview, WBS, timeline, resources, risks)
+    
+    Args:
+        req: ProjectSetupRequest with project and progress
+        
+    Returns:
+        JSON with status, validated data, errors and stage timings
+    """
+    if not ai_manager.openai_client:
+        return _structured_unavailable()
+    
+    try:
+        result = await project_setup_pipeline.run(project=req.project, progress=req.progress)
+        if result["status"] == "success":
+            await ai_manager.record_artifact("project-setup", req.project, result["data"])
+        return result
+    except Exception as e:
+        print(f"Project Setup Error: {str(e)}")
+        return {"status": "error", "error": "Failed to generate project setup", "data": None}
+
+@app.post("/risk-analysis")
+async def risk_analysis(req: RiskAnalysisRequest):
+    """
+    Generate risk analysis (charter, WBS and key risks)
+    
+    Args:
+        req: RiskAnalysisRequest with project_description, duration and team_size
+        
+    Returns:
+        JSON with status, validated data, errors and stage timings
+    """
+    if not ai_manager.openai_client:
+        return _structured_unavailable()
+    
+    try:
+        result = await risk_analysis_pipeline.run(
+            project_description=req.project_description,
+            duration=req.duration,
+            team_size=req.team_size
+        )
+        if result["status"] == "success":
+            query = AIManager.risk_analysis_query(req.project_description, req.duration, req.team_size)
+            await ai_manager.record_artifact("risk-analysis", query, result["data"])
+        return result
+    except Exception as e:
+        print(f"Risk Analysis Pipeline Error: {str(e)}")
+        return {"status": "error", "error": "Failed to generate risk analysis", "data": None}
+
+@app.post("/reporting")
+async def reporting(req: ReportingRequest):
+    """
+    Analyze progress data into a risk-rated report
+    
+    Args:
+        req: ReportingRequest with progress_data (text or JSON), or
+             project_ids to report on projects loaded from the database
+        
+    Returns:
+        JSON with status, validated data (risk_score, risk_summary, recommendations), errors and stage timings
+    """
+    if not ai_manager.openai_client:
+        return _structured_unavailable()
+    
+    try:
+        source = await _report_source(req.progress_data, req.project_ids)
+        progress_data = await asyncio.to_thread(_report_prompt_text, source)
+        return await reporting_pipeline.run(progress_data=progress_data)
+    except Exception as e:
+        print(f"Reporting Error: {str(e)}")
+        return {"status": "error", "error": "Failed to generate report", "data": None}
+
+@app.post("/pmo-report")
+async def pmo_report(req: PMOReportRequest):
+    """
+    Generate PMO status report
+    
+    Args:
+        req: PMOReportRequest with project_data (text or JSON), or
+             project_ids to report on projects loaded from the database
+        
+    Returns:
+        JSON with status, data (plain_text_report, json_summary), errors and stage timings
+    """
+    if not ai_manager.openai_client:
+        return _structured_unavailable()
+    
+    try:
+        source = await _report_source(req.project_data, req.project_ids)
+        project_data = await asyncio.to_thread(_report_prompt_text, source)
+        return await pmo_report_pipeline.run(project_data=project_data)
+    except Exception as e:
+        print(f"PMO Report Error: {str(e)}")
+        return {"status": "error", "error": "Failed to generate PMO report", "data": None}
+
+# Attempts per structured stream; a schema violation aborts the attempt and starts the next
+STRUCTURED_STREAM_ATTEMPTS = int(os.getenv("STRUCTURED_STREAM_ATTEMPTS", "2"))
+
+async def _structured_stream(endpoint: str, schema: dict, validate, params: dict):
+    """Validated SSE stream for the structured endpoints.
+
+    Completed items are sent as they close (`phase`, `milestone`, `risk` or
+    `action` frames: {"index", "data"}), and the `done` frame carries the
+    same status/data/errors as the non-streaming endpoint. When the output
+    can no longer match the schema the generation is cut off and retried
+    at once; a `retry` frame ({"attempt", "error"}) tells the client to drop
+    the items it got from the failed attempt.
+    """
+    for attempt in range(1, STRUCTURED_STREAM_ATTEMPTS + 1):
+        validator = StreamingValidator(schema, EMIT_PATHS[endpoint], validate)
+        async for frame in stream_completion(
+            openai_client,
+            endpoint,
+            done_fields={"attempt": attempt},
+            observer=validator,
+            forward_deltas=False,
+            **params
+        ):
+            if validator.violation and attempt < STRUCTURED_STREAM_ATTEMPTS and frame.startswith("event: error"):
+                yield sse_event("retry", {"attempt": attempt + 1, "error": validator.violation})
+                break
+            yield frame
+        if not validator.violation:
+            return
+
+def _structured_stream_response(events) -> StreamingResponse:
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
+async def _unavailable_stream():
+    yield sse_event("error", _structured_unavailable())
+
+@app.post("/project-setup/stream")
+async def project_setup_stream(req: ProjectSetupRequest):
+    """
+    Stream a project setup as Server-Sent Events, one WBS phase, milestone and risk at a time
+    
+    Args:
+        req: ProjectSetupRequest with project and progress
+        
+    Returns:
+        text/event-stream of `phase`, `milestone` and `risk` frames, then a
+        `done` frame with status, data, errors and tokens_used
+    """
+    if not ai_manager.openai_client:
+        return _structured_stream_response(_unavailable_stream())
+    return _structured_stream_response(_structured_stream(
+        "project-setup",
+        ResponseValidator.PROJECT_SETUP_SCHEMA,
+        ResponseValidator.validate_project_setup,
+        await ai_manager.project_setup_params(req.project, req.progress)
+    ))
+
+@app.post("/risk-analysis/stream")
+async def risk_analysis_stream(req: RiskAnalysisRequest):
+    """
+    Stream a risk analysis as Server-Sent Events, one WBS phase and risk at a time
+    
+    Args:
+        req: RiskAnalysisRequest with project_description, duration and team_size
+        
+    Returns:
+        text/event-stream of `phase` and `risk` frames, then a `done` frame
+        with status, data, errors and tokens_used
+    """
+    if not ai_manager.openai_client:
+        return _structured_stream_response(_unavailable_stream())
+    return _structured_stream_response(_structured_stream(
+        "risk-analysis",
+        ResponseValidator.RISK_ANALYSIS_SCHEMA,
+        ResponseValidator.validate_risk_analysis,
+        await ai_manager.risk_analysis_params(req.project_description, req.duration, req.team_size)
+    ))
+
+@app.post("/reporting/stream")
+async def reporting_stream(req: ReportingRequest):
+    """
+    Stream a progress report as Server-Sent Events, one risk area and immediate action at a time
+    
+    Args:
+        req: ReportingRequest with progress_data (text or JSON), or project_ids
+        
+    Returns:
+        text/event-stream of `risk` and `action` frames, then a `done` frame
+        with status, data, errors and tokens_used
+    """
+    if not ai_manager.openai_client:
+        return _structured_stream_response(_unavailable_stream())
+    source = await _report_source(req.progress_data, req.project_ids)
+    progress_data = await asyncio.to_thread(_report_prompt_text, source)
+    return _structured_stream_response(_structured_stream(
+        "reporting",
+        ResponseValidator.REPORTING_SCHEMA,
+        ResponseValidator.validate_reporting,
+        ai_manager.report_params(progress_data)
+    ))
+
+@app.post("/calculate-risk")
+async def calculate_risk(req: CalculateRiskRequest):
+    """
+    Calculate risk score (0-100) for a stored project
+    
+    The score and its schedule/budget/resource subscores are computed locally;
+    OpenAI is only called when include_summary asks for a narrative and the
+    score moved by at least `materiality` points since the last one.
+    
+    Args:
+        req: CalculateRiskRequest with project_id, include_summary and materiality
+        
+    Returns:
+        JSON with project_id, risk_score, subscores and signals (plus summary
+        when requested); risk_score is omitted on failure so the backend does
+        not overwrite the stored score
+    """
+    try:
+        return await ai_manager.calculate_risk_score(req.project_id, req.include_summary, req.materiality)
+    except Exception as e:
+        print(f"Calculate Risk Error: {str(e)}")
+        return {"project_id": req.project_id, "error": "Failed to calculate risk score"}
+
+@app.post("/calculate-risk/changes")
+async def calculate_risk_changes(req: RiskChangesRequest):
+    """
+    Rescore projects from task/milestone/resource/project change events
+    
+    Events are applied to each project's last scored inputs and only the
+    subscores they touch are recomputed; a project scored for the first time
+    is loaded from the database. With include_summary, the narrative is only
+    rewritten when the score moved by at least `materiality` points
+    (AI_RISK_MATERIALITY by default) since it was last written.
+    
+    Args:
+        req: RiskChangesRequest with events, each {"project_id", "entity":
+             task|milestone|resource|risk|project, "action":
+             update|create|delete, "data": {...}}
+        
+    Returns:
+        JSON with one result per project (risk_score, subscores, signals,
+        recomputed subscores, summary when requested) and elapsed_ms
+    """
+    start = time.perf_counter()
+    by_project: Dict[int, List[Dict[str, Any]]] = {}
+    for event in req.events:
+        if event.get("project_id") is None:
+            raise HTTPException(status_code=422, detail="Every event needs a project_id")
+        by_project.setdefault(int(event["project_id"]), []).append(event)
+    
+    async def rescore(project_id: int, events: List[Dict[str, Any]]):
+        try:
+            return await ai_manager.apply_risk_changes(project_id, events, req.include_summary, req.materiality)
+        except Exception as e:
+            print(f"Risk Changes Error: {str(e)}")
+            return {"project_id": project_id, "error": "Failed to apply risk changes"}
+    
+    results = await asyncio.gather(*(rescore(pid, events) for pid, events in by_project.items()))
+    return {"results": results, "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+@app.post("/calculate-risk/portfolio")
+async def calculate_portfolio_risk(req: PortfolioRiskRequest):
+    """
+    Score every project of a portfolio in one vectorized pass
+    
+    Args:
+        req: PortfolioRiskRequest with projects, each carrying optional
+             start_date, end_date, budgeted_amount, spent_amount and lists of
+             tasks, milestones and resources -- or project_ids, loaded from
+             the database with one query per table
+        
+    Returns:
+        JSON with one score per project (in request order) and elapsed_ms
+    """
+    start = time.perf_counter()
+    projects = req.projects
+    if projects is None:
+        if not req.project_ids:
+            raise HTTPException(status_code=422, detail="Either projects or project_ids is required")
+        projects = await ai_manager.project_store.fetch_projects(req.project_ids)
+    results = await asyncio.to_thread(score_portfolio, projects)
+    return {"results": results, "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+# Long-running generations can also run as background jobs: submit returns a
+# job id at once and the result is polled or streamed, so no HTTP connection
+# (or proxy timeout) spans the generation
+job_queue.register("lessons-learned", lambda payload: lessons_learned(LessonsLearnedRequest(**payload)))
+job_queue.register("pmo-report", lambda payload: pmo_report(PMOReportRequest(**payload)))
+
+@app.on_event("startup")
+async def start_job_workers():
+    job_queue.start()
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await job_queue.stop()
+
+@app.on_event("shutdown")
+async def close_project_store():
+    await ai_manager.project_store.close()
+
+async def _submit_job(kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        return await job_queue.submit(kind, payload)
+    except QueueFullError as e:
+        # Backpressure: tell the caller to come back instead of queueing unboundedly
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+
+@app.post("/jobs/lessons-learned", status_code=202)
+async def submit_lessons_learned(req: LessonsLearnedRequest):
+    """
+    Queue a lessons learned generation
+    
+    Returns:
+        JSON with job_id, status and queue_depth; 429 when the queue is full
+    """
+    return await _submit_job("lessons-learned", req.model_dump())
+
+@app.post("/jobs/pmo-report", status_code=202)
+async def submit_pmo_report(req: PMOReportRequest):
+    """
+    Queue a PMO status report generation
+    
+    Returns:
+        JSON with job_id, status and queue_depth; 429 when the queue is full
+    """
+    return await _submit_job("pmo-report", req.model_dump())
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Poll a job
+    
+    Returns:
+        JSON with job_id, kind, status (queued|running|succeeded|failed),
+        position while queued, and result or error once finished
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/stream")
+async def stream_job(job_id: str):
+    """
+    Follow a job as Server-Sent Events
+    
+    Returns:
+        text/event-stream with one event per status change, named after the
+        status; the succeeded/failed event carries the result or error
+    """
+    if await job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        async for job in job_queue.watch(job_id):
+            yield sse_event(job["status"], job)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,72 @@
+# Structured generation pipeline - generate -> extract -> validate with per-stage timing
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from logger import logger
+
+
+class StructuredPipeline:
+    """Runs an async AIManager generator and feeds its output into ResponseValidator.
+
+    The LLM call is awaited on the event loop; JSON extraction and schema
+    validation are CPU-bound, so they run in a worker thread to keep long
+    responses from stalling other requests. When validation cannot parse
+    the output at all, `repair` (see json_repair.reask_repair) gets one try
+    before the request fails.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        generate: Callable[..., Awaitable[str]],
+        validate: Callable[[str], Dict[str, Any]],
+        extract: Optional[Callable[[str], Optional[str]]] = None,
+        repair: Optional[Callable[[str], Awaitable[Optional[str]]]] = None
+    ):
+        self.endpoint = endpoint
+        self.generate = generate
+        self.validate = validate
+        self.extract = extract
+        self.repair = repair
+
+    async def run(self, **kwargs) -> Dict[str, Any]:
+        """Run all stages and return a {status, data, errors, timings} response"""
+        timings = {}
+
+        start = time.perf_counter()
+        response_text = await self.generate(**kwargs)
+        timings["generate_ms"] = _elapsed_ms(start)
+
+        if self.extract:
+            start = time.perf_counter()
+            extracted = await asyncio.to_thread(self.extract, response_text)
+            timings["extract_ms"] = _elapsed_ms(start)
+            # No complete object (e.g. a truncated reply): validate reports it from the raw text
+            response_text = extracted or response_text
+
+        start = time.perf_counter()
+        result = await asyncio.to_thread(self.validate, response_text)
+        timings["validate_ms"] = _elapsed_ms(start)
+
+        if result["data"] is None and self.repair:
+            # Unparseable even after local repair: re-ask for the broken part only
+            start = time.perf_counter()
+            repaired = await self.repair(response_text)
+            if repaired is not None:
+                result = await asyncio.to_thread(self.validate, repaired)
+            timings["repair_ms"] = _elapsed_ms(start)
+        timings["total_ms"] = round(sum(timings.values()), 2)
+
+        logger.log_timing(self.endpoint, timings)
+        logger.log_validation(self.endpoint, result["valid"], result["errors"])
+        return {
+            "status": "success" if result["valid"] else "error",
+            "data": result["data"],
+            "errors": result["errors"],
+            "timings": timings
+        }
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
@@ -0,0 +1,331 @@
+# Portfolio analytics - columnar KPI precomputation for the reporting and PMO prompts
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from risk_engine import _codes, _day, _days, _done_flags, _fill, _flatten, _number, _ratio, score_portfolio
+
+# Weeks of completion history the throughput trend is fitted over
+THROUGHPUT_WEEKS = 8
+
+# Relative weekly change in throughput below which the trend counts as stable
+TREND_TOLERANCE = 0.05
+
+# Open tasks listed by name in the prompt (most overdue / least slack first)
+ATTENTION_ROWS = 10
+
+# Row lists replaced by computed metrics in the prompt input
+ROW_FIELDS = ("tasks", "milestones", "resources")
+
+
+def _first(record: Dict[str, Any], *fields: str) -> Any:
+    for field in fields:
+        value = record.get(field)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _between(later: Any, earlier: Any) -> np.ndarray:
+    """Whole days from `earlier` to `later`, NaN where either date is missing"""
+    delta = np.asarray(later - earlier, dtype="timedelta64[D]")
+    return np.where(np.isnat(delta), np.nan, delta.astype(float))
+
+
+def _offsets(index: np.ndarray, n: int) -> np.ndarray:
+    """Row boundaries per project (flattened rows are already grouped by project)"""
+    return np.concatenate(([0], np.cumsum(np.bincount(index, minlength=n))))
+
+
+def _id_list(value: Any) -> List[str]:
+    """Dependency ids from a list or a comma-separated string"""
+    if value in (None, ""):
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [part.strip() for part in str(value).split(",") if part.strip()]
+
+
+def find_projects(data: Any) -> Optional[List[Dict[str, Any]]]:
+    """The project records inside a reporting payload, or None when it has no task data"""
+    if isinstance(data, dict):
+        if isinstance(data.get("projects"), list):
+            projects = [p for p in data["projects"] if isinstance(p, dict)]
+        elif isinstance(data.get("tasks"), list):
+            projects = [data]
+        elif isinstance(data.get("project"), dict):
+            projects = [{**data["project"], **{k: v for k, v in data.items() if k != "project"}}]
+        else:
+            return None
+    elif isinstance(data, list) and data and all(isinstance(p, dict) for p in data):
+        projects = data
+    else:
+        return None
+    return projects if any(p.get("tasks") or p.get("milestones") for p in projects) else None
+
+
+def _level_order(n: int, src: np.ndarray, dst: np.ndarray) -> List[np.ndarray]:
+    """Topological levels of a DAG (Kahn's algorithm, one array op per level).
+
+    Nodes left on a cycle are returned as one final level so bad dependency
+    data degrades the estimate instead of failing the report.
+    """
+    indegree = np.bincount(dst, minlength=n)
+    placed = np.zeros(n, dtype=bool)
+    frontier = np.flatnonzero(indegree == 0)
+    levels = []
+    while frontier.size:
+        levels.append(frontier)
+        placed[frontier] = True
+        leaving = np.isin(src, frontier)
+        indegree = indegree - np.bincount(dst[leaving], minlength=n)
+        frontier = np.flatnonzero((indegree == 0) & ~placed)
+    if not placed.all():
+        levels.append(np.flatnonzero(~placed))
+    return levels
+
+
+def compute_kpis(projects: List[Dict[str, Any]], today: Optional[date] = None) -> Dict[str, Any]:
+    """Health KPIs for every project (and the portfolio) in one columnar pass.
+
+    Per project: percent complete against percent planned (schedule variance
+    and SPI, weighted by estimated_hours when present), overdue ratio, budget
+    burn rate with CPI and estimate at completion, weekly throughput over the
+    last THROUGHPUT_WEEKS weeks with its trend, and critical-path slack from a
+    forward/backward pass over task dependencies (depends_on / dependencies /
+    predecessors) against the project end_date.
+    """
+    n = len(projects)
+    now = _day(today or date.today())
+    result: Dict[str, Any] = {"as_of": str(now), "projects": []}
+    if n == 0:
+        return result
+
+    p_start = _days([p.get("start_date") for p in projects])
+    p_end = _days([p.get("end_date") for p in projects])
+
+    # --- task columns ---
+    t_idx, tasks = _flatten(projects, "tasks")
+    m = len(tasks)
+    progress = np.clip(_fill(np.array([_number(t.get("progress")) for t in tasks], dtype=float)), 0.0, 100.0)
+    completed = _days([_first(t, "completed_date", "completed_at") for t in tasks])
+    done = _done_flags(tasks) | ~np.isnat(completed) | (progress >= 100)
+    progress = np.where(done, 100.0, progress)
+    t_open = ~done
+    estimate = np.array([_number(t.get("estimated_hours")) for t in tasks], dtype=float)
+    actual = _fill(np.array([_number(t.get("actual_hours")) for t in tasks], dtype=float))
+    weight = np.where(np.isnan(estimate) | (estimate <= 0), 1.0, estimate)
+    due = _days([t.get("due_date") for t in tasks])
+    start = _days([t.get("start_date") for t in tasks])
+    start = np.where(np.isnat(start), p_start[t_idx], start)
+
+    def per_project(values, mask=None):
+        weights = values if mask is None else np.where(mask, values, 0.0)
+        return np.bincount(t_idx, weights=weights, minlength=n)
+
+    task_count = np.bincount(t_idx, minlength=n).astype(float)
+    open_count = per_project(t_open.astype(float))
+    days_late = _between(now, due)
+    overdue = t_open & (_fill(days_late, -1.0) > 0)
+    overdue_count = per_project(overdue.astype(float))
+
+    # Earned vs planned progress; a task is planned linearly from start to due
+    span = _between(due, start)
+    elapsed = _between(now, start)
+    planned = np.where(span > 0, np.clip(_fill(elapsed) / np.where(span > 0, span, 1.0), 0.0, 1.0),
+                       (now >= due).astype(float))
+    scheduled = ~np.isnat(due)
+    planned = np.where(scheduled, planned, np.nan)
+    total_weight = per_project(weight)
+    earned = _ratio(per_project(weight * progress / 100.0), total_weight)
+    planned_value = _ratio(per_project(weight * _fill(planned)), per_project(weight, scheduled))
+    schedule_variance = earned - planned_value
+    spi = _ratio(earned, planned_value)
+    project_days = _between(p_end, p_start)
+    schedule_variance_days = schedule_variance * project_days
+
+    # --- budget burn ---
+    budget = np.array([_number(p.get("budgeted_amount")) for p in projects], dtype=float)
+    spent = np.array([_number(p.get("spent_amount")) for p in projects], dtype=float)
+    weeks_elapsed = np.maximum(_between(now, p_start), 1.0) / 7.0
+    burn_per_week = spent / weeks_elapsed
+    cpi = _ratio(_fill(earned) * _fill(budget), _fill(spent))
+    eac = _ratio(_fill(budget), _fill(cpi))
+    weeks_of_budget_left = _ratio(_fill(budget) - _fill(spent), _fill(burn_per_week))
+    # Hours booked per estimated hour of work actually delivered
+    hours_ratio = _ratio(per_project(actual, ~np.isnan(estimate)), per_project(_fill(estimate) * progress / 100.0))
+
+    # --- throughput: completions per week, oldest week first ---
+    weeks_ago = _fill(_between(now, completed), -1.0) // 7
+    in_window = (weeks_ago >= 0) & (weeks_ago < THROUGHPUT_WEEKS)
+    slot = (THROUGHPUT_WEEKS - 1 - weeks_ago[in_window]).astype(np.int64)
+    weekly = np.bincount(t_idx[in_window] * THROUGHPUT_WEEKS + slot,
+                         minlength=n * THROUGHPUT_WEEKS).reshape(n, THROUGHPUT_WEEKS).astype(float)
+    x = np.arange(THROUGHPUT_WEEKS) - (THROUGHPUT_WEEKS - 1) / 2.0
+    slope = (weekly - weekly.mean(axis=1, keepdims=True)) @ x / (x @ x)
+
+    # --- critical path: forward/backward pass over dependencies, remaining work only ---
+    remaining = np.where(t_open, np.ceil(np.where(span > 0, span, 1.0) * (1 - progress / 100.0)), 0.0)
+    earliest_start = np.maximum(_fill(_between(start, now)), 0.0)
+    earliest_start = np.where(t_open, earliest_start, 0.0)
+    keys: Dict[tuple, int] = {}
+    for row, (i, task) in enumerate(zip(t_idx.tolist(), tasks)):
+        if task.get("id") is not None:
+            keys[(i, str(task["id"]))] = row
+    src, dst = [], []
+    for row, (i, task) in enumerate(zip(t_idx.tolist(), tasks)):
+        for dep in _id_list(_first(task, "depends_on", "dependencies", "predecessors")):
+            pred = keys.get((i, dep))
+            if pred is not None and pred != row:
+                src.append(pred)
+                dst.append(row)
+    src_a, dst_a = np.array(src, dtype=np.int64), np.array(dst, dtype=np.int64)
+    levels = _level_order(m, src_a, dst_a)
+    finish = earliest_start + remaining
+    for level in levels[1:]:
+        incoming = np.isin(dst_a, level)
+        if incoming.any():
+            ready = np.zeros(m)
+            np.maximum.at(ready, dst_a[incoming], finish[src_a[incoming]])
+            finish[level] = np.maximum(earliest_start[level], ready[level]) + remaining[level]
+    forecast = np.zeros(n)
+    if m:
+        np.maximum.at(forecast, t_idx, finish)
+    latest_finish = forecast[t_idx] if m else np.zeros(0)
+    for level in reversed(levels):
+        outgoing = np.isin(src_a, level)
+        if outgoing.any():
+            bound = latest_finish.copy()
+            np.minimum.at(bound, src_a[outgoing], latest_finish[dst_a[outgoing]] - remaining[dst_a[outgoing]])
+            latest_finish[level] = bound[level]
+    task_slack = latest_finish - finish
+    critical = t_open & (task_slack <= 0) & (remaining > 0)
+    days_to_end = _between(p_end, now)
+    path_slack = np.where(open_count > 0, days_to_end - forecast, np.nan)
+
+    # --- milestones ---
+    m_idx, milestones = _flatten(projects, "milestones")
+    m_target = _days([ms.get("target_date") for ms in milestones])
+    m_done = _done_flags(milestones) | ~np.isnat(_days([ms.get("completed_at") for ms in milestones]))
+    m_missed = ~m_done & ~np.isnat(m_target) & (m_target < now)
+    milestone_count = np.bincount(m_idx, minlength=n).astype(float)
+    missed_count = np.bincount(m_idx, weights=m_missed, minlength=n)
+    upcoming = ~m_done & ~np.isnat(m_target) & (m_target >= now)
+
+    risk = score_portfolio(projects, today)
+    owners = [str(_first(t, "owner", "assigned_to") or "") for t in tasks]
+    owner_codes = _codes([o.strip().lower() for o in owners])
+    overdue_ratio = _ratio(overdue_count, open_count)
+    percent_complete, percent_planned = earned * 100, planned_value * 100
+    schedule_variance_pts = schedule_variance * 100
+    t_bounds, m_bounds = _offsets(t_idx, n), _offsets(m_idx, n)
+
+    def value(array, i, digits=3):
+        item = float(array[i])
+        return None if np.isnan(item) else round(item, digits)
+
+    for i, project in enumerate(projects):
+        rows = np.arange(t_bounds[i], t_bounds[i + 1])
+        attention = rows[t_open[rows] & (overdue[rows] | critical[rows])]
+        attention = attention[np.lexsort((-_fill(days_late[attention]), task_slack[attention]))][:ATTENTION_ROWS]
+        next_rows = np.arange(m_bounds[i], m_bounds[i + 1])
+        next_rows = next_rows[upcoming[next_rows]]
+        next_milestone = None
+        if next_rows.size:
+            first = next_rows[np.argmin(m_target[next_rows])]
+            next_milestone = {
+                "name": _first(milestones[first], "name", "title"),
+                "target_date": str(m_target[first]),
+                "days_away": int((m_target[first] - now).astype(int))
+            }
+        result["projects"].append({
+            "project_id": project.get("id", project.get("project_id")),
+            "title": _first(project, "title", "name"),
+            "risk_score": risk[i]["risk_score"],
+            "tasks": int(task_count[i]),
+            "open_tasks": int(open_count[i]),
+            "overdue_tasks": int(overdue_count[i]),
+            "overdue_ratio": value(overdue_ratio, i),
+            "percent_complete": value(percent_complete, i, 1),
+            "percent_planned": value(percent_planned, i, 1),
+            "schedule_variance_pts": value(schedule_variance_pts, i, 1),
+            "schedule_variance_days": value(schedule_variance_days, i, 1),
+            "spi": value(spi, i, 2),
+            "budget": value(budget, i, 2),
+            "spent": value(spent, i, 2),
+            "burn_rate_per_week": value(burn_per_week, i, 2),
+            "cpi": value(cpi, i, 2),
+            "estimate_at_completion": value(eac, i, 2),
+            "weeks_of_budget_left": value(weeks_of_budget_left, i, 1),
+            "actual_vs_earned_hours": value(hours_ratio, i, 2),
+            "throughput_per_week": [int(c) for c in weekly[i]],
+            "throughput_trend": _trend(slope[i], weekly[i].mean()),
+            "forecast_finish_days": int(forecast[i]) if open_count[i] else None,
+            "critical_path_slack_days": value(path_slack, i, 0),
+            "critical_tasks": int(critical[rows].sum()),
+            "milestones": int(milestone_count[i]),
+            "missed_milestones": int(missed_count[i]),
+            "next_milestone": next_milestone,
+            "attention": [
+                {
+                    "title": _first(tasks[r], "title", "name"),
+                    "owner": owners[r] or None,
+                    "due_date": None if np.isnat(due[r]) else str(due[r]),
+                    "progress": int(progress[r]),
+                    "days_overdue": int(days_late[r]) if overdue[r] else 0,
+                    "slack_days": int(task_slack[r]),
+                    "critical": bool(critical[r])
+                }
+                for r in attention
+            ]
+        })
+
+    if n > 1:
+        all_weekly = weekly.sum(axis=0)
+        result["portfolio"] = {
+            "projects": n,
+            "tasks": int(task_count.sum()),
+            "open_tasks": int(open_count.sum()),
+            "overdue_ratio": value(_ratio(overdue_count.sum(keepdims=True), open_count.sum(keepdims=True)), 0),
+            "percent_complete": value(_ratio(per_project(weight * progress / 100.0).sum(keepdims=True),
+                                             total_weight.sum(keepdims=True)) * 100, 0, 1),
+            "budget": round(float(_fill(budget).sum()), 2),
+            "spent": round(float(_fill(spent).sum()), 2),
+            "burn_rate_per_week": round(float(_fill(burn_per_week).sum()), 2),
+            "throughput_per_week": [int(c) for c in all_weekly],
+            "throughput_trend": _trend(float((all_weekly - all_weekly.mean()) @ x / (x @ x)), all_weekly.mean()),
+            "projects_behind_schedule": int((_fill(schedule_variance) < 0).sum()),
+            "projects_past_end_forecast": int((_fill(path_slack) < 0).sum()),
+            "owners": int(len(set(owner_codes.tolist()) - {-1}))
+        }
+    return result
+
+
+def _trend(slope: float, mean: float) -> str:
+    if mean == 0 and slope == 0:
+        return "none"
+    if abs(slope) <= TREND_TOLERANCE * max(mean, 1.0):
+        return "stable"
+    return "improving" if slope > 0 else "declining"
+
+
+def report_input(data: Any, today: Optional[date] = None) -> Any:
+    """Replace the raw task/milestone rows of a reporting payload with computed KPIs.
+
+    Scalar fields and qualitative lists (risks, issues, notes) are kept as
+    they are; payloads without task data are returned unchanged.
+    """
+    projects = find_projects(data)
+    if projects is None:
+        return data
+    kpis = compute_kpis(projects, today)
+    condensed = []
+    for project, metrics in zip(projects, kpis["projects"]):
+        kept = {k: v for k, v in project.items() if k not in ROW_FIELDS}
+        kept["metrics"] = {k: v for k, v in metrics.items() if k not in ("project_id", "title")}
+        condensed.append(kept)
+    if len(condensed) == 1 and not (isinstance(data, dict) and "projects" in data):
+        return {"as_of": kpis["as_of"], **condensed[0]}
+    header = {k: v for k, v in data.items() if k != "projects"} if isinstance(data, dict) else {}
+    return {**header, "as_of": kpis["as_of"], "portfolio_metrics": kpis.get("portfolio"), "projects": condensed}
@@ -0,0 +1,402 @@
+# Project store - pooled async access to the backend's project database
+import asyncio
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# The backend's SQLite fallback (backend/db/connection_sqlite.js) lives in the repository root
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "paxipm.db")
+
+CHILD_FIELDS = ("tasks", "milestones", "resources")
+BULK_CHILD_TABLES = ("tasks", "milestones", "resources", "risks")
+
+
+class ProjectStore(ABC):
+    """Read access to projects with a connection pool per backend.
+
+    Subclasses supply the driver (the abstract hooks): how to open and
+    close the pool, acquire a connection and fetch rows. The project, its tasks, milestones and
+    resources come back from a single statement (`PROJECT_QUERY`, children
+    aggregated as JSON arrays in the backend's dialect), so a risk
+    calculation is one round trip. Statements are parameterized and reused
+    from each driver's statement cache.
+
+    The pool opens on first use, so importing the engine never needs the
+    database.
+    """
+
+    backend = "none"
+    PROJECT_QUERY = ""
+    # fetch_projects: project columns, per child table the view field -> column
+    # mapping, and the dialect's aggregate building a JSON array of objects
+    BULK_PROJECT_COLUMNS = ""
+    BULK_CHILD_FIELDS: Dict[str, Dict[str, str]] = {}
+    JSON_ARRAY_AGG = ""
+
+    def __init__(self, pool_size: int = 5):
+        self.pool_size = pool_size
+        self._opened = False
+        self._open_lock: Optional[asyncio.Lock] = None
+        self._in_use = 0
+        self._stats = {"acquires": 0, "waited": 0, "wait_ms": 0.0, "queries": 0, "query_ms": 0.0, "errors": 0}
+
+    # --- driver hooks ---
+
+    @abstractmethod
+    async def _open(self):
+        ...
+
+    @abstractmethod
+    async def _close(self):
+        ...
+
+    @abstractmethod
+    def _acquire(self):
+        """Async context manager yielding a pooled connection"""
+
+    @abstractmethod
+    async def _fetchrow(self, conn, query: str, params: tuple) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def _fetchall(self, conn, query: str, params: tuple) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def _id_filter(self, column: str, project_ids: List[int]) -> Tuple[str, tuple]:
+        """WHERE condition (and its parameters) matching `column` against a set of ids"""
+
+    def _bulk_statement(self, table: str, project_ids: List[int]) -> Tuple[str, tuple]:
+        if table == "projects":
+            condition, params = self._id_filter("id", project_ids)
+            return f"SELECT {self.BULK_PROJECT_COLUMNS} FROM projects WHERE {condition}", params
+        # Children come back grouped: one (project_id, JSON array of rows) pair per project
+        condition, params = self._id_filter("project_id", project_ids)
+        pairs = ", ".join(f"'{field}', {column}" for field, column in self.BULK_CHILD_FIELDS[table].items())
+        return (
+            f"SELECT project_id, {self.JSON_ARRAY_AGG.format(pairs)} AS items FROM {table} "
+            f"WHERE {condition} GROUP BY project_id",
+            params
+        )
+
+    # --- public API ---
+
+    async def fetch_project(self, project_id: int) -> Dict[str, Any]:
+        """Project row with `tasks`, `milestones` and `resources` lists; {} when not found"""
+        row = await self._query_one(self.PROJECT_QUERY, (project_id,))
+        if row is None:
+            return {}
+        for field in CHILD_FIELDS:
+            value = row.get(field)
+            row[field] = json.loads(value) if isinstance(value, (str, bytes)) else list(value or [])
+        return row
+
+    async def fetch_projects(self, project_ids: List[int]) -> List[Dict[str, Any]]:
+        """Per-project views for many projects, with one query per table.
+
+        The five SELECTs (projects, tasks, milestones, resources, risks) run
+        concurrently on pooled connections; child rows are aggregated per
+        project in the database and attached to their project row here. Each
+        view is a project row with `id` and `tasks`, `milestones`,
+        `resources` and `risks` lists -- the shape score_portfolio,
+        compute_kpis and report_input take. Views follow the order of
+        `project_ids`; unknown ids are left out.
+        """
+        ids = list(dict.fromkeys(int(i) for i in project_ids))
+        if not ids:
+            return []
+        rows = await asyncio.gather(*(
+            self._query_all(*self._bulk_statement(table, ids))
+            for table in ("projects",) + BULK_CHILD_TABLES
+        ))
+        views = {}
+        for project in rows[0]:
+            for table in BULK_CHILD_TABLES:
+                project[table] = []
+            views[project["id"]] = project
+        for table, groups in zip(BULK_CHILD_TABLES, rows[1:]):
+            for group in groups:
+                view = views.get(group["project_id"])
+                if view is not None:
+                    items = group["items"]
+                    view[table] = json.loads(items) if isinstance(items, (str, bytes)) else list(items)
+        return [views[i] for i in ids if i in views]
+
+    async def close(self):
+        if self._opened:
+            await self._close()
+            self._opened = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool occupancy, acquire waits and query latency"""
+        s = self._stats
+        return {
+            "backend": self.backend,
+            "open": self._opened,
+            "pool_size": self.pool_size,
+            "in_use": self._in_use,
+            "acquires": s["acquires"],
+            "waited": s["waited"],
+            "avg_wait_ms": round(s["wait_ms"] / s["acquires"], 3) if s["acquires"] else 0.0,
+            "queries": s["queries"],
+            "avg_query_ms": round(s["query_ms"] / s["queries"], 3) if s["queries"] else 0.0,
+            "errors": s["errors"]
+        }
+
+    # --- internals ---
+
+    async def _ensure_open(self):
+        if self._opened:
+            return
+        if self._open_lock is None:
+            self._open_lock = asyncio.Lock()
+        async with self._open_lock:
+            if not self._opened:
+                await self._open()
+                self._opened = True
+
+    @asynccontextmanager
+    async def _connection(self):
+        await self._ensure_open()
+        self._stats["acquires"] += 1
+        # Every connection busy: this caller queues for one
+        self._stats["waited"] += int(self._in_use >= self.pool_size)
+        start = time.perf_counter()
+        async with self._acquire() as conn:
+            self._stats["wait_ms"] += (time.perf_counter() - start) * 1000
+            self._in_use += 1
+            try:
+                yield conn
+            finally:
+                self._in_use -= 1
+
+    async def _query_one(self, query: str, params: tuple) -> Optional[Dict[str, Any]]:
+        return await self._run(self._fetchrow, query, params)
+
+    async def _query_all(self, query: str, params: tuple) -> List[Dict[str, Any]]:
+        return await self._run(self._fetchall, query, params)
+
+    async def _run(self, fetch, query: str, params: tuple):
+        async with self._connection() as conn:
+            start = time.perf_counter()
+            try:
+                return await fetch(conn, query, params)
+            except Exception:
+                self._stats["errors"] += 1
+                raise
+            finally:
+                self._stats["queries"] += 1
+                self._stats["query_ms"] += (time.perf_counter() - start) * 1000
+
+
+class SQLiteStore(ProjectStore):
+    """aiosqlite connections (one thread each) opened read-only and handed out from a queue"""
+
+    backend = "sqlite"
+    # Column names follow the backend's SQLite schema (allocation_percent, no completed_date)
+    PROJECT_QUERY = """
+        SELECT p.title, p.description, p.status, p.start_date, p.end_date, p.budgeted_amount, p.spent_amount,
+            (SELECT json_group_array(json_object('id', id, 'progress', progress, 'due_date', due_date, 'owner', owner))
+                FROM tasks WHERE project_id = p.id) AS tasks,
+            (SELECT json_group_array(json_object('id', id, 'target_date', target_date, 'status', status))
+                FROM milestones WHERE project_id = p.id) AS milestones,
+            (SELECT json_group_array(json_object('id', id, 'name', name, 'allocation_percentage', allocation_percent))
+                FROM resources WHERE project_id = p.id) AS resources
+        FROM projects p WHERE p.id = ?"""
+    BULK_PROJECT_COLUMNS = ("id, title, description, client, status, start_date, end_date, "
+                            "budgeted_amount, spent_amount, currency_code, risk_score")
+    BULK_CHILD_FIELDS = {
+        "tasks": {"id": "id", "title": "title", "owner": "owner", "progress": "progress", "due_date": "due_date"},
+        "milestones": {"id": "id", "title": "title", "target_date": "target_date", "status": "status"},
+        "resources": {"id": "id", "name": "name", "role": "role", "allocation_percentage": "allocation_percent"},
+        "risks": {"id": "id", "title": "title", "probability": "probability", "impact": "impact",
+                  "status": "status", "mitigation": "mitigation"}
+    }
+    JSON_ARRAY_AGG = "json_group_array(json_object({}))"
+
+    def __init__(self, path: str, pool_size: int = 5):
+        super().__init__(pool_size)
+        self.path = path
+        self._idle: Optional[asyncio.Queue] = None
+
+    async def _open(self):
+        import aiosqlite
+        self._idle = asyncio.Queue()
+        for _ in range(self.pool_size):
+            conn = await aiosqlite.connect(f"file:{self.path}?mode=ro", uri=True)
+            conn.row_factory = aiosqlite.Row
+            self._idle.put_nowait(conn)
+
+    async def _close(self):
+        while not self._idle.empty():
+            await self._idle.get_nowait().close()
+
+    @asynccontextmanager
+    async def _acquire(self):
+        conn = await self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put_nowait(conn)
+
+    async def _fetchrow(self, conn, query: str, params: tuple) -> Optional[Dict[str, Any]]:
+        # sqlite3 keeps compiled statements per connection, keyed by the SQL text
+        async with conn.execute(query, params) as cursor:
+            row = await cursor.fetchone()
+        return dict(row) if row is not None else None
+
+    async def _fetchall(self, conn, query: str, params: tuple) -> List[Dict[str, Any]]:
+        async with conn.execute(query, params) as cursor:
+            return [dict(row) for row in await cursor.fetchall()]
+
+    def _id_filter(self, column: str, project_ids: List[int]) -> Tuple[str, tuple]:
+        # The id set is one JSON parameter, so the SQL text (and its cached statement) never changes
+        return f"{column} IN (SELECT value FROM json_each(?))", (json.dumps(project_ids),)
+
+
+class MySQLStore(ProjectStore):
+    """aiomysql pool for MariaDB/MySQL (JSON_ARRAYAGG needs MariaDB 10.5+ or MySQL 5.7.22+)"""
+
+    backend = "mysql"
+    PROJECT_QUERY = """
+        SELECT p.title, p.description, p.status, p.start_date, p.end_date, p.budgeted_amount, p.spent_amount,
+            (SELECT COALESCE(JSON_ARRAYAGG(JSON_OBJECT('id', id, 'progress', progress, 'due_date', due_date, 'owner', owner)), JSON_ARRAY())
+                FROM tasks WHERE project_id = p.id) AS tasks,
+            (SELECT COALESCE(JSON_ARRAYAGG(JSON_OBJECT('id', id, 'target_date', target_date, 'status', status, 'completed_date', completed_date)), JSON_ARRAY())
+                FROM milestones WHERE project_id = p.id) AS milestones,
+            (SELECT COALESCE(JSON_ARRAYAGG(JSON_OBJECT('id', id, 'name', name, 'email', email, 'allocation_percentage', allocation_percentage)), JSON_ARRAY())
+                FROM resources WHERE project_id = p.id) AS resources
+        FROM projects p WHERE p.id = %s"""
+    BULK_PROJECT_COLUMNS = ("id, title, description, client, status, start_date, end_date, "
+                            "budgeted_amount, spent_amount, currency_code, risk_score")
+    BULK_CHILD_FIELDS = {
+        "tasks": {"id": "id", "title": "title", "owner": "owner", "progress": "progress", "due_date": "due_date"},
+        "milestones": {"id": "id", "title": "title", "target_date": "target_date", "status": "status",
+                       "completed_date": "completed_date"},
+        "resources": {"id": "id", "name": "name", "role": "role", "email": "email",
+                      "allocation_percentage": "allocation_percentage"},
+        "risks": {"id": "id", "title": "title", "probability": "probability", "impact": "impact",
+                  "risk_score": "risk_score", "status": "status", "mitigation": "mitigation_plan", "owner": "owner"}
+    }
+    JSON_ARRAY_AGG = "JSON_ARRAYAGG(JSON_OBJECT({}))"
+
+    def __init__(self, config: Dict[str, Any], pool_size: int = 5):
+        super().__init__(pool_size)
+        self.config = config
+        self._pool = None
+
+    async def _open(self):
+        import aiomysql
+        self._pool = await aiomysql.create_pool(
+            host=self.config["host"],
+            port=int(self.config["port"]),
+            db=self.config["database"],
+            user=self.config["user"],
+            password=self.config["password"],
+            minsize=1,
+            maxsize=self.pool_size,
+            autocommit=True,
+            cursorclass=aiomysql.DictCursor
+        )
+
+    async def _close(self):
+        self._pool.close()
+        await self._pool.wait_closed()
+
+    def _acquire(self):
+        return self._pool.acquire()
+
+    async def _fetchrow(self, conn, query: str, params: tuple) -> Optional[Dict[str, Any]]:
+        async with conn.cursor() as cursor:
+            await cursor.execute(query, params)
+            return await cursor.fetchone()
+
+    async def _fetchall(self, conn, query: str, params: tuple) -> List[Dict[str, Any]]:
+        async with conn.cursor() as cursor:
+            await cursor.execute(query, params)
+            return list(await cursor.fetchall())
+
+    def _id_filter(self, column: str, project_ids: List[int]) -> Tuple[str, tuple]:
+        return f"{column} IN ({', '.join(['%s'] * len(project_ids))})", tuple(project_ids)
+
+
+class PostgresStore(ProjectStore):
+    """asyncpg pool; each connection prepares PROJECT_QUERY once and reuses it"""
+
+    backend = "postgres"
+    PROJECT_QUERY = """
+        SELECT p.title, p.description, p.status, p.start_date, p.end_date, p.budgeted_amount, p.spent_amount,
+            (SELECT COALESCE(json_agg(json_build_object('id', id, 'progress', progress, 'due_date', due_date, 'owner', owner)), '[]'::json)
+                FROM tasks WHERE project_id = p.id) AS tasks,
+            (SELECT COALESCE(json_agg(json_build_object('id', id, 'target_date', target_date, 'status', status, 'completed_date', completed_date)), '[]'::json)
+                FROM milestones WHERE project_id = p.id) AS milestones,
+            (SELECT COALESCE(json_agg(json_build_object('id', id, 'name', name, 'email', email, 'allocation_percentage', allocation_percentage)), '[]'::json)
+                FROM resources WHERE project_id = p.id) AS resources
+        FROM projects p WHERE p.id = $1"""
+    BULK_PROJECT_COLUMNS = MySQLStore.BULK_PROJECT_COLUMNS
+    BULK_CHILD_FIELDS = MySQLStore.BULK_CHILD_FIELDS
+    JSON_ARRAY_AGG = "json_agg(json_build_object({}))"
+
+    def __init__(self, config: Dict[str, Any], pool_size: int = 5):
+        super().__init__(pool_size)
+        self.config = config
+        self._pool = None
+
+    async def _open(self):
+        import asyncpg
+        self._pool = await asyncpg.create_pool(
+            host=self.config["host"],
+            port=int(self.config["port"]),
+            database=self.config["database"],
+            user=self.config["user"],
+            password=self.config["password"],
+            min_size=1,
+            max_size=self.pool_size
+        )
+
+    async def _close(self):
+        await self._pool.close()
+
+    def _acquire(self):
+        return self._pool.acquire()
+
+    async def _fetchrow(self, conn, query: str, params: tuple) -> Optional[Dict[str, Any]]:
+        # fetchrow goes through the connection's prepared-statement cache
+        row = await conn.fetchrow(query, *params)
+        return dict(row) if row is not None else None
+
+    async def _fetchall(self, conn, query: str, params: tuple) -> List[Dict[str, Any]]:
+        return [dict(row) for row in await conn.fetch(query, *params)]
+
+    def _id_filter(self, column: str, project_ids: List[int]) -> Tuple[str, tuple]:
+        # One array parameter keeps a single prepared statement per table
+        return f"{column} = ANY($1::int[])", (project_ids,)
+
+
+def create_project_store() -> ProjectStore:
+    """Store for the backend's database (AI_DB_BACKEND, else USE_SQLITE like the backend)"""
+    backend = (os.getenv("AI_DB_BACKEND") or ("sqlite" if os.getenv("USE_SQLITE") == "true" else "mysql")).lower()
+    pool_size = int(os.getenv("AI_DB_POOL_SIZE", "5"))
+    if backend == "sqlite":
+        return SQLiteStore(os.getenv("DB_SQLITE_PATH") or DEFAULT_SQLITE_PATH, pool_size)
+
+    postgres = backend in ("postgres", "postgresql")
+    config = {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": os.getenv("DB_PORT", "5432" if postgres else "3306"),
+        "database": os.getenv("DB_NAME", "paxipm"),
+        "user": os.getenv("DB_USER", "postgres" if postgres else "root"),
+        "password": os.getenv("DB_PASSWORD", "")
+    }
+    return PostgresStore(config, pool_size) if postgres else MySQLStore(config, pool_size)
+
+
+# Global store shared by AIManager and the portfolio endpoints
+project_store = create_project_store()
@@ -0,0 +1,117 @@
+# Prompt encoder - compact, token-lean text encoding of project payloads for prompts
+import re
+from datetime import datetime, timedelta
+from typing import Any, List
+
+# ISO timestamps as produced by MariaDB/JS: 2026-03-10T00:00:00.000Z, 2026-03-10 14:30:00
+_ISO_DATETIME = re.compile(
+    r"^(\d{4}-\d{2}-\d{2})[T ](\d{2}):(\d{2})(?::\d{2}(?:\.\d+)?)?(Z|([+-])(\d{2}):?(\d{2}))?$"
+)
+
+# Column separator for tabular rows; values containing it are sanitized
+DELIMITER = "|"
+
+
+def _scalar(value: Any) -> str:
+    """Encode a scalar compactly: trimmed numbers, short dates, single-line text.
+
+    Timestamps with a UTC offset are shifted to UTC (the offset is then
+    dropped, as for "Z"), so mixed-offset values stay comparable.
+    """
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else repr(round(value, 4))
+    if isinstance(value, int):
+        return str(value)
+    text = str(value)
+    match = _ISO_DATETIME.match(text)
+    if match:
+        day, hour, minute, _zone, sign, offset_hours, offset_minutes = match.groups()
+        if sign and (offset_hours, offset_minutes) != ("00", "00"):
+            offset = timedelta(hours=int(offset_hours), minutes=int(offset_minutes))
+            try:
+                moment = datetime.strptime(f"{day} {hour}:{minute}", "%Y-%m-%d %H:%M")
+            except ValueError:
+                return " ".join(text.split())
+            moment = moment - offset if sign == "+" else moment + offset
+            day, hour, minute = moment.strftime("%Y-%m-%d %H %M").split()
+        # Midnight (UTC for offset timestamps) is a date in disguise
+        return day if (hour, minute) == ("00", "00") else f"{day} {hour}:{minute}"
+    return " ".join(text.split())
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return _inline(value)
+    return _scalar(value).replace(DELIMITER, "/")
+
+
+def _inline(value: Any) -> str:
+    """One-line encoding for nested values inside a table cell"""
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{k}: {_inline(v)}" for k, v in value.items() if v is not None) + "}"
+    if isinstance(value, list):
+        return "[" + ", ".join(_inline(v) for v in value if v is not None) + "]"
+    return _scalar(value).replace(DELIMITER, "/")
+
+
+def _is_table(value: Any) -> bool:
+    return (
+        isinstance(value, list)
+        and len(value) > 0
+        and all(isinstance(item, dict) for item in value)
+    )
+
+
+def _encode_table(key: str, rows: List[dict], indent: str) -> List[str]:
+    """Header row of the columns that carry data, then one delimited row per record"""
+    columns = []
+    for row in rows:
+        for column, cell in row.items():
+            if cell is not None and column not in columns:
+                columns.append(column)
+    lines = [f"{indent}{key}[{len(rows)}]{{{DELIMITER.join(columns)}}}:"]
+    for row in rows:
+        lines.append(indent + "  " + DELIMITER.join(_cell(row.get(column)) for column in columns))
+    return lines
+
+
+def _encode(value: Any, key: str, indent: str) -> List[str]:
+    prefix = f"{indent}{key}: " if key is not None else indent
+    if isinstance(value, dict):
+        items = [(k, v) for k, v in value.items() if v is not None]
+        if not items:
+            return []
+        lines = [f"{indent}{key}:"] if key is not None else []
+        child_indent = indent + "  " if key is not None else indent
+        for child_key, child in items:
+            lines.extend(_encode(child, child_key, child_indent))
+        return lines
+    if _is_table(value):
+        return _encode_table(key if key is not None else "items", value, indent)
+    if isinstance(value, list):
+        items = [v for v in value if v is not None]
+        if not items:
+            return []
+        if all(not isinstance(v, (dict, list)) for v in items):
+            return [prefix + ", ".join(_scalar(v) for v in items)]
+        lines = [f"{indent}{key}[{len(items)}]:"] if key is not None else []
+        for item in items:
+            lines.extend(_encode(item, "-", indent + "  "))
+        return lines
+    return [prefix + _scalar(value)]
+
+
+def encode_project(data: Any) -> str:
+    """Encode a project payload for a prompt.
+
+    Nulls are omitted, timestamps are shortened, and lists of records
+    (tasks, risks, milestones, ...) become a header row plus one delimited
+    row per record instead of repeating every key per item.
+    """
+    if isinstance(data, str):
+        return data
+    return "\n".join(_encode(data, None, ""))
@@ -0,0 +1,268 @@
+# Prompt registry - loads, validates and pre-compiles prompt templates at startup
+import os
+import string
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+
+# Placeholders each template may use; these are the kwargs its caller passes
+TEMPLATE_FIELDS = {
+    "charter": {"project_title", "description", "client"},
+    "risk_narrative": {"project_title", "risk_score", "subscores", "signals"},
+    "project_setup_prompt": {"project", "progress"},
+    "risk_analysis_prompt": {"project_description", "duration", "team_size"},
+    "reporting_prompt": {"progress_data"},
+    "pmo_report_prompt": {"project_data"},
+}
+
+# Built-in templates used when prompts/<name>.txt does not exist
+DEFAULT_TEMPLATES = {
+    "charter": """Generate a comprehensive project charter for the following project:
+
+Project Title: {project_title}
+Description: {description}
+Client: {client}
+
+Include:
+1. Project Overview
+2. Objectives and Goals
+3. Scope and Deliverables
+4. Timeline
+5. Key Stakeholders
+6. Success Criteria""",
+
+    "risk_narrative": """Explain the risk assessment of this project for a project manager.
+
+Project Title: {project_title}
+Risk Score: {risk_score}/100
+
+Subscores (0-100, higher is riskier):
+{subscores}
+
+Signals:
+{signals}
+
+In 3-5 sentences, name the main drivers of the score and the most useful next action. Do not change or recompute the score.""",
+
+    "project_setup_prompt": """Generate a comprehensive project setup document for the following project:
+
+Project: {project}
+Progress: {progress}%
+
+Include:
+1. Project Overview (description, objectives, outcomes)
+2. Work Breakdown Structure (phases, deliverables, tasks)
+3. Timeline (start date, milestones, completion date)
+4. Resource Allocation (team members, skills, effort)
+5. Risk Assessment (risks, mitigation, contingencies)
+
+Return structured JSON format.""",
+
+    "risk_analysis_prompt": """You are an expert PMP, ITIL, and Agile project manager.
+
+Given the following project input:
+Project Description: {project_description}
+Duration: {duration}
+Team Size: {team_size}
+
+Generate:
+1. Project Charter (executive summary, objectives, success criteria, stakeholders)
+2. Work Breakdown Structure (phases, deliverables, tasks with assignments)
+3. Key Risks (risk identification, assessment, mitigation strategies)
+
+Return results in structured JSON format.""",
+
+    "reporting_prompt": """You are an expert project manager analyzing project progress data.
+
+Analyze the following project progress data:
+<Progress Data>
+{progress_data}
+</Progress Data>
+
+When a metrics section is present, its figures (schedule variance, SPI, CPI, burn rate, overdue ratio, throughput, critical-path slack) were computed exactly from the task data: quote them as given instead of recomputing them.
+
+Based on this data:
+1. Identify risks (schedule, resource, technical, budget, quality, stakeholder)
+2. Rate overall risk score (0-100): 0-20 Very Low, 21-40 Low, 41-60 Medium, 61-80 High, 81-100 Critical
+3. Provide risk summary with key risk areas and project health
+4. Generate actionable recommendations (immediate, short-term, medium-term, strategic)
+
+Return JSON with risk_score, risk_summary, and recommendations.""",
+
+    "pmo_report_prompt": """You are a professional PMO analyst generating a comprehensive project status report.
+
+Analyze the provided project information and generate a professional PMO status report.
+
+Project Information:
+{project_data}
+
+When a metrics section is present, its figures (schedule variance, SPI, CPI, burn rate, overdue ratio, throughput, critical-path slack) were computed exactly from the task data: quote them as given instead of recomputing them.
+
+Generate a comprehensive status report that includes:
+1. Executive Summary (status, health, key highlight)
+2. Achievements & Milestones (completed milestones, deliverables, accomplishments)
+3. Blockers & Challenges (active blockers, constraints, challenges)
+4. Next Actions (immediate, short-term, decisions, resources, escalations)
+5. Metrics & KPIs (schedule, budget, scope, quality, resources)
+6. Risk Update (new risks, status changes, mitigation)
+
+Return in format:
+---PLAIN TEXT REPORT---
+[Professional formatted text report]
+---END PLAIN TEXT REPORT---
+
+---JSON SUMMARY---
+[Structured JSON data]
+---END JSON SUMMARY---""",
+}
+
+
+class PromptTemplateError(Exception):
+    """Raised when a prompt template is malformed or rendered with the wrong kwargs"""
+    pass
+
+
+class CompiledTemplate:
+    """A template pre-tokenized into (literal, field, format_spec, conversion) segments"""
+
+    def __init__(self, name: str, source: str, allowed_fields: set, path: Optional[str] = None):
+        self.name = name
+        self.path = path
+        self.mtime = os.path.getmtime(path) if path else None
+        self.segments = self._compile(name, source, allowed_fields)
+        self.fields = {field for _, field, _, _ in self.segments if field is not None}
+
+    @staticmethod
+    def _compile(name: str, source: str, allowed_fields: set) -> List[Tuple]:
+        try:
+            segments = list(string.Formatter().parse(source))
+        except ValueError as e:
+            raise PromptTemplateError(f"Template '{name}' is malformed: {e}")
+
+        for _, field, _, conversion in segments:
+            if field is None:
+                continue
+            if not field.isidentifier():
+                raise PromptTemplateError(
+                    f"Template '{name}' has unsupported placeholder '{{{field}}}' "
+                    "(use plain names; escape literal braces as '{{' and '}}')"
+                )
+            if field not in allowed_fields:
+                raise PromptTemplateError(
+                    f"Template '{name}' uses unknown placeholder '{{{field}}}'; "
+                    f"expected a subset of {sorted(allowed_fields)}"
+                )
+            if conversion not in (None, "s", "r", "a"):
+                raise PromptTemplateError(f"Template '{name}' has invalid conversion '!{conversion}'")
+        return segments
+
+    def render(self, kwargs: Dict[str, Any]) -> str:
+        parts = []
+        for literal, field, format_spec, conversion in self.segments:
+            if literal:
+                parts.append(literal)
+            if field is None:
+                continue
+            value = kwargs[field]
+            if conversion == "r":
+                value = repr(value)
+            elif conversion == "a":
+                value = ascii(value)
+            elif conversion == "s":
+                value = str(value)
+            parts.append(format(value, format_spec) if format_spec else str(value))
+        return "".join(parts)
+
+
+class PromptRegistry:
+    """Loads every known template once, renders from compiled segments and
+    hot-reloads a template when its file's mtime changes.
+
+    Construction raises PromptTemplateError on the first broken template, so
+    the engine fails at startup instead of raising KeyError mid-request.
+    """
+
+    def __init__(self, prompts_dir: str = PROMPTS_DIR, reload_interval: float = 1.0):
+        self.prompts_dir = prompts_dir
+        self.reload_interval = reload_interval
+        self._templates: Dict[str, CompiledTemplate] = {}
+        self._last_check: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+        for name in TEMPLATE_FIELDS:
+            self._templates[name] = self._load(name)
+            self._last_check[name] = time.monotonic()
+            self._stats[name] = {"renders": 0, "total_ms": 0.0, "reloads": 0, "reload_errors": 0}
+
+    def _load(self, name: str) -> CompiledTemplate:
+        path = os.path.join(self.prompts_dir, f"{name}.txt")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return CompiledTemplate(name, f.read(), TEMPLATE_FIELDS[name], path)
+        return CompiledTemplate(name, DEFAULT_TEMPLATES[name], TEMPLATE_FIELDS[name])
+
+    def _maybe_reload(self, name: str):
+        """Recompile a template whose file changed; keep the last good version on error"""
+        now = time.monotonic()
+        if now - self._last_check[name] < self.reload_interval:
+            return
+        self._last_check[name] = now
+
+        template = self._templates[name]
+        path = os.path.join(self.prompts_dir, f"{name}.txt")
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = None
+        if mtime == template.mtime:
+            return
+
+        try:
+            reloaded = self._load(name)
+        except (OSError, PromptTemplateError) as e:
+            # A bad edit must not take down requests that are already being served
+            self._stats[name]["reload_errors"] += 1
+            print(f"Prompt reload failed for '{name}', keeping previous version: {e}")
+            template.mtime = mtime
+            return
+        with self._lock:
+            self._templates[name] = reloaded
+        self._stats[name]["reloads"] += 1
+
+    def render(self, name: str, **kwargs) -> str:
+        """Render a template; raises PromptTemplateError for unknown names or missing kwargs"""
+        if name not in self._templates:
+            raise PromptTemplateError(f"Unknown prompt template '{name}'")
+        start = time.perf_counter()
+        self._maybe_reload(name)
+
+        template = self._templates[name]
+        missing = template.fields - kwargs.keys()
+        if missing:
+            raise PromptTemplateError(f"Template '{name}' is missing values for {sorted(missing)}")
+        prompt = template.render(kwargs)
+
+        stats = self._stats[name]
+        stats["renders"] += 1
+        stats["total_ms"] += (time.perf_counter() - start) * 1000
+        return prompt
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Render counts, average render time and reload counts per template"""
+        return {
+            name: {
+                "renders": s["renders"],
+                "avg_render_ms": round(s["total_ms"] / s["renders"], 4) if s["renders"] else 0.0,
+                "reloads": s["reloads"],
+                "reload_errors": s["reload_errors"],
+                "source": "file" if self._templates[name].path else "default"
+            }
+            for name, s in self._stats.items()
+        }
+
+
+# Global registry, built (and validated) at import so a broken template stops startup
+prompt_registry = PromptRegistry()
@@ -0,0 +1,338 @@
+# Rate limiter - token-bucket pacing of OpenAI calls against the org's RPM/TPM quota
+import asyncio
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from token_budget import count_message_tokens
+
+load_dotenv()
+
+# Priority classes: lower is served first
+INTERACTIVE, STANDARD, BATCH = 0, 1, 2
+CLASS_NAMES = {INTERACTIVE: "interactive", STANDARD: "standard", BATCH: "batch"}
+
+ENDPOINT_PRIORITY = {
+    "chat": INTERACTIVE,
+    "chat-summary": INTERACTIVE,
+    "generate-charter": STANDARD,
+    "charter": STANDARD,
+    "analyze-risk": STANDARD,
+    "calculate-risk": STANDARD,
+    "reporting": STANDARD,
+    "project-setup": BATCH,
+    "risk-analysis": BATCH,
+    "pmo-report": BATCH,
+    "lessons-learned": BATCH,
+}
+
+# Share of each bucket a class may not dip into, keeping headroom for the classes above it
+RESERVE_SHARE = {INTERACTIVE: 0.0, STANDARD: 0.1, BATCH: 0.25}
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call would have to queue longer than the configured maximum wait"""
+    pass
+
+
+def _refill(level: float, updated: float, now: float, capacity: float) -> float:
+    # Capacity is one minute of quota, refilled continuously
+    return min(capacity, level + (now - updated) * capacity / 60.0)
+
+
+def _try_take(
+    levels: Dict[str, float],
+    limits: Dict[str, float],
+    costs: Dict[str, float],
+    reserve_share: float
+) -> float:
+    """Deduct `costs` from `levels` in place; returns 0 when taken, else seconds to wait"""
+    wait = 0.0
+    for kind, cost in costs.items():
+        capacity = limits[kind]
+        needed = min(cost, capacity) + reserve_share * capacity
+        if levels[kind] < needed:
+            wait = max(wait, (needed - levels[kind]) * 60.0 / capacity)
+    if wait > 0:
+        return wait
+    for kind, cost in costs.items():
+        levels[kind] -= min(cost, limits[kind])
+    return 0.0
+
+
+class MemoryBucketStore:
+    """Bucket levels for one worker process"""
+
+    def __init__(self):
+        self._buckets: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, model: str, limits: Dict[str, float], costs: Dict[str, float], reserve_share: float) -> float:
+        now = time.time()
+        with self._lock:
+            levels = {}
+            for kind, capacity in limits.items():
+                level, updated = self._buckets.get((model, kind), (capacity, now))
+                levels[kind] = _refill(level, updated, now, capacity)
+            wait = _try_take(levels, limits, costs, reserve_share)
+            for kind, level in levels.items():
+                self._buckets[(model, kind)] = (level, now)
+            return wait
+
+    def adjust(self, model: str, limits: Dict[str, float], kind: str, delta: float):
+        """Return (+) or charge (-) tokens once the real usage is known"""
+        now = time.time()
+        with self._lock:
+            level, updated = self._buckets.get((model, kind), (limits[kind], now))
+            level = _refill(level, updated, now, limits[kind]) + delta
+            self._buckets[(model, kind)] = (min(limits[kind], level), now)
+
+    def levels(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            result: Dict[str, Dict[str, float]] = {}
+            for (model, kind), (level, _) in self._buckets.items():
+                result.setdefault(model, {})[kind] = round(level, 1)
+            return result
+
+
+class SQLiteBucketStore:
+    """Bucket levels in a SQLite file shared by every worker on the host.
+
+    Each take runs in one BEGIN IMMEDIATE transaction, so concurrent workers
+    serialize on the file lock. Put the file on tmpfs (e.g. /dev/shm) to keep
+    it in shared memory.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS rate_buckets (
+                model TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                level REAL NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (model, kind)
+            )"""
+        )
+
+    def _read(self, model: str, limits: Dict[str, float], now: float) -> Dict[str, float]:
+        rows = dict(
+            ((kind, (level, updated)) for kind, level, updated in self._db.execute(
+                "SELECT kind, level, updated FROM rate_buckets WHERE model = ?", (model,)
+            ))
+        )
+        return {
+            kind: _refill(*rows.get(kind, (capacity, now)), now, capacity)
+            for kind, capacity in limits.items()
+        }
+
+    def _write(self, model: str, levels: Dict[str, float], now: float):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO rate_buckets (model, kind, level, updated) VALUES (?, ?, ?, ?)",
+            [(model, kind, level, now) for kind, level in levels.items()]
+        )
+
+    def take(self, model: str, limits: Dict[str, float], costs: Dict[str, float], reserve_share: float) -> float:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                levels = self._read(model, limits, now)
+                wait = _try_take(levels, limits, costs, reserve_share)
+                self._write(model, levels, now)
+                self._db.execute("COMMIT")
+                return wait
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def adjust(self, model: str, limits: Dict[str, float], kind: str, delta: float):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                levels = self._read(model, limits, now)
+                levels[kind] = min(limits[kind], levels[kind] + delta)
+                self._write(model, levels, now)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def levels(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            result: Dict[str, Dict[str, float]] = {}
+            for model, kind, level in self._db.execute("SELECT model, kind, level FROM rate_buckets"):
+                result.setdefault(model, {})[kind] = round(level, 1)
+            return result
+
+
+class RateLimiter:
+    """Paces calls per model against requests/minute and tokens/minute buckets.
+
+    A call costs one request plus its estimated prompt tokens and max_tokens;
+    the estimate is reconciled with the reported usage afterwards. Waiting
+    calls are admitted strictly by priority class, and lower classes must
+    leave RESERVE_SHARE of each bucket untouched, so batch generations cannot
+    drain the quota interactive chat needs (also across workers sharing a
+    SQLite store).
+    """
+
+    def __init__(
+        self,
+        rpm: float,
+        tpm: float,
+        model_limits: Optional[Dict[str, Dict[str, float]]] = None,
+        store=None,
+        max_wait: float = 30.0,
+        hosts: int = 1
+    ):
+        # The org quota is split evenly between hosts; workers on a host share a store
+        self.default_limits = {"requests": rpm / hosts, "tokens": tpm / hosts}
+        self.model_limits = {
+            model: {kind: value / hosts for kind, value in limits.items()}
+            for model, limits in (model_limits or {}).items()
+        }
+        self.store = store or MemoryBucketStore()
+        self.max_wait = max_wait
+        self._queues: Dict[str, List] = {}
+        self._wake: Dict[str, asyncio.Event] = {}
+        self._dispatchers: Dict[str, asyncio.Task] = {}
+        self._seq = itertools.count()
+        self._stats = {
+            name: {"admitted": 0, "queued": 0, "rejected": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+            for name in CLASS_NAMES.values()
+        }
+
+    @classmethod
+    def from_env(cls) -> Optional["RateLimiter"]:
+        """Build the limiter from OPENAI_RATE_* variables (None when disabled)"""
+        if os.getenv("OPENAI_RATE_LIMIT_ENABLED", "true").lower() in ("0", "false", "no"):
+            return None
+        model_limits = {}
+        for item in os.getenv("OPENAI_MODEL_LIMITS", "").split(","):
+            if "=" in item:
+                model, limits = item.split("=", 1)
+                rpm, tpm = limits.split(":")
+                model_limits[model.strip()] = {"requests": float(rpm), "tokens": float(tpm)}
+        state_path = os.getenv("OPENAI_RATE_STATE_PATH")
+        return cls(
+            rpm=float(os.getenv("OPENAI_RPM", "500")),
+            tpm=float(os.getenv("OPENAI_TPM", "80000")),
+            model_limits=model_limits,
+            store=SQLiteBucketStore(state_path) if state_path else MemoryBucketStore(),
+            max_wait=float(os.getenv("OPENAI_RATE_MAX_WAIT", "30")),
+            hosts=int(os.getenv("OPENAI_RATE_HOSTS", "1"))
+        )
+
+    def limits_for(self, model: str) -> Dict[str, float]:
+        return self.model_limits.get(model, self.default_limits)
+
+    @staticmethod
+    def estimate_tokens(params: Dict[str, Any]) -> int:
+        """Prompt tokens plus the completion allowance"""
+        model = params.get("model") or "gpt-4"
+        return count_message_tokens(params.get("messages", []), model) + int(params.get("max_tokens") or 1000)
+
+    async def _take(self, model: str, tokens: int, priority: int) -> float:
+        costs = {"requests": 1, "tokens": tokens}
+        args = (model, self.limits_for(model), costs, RESERVE_SHARE[priority])
+        if isinstance(self.store, SQLiteBucketStore):
+            return await asyncio.to_thread(self.store.take, *args)
+        return self.store.take(*args)
+
+    async def acquire(self, endpoint: str, model: str, tokens: int):
+        """Wait until the call fits the buckets; raises RateLimitExceeded after max_wait"""
+        priority = ENDPOINT_PRIORITY.get(endpoint, STANDARD)
+        stats = self._stats[CLASS_NAMES[priority]]
+        queue = self._queues.setdefault(model, [])
+
+        # Fast path: nobody waiting ahead for this model
+        if not queue and await self._take(model, tokens, priority) == 0:
+            stats["admitted"] += 1
+            return
+
+        start = time.perf_counter()
+        stats["queued"] += 1
+        granted = asyncio.get_running_loop().create_future()
+        heapq.heappush(queue, (priority, next(self._seq), tokens, granted))
+        self._wake.setdefault(model, asyncio.Event()).set()
+        if model not in self._dispatchers:
+            self._dispatchers[model] = asyncio.ensure_future(self._dispatch(model))
+
+        try:
+            await asyncio.wait_for(granted, timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            stats["rejected"] += 1
+            raise RateLimitExceeded(f"Local rate limit for '{model}': waited over {self.max_wait:.0f}s")
+        wait_ms = (time.perf_counter() - start) * 1000
+        stats["admitted"] += 1
+        stats["wait_ms_total"] += wait_ms
+        stats["wait_ms_max"] = max(stats["wait_ms_max"], wait_ms)
+
+    async def _dispatch(self, model: str):
+        """Admit queued calls for one model in priority order as the buckets refill"""
+        queue = self._queues[model]
+        wake = self._wake[model]
+        try:
+            while queue:
+                priority, _, tokens, granted = queue[0]
+                if granted.done():
+                    # The caller gave up (max_wait or disconnect)
+                    heapq.heappop(queue)
+                    continue
+                wait = await self._take(model, tokens, priority)
+                if wait == 0:
+                    heapq.heappop(queue)
+                    if granted.done():
+                        await self.settle(model, tokens, 0)
+                    else:
+                        granted.set_result(None)
+                    continue
+                # Sleep until the head fits, or until a higher-priority call arrives
+                wake.clear()
+                try:
+                    await asyncio.wait_for(wake.wait(), timeout=min(wait, 1.0))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._dispatchers.pop(model, None)
+
+    async def settle(self, model: str, estimated: int, actual: Optional[int]):
+        """Replace the token estimate with the reported usage"""
+        if actual is None or actual == estimated:
+            return
+        limits = self.limits_for(model)
+        args = (model, limits, "tokens", min(estimated, limits["tokens"]) - actual)
+        if isinstance(self.store, SQLiteBucketStore):
+            await asyncio.to_thread(self.store.adjust, *args)
+        else:
+            self.store.adjust(*args)
+
+    def stats(self) -> Dict[str, Any]:
+        """Admission counters per priority class, queue depth and bucket levels"""
+        classes = {}
+        for name, s in self._stats.items():
+            classes[name] = dict(s)
+            classes[name]["wait_ms_total"] = round(s["wait_ms_total"], 2)
+            classes[name]["wait_ms_max"] = round(s["wait_ms_max"], 2)
+        return {
+            "classes": classes,
+            "queued": {model: sum(1 for *_, f in q if not f.done()) for model, q in self._queues.items()},
+            "buckets": self.store.levels(),
+            "limits": {"default": self.default_limits, **self.model_limits},
+            "shared_state": getattr(self.store, "path", None)
+        }
+
+
+# Global limiter in front of every LLM call site (None when disabled)
+rate_limiter = RateLimiter.from_env()
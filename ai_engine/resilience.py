@@ -0,0 +1,254 @@
+# Resilience - retries with jittered backoff, per-endpoint deadlines and a circuit breaker for LLM calls
+import asyncio
+import email.utils
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+import openai
+
+from client_factory import client_factory, parse_endpoint_seconds
+
+# Total time (seconds) an endpoint may spend on one completion, retries included.
+# Override with OPENAI_ENDPOINT_DEADLINES="chat=40,pmo-report=300".
+ENDPOINT_DEADLINES = {
+    "chat": 60.0,
+    "chat-summary": 40.0,
+    "calculate-risk": 40.0,
+    "analyze-risk": 60.0,
+    "charter": 120.0,
+    "generate-charter": 120.0,
+    "reporting": 120.0,
+    "project-setup": 180.0,
+    "risk-analysis": 180.0,
+    "lessons-learned": 180.0,
+    "pmo-report": 240.0,
+}
+
+# HTTP statuses worth another attempt (everything else is the caller's fault)
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while the breaker is open"""
+    pass
+
+
+def is_retryable(error: Exception) -> bool:
+    """Timeouts, connection failures, rate limits and 5xx are transient"""
+    if isinstance(error, (asyncio.TimeoutError, openai.APITimeoutError, openai.APIConnectionError, httpx.TransportError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUSES
+    return False
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Server-requested delay from retry-after-ms / Retry-After (seconds or HTTP date)"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            retry_at = email.utils.parsedate_to_datetime(value)
+            return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive transient failures;
+    open -> half-open after `cooldown` seconds, where one probe call decides
+    whether to close again or re-open.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, cooldown: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.times_opened = 0
+        self.short_circuited = 0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = "half_open"
+        if self.state == "half_open" and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        self.short_circuited += 1
+        return False
+
+    def record_success(self):
+        if self.state != "closed":
+            print(f"Circuit breaker '{self.name}' closed")
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self.probe_in_flight = False
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+                print(f"Circuit breaker '{self.name}' opened after {self.consecutive_failures} failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        """A probe that ended in a non-transient error says nothing about health"""
+        self.probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        retry_in = 0.0
+        if self.state == "open":
+            retry_in = max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "short_circuited": self.short_circuited,
+            "retry_in_seconds": round(retry_in, 1)
+        }
+
+
+class ResilientCaller:
+    """Runs upstream calls with retries, a per-endpoint deadline and one
+    circuit breaker per model (OpenAI rate-limits and degrades per model).
+    """
+
+    def __init__(self):
+        self.max_retries = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+        self.backoff_base = float(os.getenv("OPENAI_BACKOFF_BASE", "0.5"))
+        self.backoff_cap = float(os.getenv("OPENAI_BACKOFF_CAP", "8"))
+        self.failure_threshold = int(os.getenv("OPENAI_BREAKER_FAILURES", "5"))
+        self.cooldown = float(os.getenv("OPENAI_BREAKER_COOLDOWN", "30"))
+        self.default_deadline = float(os.getenv("OPENAI_DEFAULT_DEADLINE", "90"))
+        self.deadlines = dict(ENDPOINT_DEADLINES)
+        self.deadlines.update(parse_endpoint_seconds(os.getenv("OPENAI_ENDPOINT_DEADLINES", "")))
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        if model not in self._breakers:
+            self._breakers[model] = CircuitBreaker(model, self.failure_threshold, self.cooldown)
+        return self._breakers[model]
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    async def call(
+        self,
+        endpoint: str,
+        model: str,
+        attempt_fn: Callable[[httpx.Timeout], Awaitable[Any]],
+        admit: Optional[Callable[[], Awaitable[None]]] = None,
+        refund: Optional[Callable[[], Awaitable[None]]] = None
+    ) -> Any:
+        """Await `attempt_fn(timeout)` until it succeeds, the error is not
+        transient, retries run out or the endpoint deadline passes.
+
+        `admit()` runs before every attempt (rate limiting); time spent there
+        counts against the deadline but never as an upstream failure.
+        `refund()` gives back what `admit()` took for an attempt that failed
+        (or was cancelled), so retries do not stack up reservations; the
+        caller settles the successful attempt itself.
+        """
+        stats = self._stats.setdefault(endpoint, {
+            "calls": 0, "attempts": 0, "retries": 0, "retry_after_honored": 0,
+            "succeeded": 0, "failed": 0, "deadline_exceeded": 0, "short_circuited": 0
+        })
+        stats["calls"] += 1
+        breaker = self.breaker(model)
+        deadline = time.monotonic() + self.deadlines.get(endpoint, self.default_deadline)
+        attempt_timeout = client_factory.timeout_for(endpoint)
+
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                stats["short_circuited"] += 1
+                raise CircuitOpenError(f"Upstream for '{model}' is unavailable (circuit open)")
+
+            if admit is not None:
+                try:
+                    await admit()
+                except BaseException:
+                    breaker.release_probe()
+                    stats["failed"] += 1
+                    raise
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                if admit is not None and refund is not None:
+                    await refund()
+                breaker.release_probe()
+                stats["failed"] += 1
+                stats["deadline_exceeded"] += 1
+                raise asyncio.TimeoutError(f"Deadline for '{endpoint}' passed before the call could start")
+            stats["attempts"] += 1
+            try:
+                # wait_for bounds the whole attempt even if the upstream stalls mid-body
+                result = await asyncio.wait_for(
+                    attempt_fn(httpx.Timeout(min(attempt_timeout.read, remaining), connect=attempt_timeout.connect)),
+                    timeout=remaining
+                )
+            except asyncio.CancelledError:
+                breaker.release_probe()
+                if refund is not None:
+                    await refund()
+                raise
+            except Exception as e:
+                if refund is not None:
+                    await refund()
+                if not is_retryable(e):
+                    breaker.release_probe()
+                    stats["failed"] += 1
+                    raise
+                breaker.record_failure()
+
+                delay = retry_after_seconds(e)
+                if delay is not None:
+                    stats["retry_after_honored"] += 1
+                else:
+                    delay = self.backoff(attempt)
+                if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+                    stats["failed"] += 1
+                    if time.monotonic() + delay >= deadline:
+                        stats["deadline_exceeded"] += 1
+                    raise
+                attempt += 1
+                stats["retries"] += 1
+                await asyncio.sleep(delay)
+                continue
+
+            breaker.record_success()
+            stats["succeeded"] += 1
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Retry counters per endpoint and breaker state per model"""
+        return {
+            "endpoints": {endpoint: dict(s) for endpoint, s in self._stats.items()},
+            "breakers": {model: b.stats() for model, b in self._breakers.items()}
+        }
+
+
+# Global caller shared by cached_create and stream_completion
+resilient = ResilientCaller()
@@ -0,0 +1,243 @@
+# Response cache - content-addressed cache for OpenAI chat completions
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+from openai.types.chat import ChatCompletion
+
+from rate_limiter import RateLimiter, rate_limiter
+from resilience import resilient
+
+load_dotenv()
+
+
+class ResponseCache:
+    """Two-tier (in-memory LRU + optional SQLite) cache of completion payloads.
+
+    Entries are keyed on (endpoint, model, normalized messages, temperature,
+    max_tokens and any other request parameters), so a repeated request with
+    identical inputs is served without calling the upstream model.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_seconds: float = 3600,
+        sqlite_path: Optional[str] = None,
+        max_disk_entries: int = 10000
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self.sqlite_path = sqlite_path
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits_memory": 0,
+            "hits_disk": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0
+        }
+
+        self._db = None
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_response_cache_access ON response_cache (last_access)"
+            )
+            self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["ResponseCache"]:
+        """Build the cache from AI_CACHE_* environment variables (None when disabled)"""
+        if os.getenv("AI_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+            return None
+        return cls(
+            max_entries=int(os.getenv("AI_CACHE_MAX_ENTRIES", "512")),
+            ttl_seconds=float(os.getenv("AI_CACHE_TTL_SECONDS", "3600")),
+            sqlite_path=os.getenv("AI_CACHE_SQLITE_PATH") or None,
+            max_disk_entries=int(os.getenv("AI_CACHE_MAX_DISK_ENTRIES", "10000"))
+        )
+
+    @staticmethod
+    def make_key(endpoint: str, params: Dict[str, Any]) -> str:
+        """Content address for a chat.completions.create request"""
+        messages = [
+            {
+                "role": message.get("role"),
+                # Whitespace-only differences must not defeat the cache
+                "content": " ".join(str(message.get("content", "")).split())
+            }
+            for message in params.get("messages", [])
+        ]
+        extra = {
+            k: v for k, v in params.items()
+            if k not in ("model", "messages", "temperature", "max_tokens")
+        }
+        material = json.dumps(
+            [
+                endpoint,
+                params.get("model"),
+                messages,
+                params.get("temperature"),
+                params.get("max_tokens"),
+                extra
+            ],
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a payload, promoting disk hits into memory"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._stats["hits_memory"] += 1
+                    return value
+                del self._memory[key]
+                self._stats["expirations"] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created_at FROM response_cache WHERE key = ?",
+                    (key,)
+                ).fetchone()
+                if row is not None:
+                    if now - row[1] <= self.ttl_seconds:
+                        self._db.execute(
+                            "UPDATE response_cache SET last_access = ? WHERE key = ?",
+                            (now, key)
+                        )
+                        self._db.commit()
+                        value = json.loads(row[0])
+                        self._put_memory(key, row[1], value)
+                        self._stats["hits_disk"] += 1
+                        return value
+                    self._db.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                    self._db.commit()
+                    self._stats["expirations"] += 1
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key: str, value: Dict[str, Any]):
+        """Store a payload in both tiers, evicting the least recently used entries"""
+        now = time.time()
+        with self._lock:
+            self._put_memory(key, now, value)
+            self._stats["stores"] += 1
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO response_cache (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), now, now)
+                )
+                # Size-based eviction on disk: keep the most recently used rows
+                evicted = self._db.execute(
+                    """DELETE FROM response_cache WHERE key IN (
+                        SELECT key FROM response_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                    )""",
+                    (self.max_disk_entries,)
+                ).rowcount
+                self._db.commit()
+                self._stats["evictions"] += max(evicted, 0)
+
+    def _put_memory(self, key: str, created_at: float, value: Dict[str, Any]):
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def clear(self):
+        """Drop every cached entry"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM response_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and tier sizes"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            if self._db is not None:
+                stats["disk_entries"] = self._db.execute(
+                    "SELECT COUNT(*) FROM response_cache"
+                ).fetchone()[0]
+        lookups = stats["hits_memory"] + stats["hits_disk"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits_memory"] + stats["hits_disk"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+# Global cache instance (None when AI_CACHE_ENABLED=false)
+response_cache = ResponseCache.from_env()
+
+
+async def cached_create(openai_client, endpoint: str, **params) -> ChatCompletion:
+    """Drop-in for `await openai_client.chat.completions.create(**params)` backed by the response cache"""
+    model = params.get("model")
+
+    def attempt(timeout):
+        return openai_client.chat.completions.create(timeout=timeout, **params)
+
+    async def call_upstream() -> ChatCompletion:
+        if rate_limiter is None:
+            return await resilient.call(endpoint, model, attempt)
+        estimated = RateLimiter.estimate_tokens(params)
+        response = await resilient.call(
+            endpoint, model, attempt,
+            admit=lambda: rate_limiter.acquire(endpoint, model, estimated),
+            refund=lambda: rate_limiter.settle(model, estimated, 0)
+        )
+        usage = getattr(response, "usage", None)
+        await rate_limiter.settle(model, estimated, usage.total_tokens if usage else None)
+        return response
+
+    if response_cache is None:
+        return await call_upstream()
+
+    key = ResponseCache.make_key(endpoint, params)
+    # The SQLite tier does blocking I/O, so keep it off the event loop
+    if response_cache.sqlite_path:
+        cached = await asyncio.to_thread(response_cache.get, key)
+    else:
+        cached = response_cache.get(key)
+    if cached is not None:
+        return ChatCompletion.model_validate(cached)
+
+    # Cache hits are served even while the circuit breaker is open
+    response = await call_upstream()
+
+    # Truncated completions are not worth replaying
+    if response.choices and response.choices[0].finish_reason == "stop":
+        payload = response.model_dump(mode="json")
+        if response_cache.sqlite_path:
+            await asyncio.to_thread(response_cache.set, key, payload)
+        else:
+            response_cache.set(key, payload)
+    return response
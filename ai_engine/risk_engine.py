@@ -0,0 +1,306 @@
+# Risk engine - deterministic, vectorized schedule/budget/resource risk scoring
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+# Weights of the subscores in the overall score
+SUBSCORE_WEIGHTS = {"schedule": 0.5, "budget": 0.3, "resource": 0.2}
+
+# A subscore the project has no data for counts as neutral in the overall score,
+# so one lone signal cannot swing a sparsely populated project to 0 or 100
+NEUTRAL_SUBSCORE = 0.5
+
+# Statuses that mark a task or milestone as finished
+DONE_STATUSES = {"completed", "complete", "done", "closed", "achieved", "resolved", "cancelled"}
+
+# Days overdue at which the lateness signal saturates
+LATENESS_SATURATION_DAYS = 30.0
+
+# Share of a project's open tasks one owner can hold before it counts as key-person risk
+OWNER_CONCENTRATION_LIMIT = 0.5
+
+NAT = np.datetime64("NaT", "D")
+
+# Subscores each stored field feeds, per table ("projects" is the project row
+# itself). Inserting or deleting a task, milestone or resource affects every
+# subscore of its table; a change to a field not listed here affects none.
+FIELD_SUBSCORES: Dict[str, Dict[str, Set[str]]] = {
+    "tasks": {
+        "progress": {"schedule", "budget", "resource"},
+        "status": {"schedule", "budget", "resource"},
+        "due_date": {"schedule"},
+        "owner": {"resource"},
+        "assigned_to": {"resource"},
+    },
+    "milestones": {"target_date": {"schedule"}, "status": {"schedule"}, "completed_date": {"schedule"}},
+    "resources": {"name": {"resource"}, "email": {"resource"}, "allocation_percentage": {"resource"}},
+    "projects": {
+        "start_date": {"schedule"}, "end_date": {"schedule"},
+        "budgeted_amount": {"budget"}, "spent_amount": {"budget"},
+    },
+}
+
+
+def _day(value: Any) -> np.datetime64:
+    """ISO date/datetime string or date -> datetime64[D] (NaT when missing or unparseable)"""
+    if value is None or value == "":
+        return NAT
+    if isinstance(value, date):
+        return np.datetime64(value.isoformat()[:10], "D")
+    try:
+        return np.datetime64(str(value)[:10], "D")
+    except ValueError:
+        return NAT
+
+
+def _days(values: List[Any]) -> np.ndarray:
+    """_day over a column, parsed in one call unless some value is malformed"""
+    text = [
+        "NaT" if value is None or value == "" else
+        value.isoformat()[:10] if isinstance(value, date) else str(value)[:10]
+        for value in values
+    ]
+    try:
+        return np.array(text, dtype="datetime64[D]")
+    except ValueError:
+        return np.array([_day(value) for value in values], dtype="datetime64[D]")
+
+
+def _fill(values: np.ndarray, fill: float = 0.0) -> np.ndarray:
+    """NaN -> fill (np.nan_to_num costs more than the arithmetic on small arrays)"""
+    return np.where(np.isnan(values), fill, values)
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _done_flags(records: List[Dict[str, Any]]) -> np.ndarray:
+    """Finished by status or by a recorded completion date"""
+    return np.array([
+        str(r.get("status") or "").lower() in DONE_STATUSES or bool(r.get("completed_date"))
+        for r in records
+    ], dtype=bool)
+
+
+def _codes(labels: List[str]) -> np.ndarray:
+    """Factorize labels into dense integer codes ('' -> -1)"""
+    table: Dict[str, int] = {"": -1}
+    return np.array([table.setdefault(label, len(table) - 1) for label in labels], dtype=np.int64)
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Element-wise ratio that is NaN where the denominator is 0"""
+    out = np.full(numerator.shape, np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def _weighted_mean(parts: List[tuple]) -> np.ndarray:
+    """Mean of (weight, signal) pairs per project, ignoring NaN signals"""
+    values = np.vstack([signal for _, signal in parts])
+    weights = np.array([weight for weight, _ in parts])[:, None] * ~np.isnan(values)
+    total = weights.sum(axis=0)
+    out = np.full(values.shape[1], np.nan)
+    np.divide((_fill(values) * weights).sum(axis=0), total, out=out, where=total > 0)
+    return out
+
+
+def _flatten(projects: List[Dict[str, Any]], field: str) -> tuple:
+    """(project index array, records) for every record under `field` across the portfolio"""
+    index: List[int] = []
+    records: List[Dict[str, Any]] = []
+    for i, project in enumerate(projects):
+        items = project.get(field) or []
+        index.extend([i] * len(items))
+        records.extend(items)
+    return np.asarray(index, dtype=np.int64), records
+
+
+def affected_subscores(table: str, fields: Optional[Iterable[str]] = None) -> Set[str]:
+    """Subscores a change to `fields` of a `table` record can move (all of the table's when fields is None)"""
+    feeds = FIELD_SUBSCORES.get(table, {})
+    if fields is None:
+        return set().union(*feeds.values())
+    return set().union(*(feeds.get(field, set()) for field in fields))
+
+
+def overall_score(subscores: Dict[str, Optional[float]]) -> int:
+    """risk_score (0-100) from 0-100 subscores, missing ones counting as neutral"""
+    total = sum(
+        SUBSCORE_WEIGHTS[name] * (NEUTRAL_SUBSCORE * 100 if subscores.get(name) is None else subscores[name])
+        for name in SUBSCORE_WEIGHTS
+    )
+    return int(round(total / sum(SUBSCORE_WEIGHTS.values())))
+
+
+def score_portfolio(
+    projects: List[Dict[str, Any]],
+    today: Optional[date] = None,
+    subscores: Optional[Iterable[str]] = None
+) -> List[Dict[str, Any]]:
+    """Score every project in one vectorized pass.
+
+    Each project is a dict with optional start_date, end_date,
+    budgeted_amount, spent_amount and lists of tasks (progress, due_date,
+    owner, status), milestones (target_date, status, completed_date) and
+    resources (name, allocation_percentage).
+
+    Returns, per project, risk_score (0-100), subscores (0-100, None when the
+    project has no data for it) and the raw signals behind them. Passing
+    `subscores` computes only those (and their signals); such partial
+    results carry no risk_score -- merge them into a full result and use
+    overall_score.
+    """
+    n = len(projects)
+    if n == 0:
+        return []
+    now = _day(today or date.today())
+    wanted = set(SUBSCORE_WEIGHTS if subscores is None else subscores)
+
+    # --- tasks ---
+    t_idx, tasks = _flatten(projects, "tasks")
+    t_progress = np.array([_number(t.get("progress")) for t in tasks], dtype=float)
+    t_progress = _fill(t_progress, 0.0)
+    t_due = _days([t.get("due_date") for t in tasks])
+    t_open = ~(_done_flags(tasks) | (t_progress >= 100))
+    t_owner = _codes([str(t.get("owner") or t.get("assigned_to") or "").strip().lower() for t in tasks])
+    t_unassigned = (t_owner < 0) & t_open
+
+    days_late = (now - t_due).astype("timedelta64[D]").astype(float)
+    days_late[np.isnat(t_due)] = np.nan
+    t_overdue = t_open & (_fill(days_late, -1.0) > 0)
+
+    task_count = np.bincount(t_idx, minlength=n).astype(float)
+    open_count = np.bincount(t_idx, weights=t_open, minlength=n)
+    overdue_count = np.bincount(t_idx, weights=t_overdue, minlength=n)
+    progress_avg = _ratio(np.bincount(t_idx, weights=t_progress, minlength=n), task_count) / 100.0
+    lateness = _ratio(
+        np.bincount(t_idx, weights=np.where(t_overdue, np.minimum(_fill(days_late), LATENESS_SATURATION_DAYS), 0.0), minlength=n),
+        overdue_count
+    ) / LATENESS_SATURATION_DAYS
+    lateness[overdue_count == 0] = np.where(task_count[overdue_count == 0] > 0, 0.0, np.nan)
+
+    # Largest share of a project's open tasks held by one owner
+    owned = t_open & ~t_unassigned
+    concentration = np.full(n, np.nan)
+    if owned.any():
+        pairs = t_idx[owned] * (t_owner.max() + 1) + t_owner[owned]
+        _, pair_codes = np.unique(pairs, return_inverse=True)
+        pair_counts = np.bincount(pair_codes)
+        pair_project = np.zeros(len(pair_counts), dtype=np.int64)
+        pair_project[pair_codes] = t_idx[owned]
+        top = np.zeros(n)
+        np.maximum.at(top, pair_project, pair_counts)
+        owned_count = np.bincount(t_idx, weights=owned, minlength=n)
+        concentration = _ratio(top, owned_count)
+
+    overdue_ratio = _ratio(overdue_count, open_count)
+    overdue_ratio[(open_count == 0) & (task_count > 0)] = 0.0
+    signals = {
+        "tasks": task_count, "open_tasks": open_count, "overdue_tasks": overdue_count,
+        "avg_progress": progress_avg * 100,
+    }
+    scores = {}
+
+    # Each section below feeds one subscore; a partial recompute skips the others
+
+    # --- schedule: tasks, milestones and the project timeline ---
+    if "schedule" in wanted:
+        m_idx, milestones = _flatten(projects, "milestones")
+        m_target = _days([m.get("target_date") for m in milestones])
+        m_done = _done_flags(milestones)
+        m_completed = _days([m.get("completed_date") for m in milestones])
+        m_missed = (~m_done & ~np.isnat(m_target) & (m_target < now)) | (
+            m_done & ~np.isnat(m_completed) & ~np.isnat(m_target) & (m_completed > m_target)
+        )
+        milestone_slip = _ratio(
+            np.bincount(m_idx, weights=m_missed, minlength=n),
+            np.bincount(m_idx, minlength=n).astype(float)
+        )
+
+        start = _days([p.get("start_date") for p in projects])
+        end = _days([p.get("end_date") for p in projects])
+        duration = (end - start).astype("timedelta64[D]").astype(float)
+        elapsed = (now - start).astype("timedelta64[D]").astype(float)
+        duration[np.isnat(start) | np.isnat(end)] = np.nan
+        expected_progress = np.clip(_ratio(_fill(elapsed), _fill(duration)), 0.0, 1.0)
+        expected_progress[np.isnan(duration)] = np.nan
+        progress_gap = np.clip(expected_progress - progress_avg, 0.0, 1.0)
+
+        scores["schedule"] = _weighted_mean([
+            (0.4, overdue_ratio), (0.25, milestone_slip), (0.25, progress_gap), (0.1, lateness)
+        ])
+        signals["expected_progress"] = expected_progress * 100
+        signals["milestone_slip"] = milestone_slip
+
+    # --- budget: spend against budget and delivered progress ---
+    if "budget" in wanted:
+        budgeted = np.array([_number(p.get("budgeted_amount")) for p in projects])
+        spent = np.array([_number(p.get("spent_amount")) for p in projects])
+        burn = _ratio(_fill(spent), _fill(budgeted))
+        # Spending ahead of delivered progress, then spending past the budget itself
+        overspend = np.clip(burn - _fill(progress_avg), 0.0, 1.0)
+        overrun = np.clip(burn - 1.0, 0.0, 1.0)
+
+        scores["budget"] = _weighted_mean([(0.6, overspend), (0.4, overrun)])
+        signals["burn_rate"] = burn
+
+    # --- resource: task ownership and allocation (summed per person across the whole portfolio) ---
+    if "resource" in wanted:
+        r_idx, resources = _flatten(projects, "resources")
+        r_person = _codes([str(r.get("name") or r.get("email") or "").strip().lower() for r in resources])
+        r_alloc = _fill(np.array([_number(r.get("allocation_percentage")) for r in resources], dtype=float), 100.0)
+        overallocated_share = np.full(n, np.nan)
+        if resources:
+            person_total = np.bincount(r_person + 1, weights=r_alloc)
+            r_over = (person_total[r_person + 1] > 100) & (r_person >= 0)
+            overallocated_share = _ratio(
+                np.bincount(r_idx, weights=r_over, minlength=n),
+                np.bincount(r_idx, minlength=n).astype(float)
+            )
+
+        unassigned_ratio = _ratio(np.bincount(t_idx, weights=t_unassigned, minlength=n), open_count)
+        concentration_excess = np.clip(
+            (concentration - OWNER_CONCENTRATION_LIMIT) / (1 - OWNER_CONCENTRATION_LIMIT), 0.0, 1.0
+        )
+        concentration_excess[open_count < 3] = np.where(np.isnan(concentration[open_count < 3]), np.nan, 0.0)
+
+        scores["resource"] = _weighted_mean([
+            (0.5, unassigned_ratio), (0.3, concentration_excess), (0.2, overallocated_share)
+        ])
+        signals["unassigned_ratio"] = unassigned_ratio
+        signals["owner_concentration"] = concentration
+        signals["overallocated_share"] = overallocated_share
+
+    overall = None
+    if len(scores) == len(SUBSCORE_WEIGHTS):
+        overall = sum(
+            SUBSCORE_WEIGHTS[name] * _fill(values, NEUTRAL_SUBSCORE)
+            for name, values in scores.items()
+        ) / sum(SUBSCORE_WEIGHTS.values())
+
+    results = []
+    for i, project in enumerate(projects):
+        result = {"project_id": project.get("id", project.get("project_id"))}
+        if overall is not None:
+            result["risk_score"] = int(round(overall[i] * 100))
+        result["subscores"] = {
+            name: None if np.isnan(values[i]) else int(round(values[i] * 100))
+            for name, values in scores.items()
+        }
+        result["signals"] = {
+            name: None if np.isnan(values[i]) else round(float(values[i]), 3)
+            for name, values in signals.items()
+        }
+        results.append(result)
+    return results
+
+
+def score_project(project: Dict[str, Any], today: Optional[date] = None) -> Dict[str, Any]:
+    """Score a single project (see score_portfolio)"""
+    return score_portfolio([project], today)[0]
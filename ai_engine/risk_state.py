@@ -0,0 +1,211 @@
+# Risk state - last scored inputs and results per project, for incremental risk recomputation
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from dotenv import load_dotenv
+
+from risk_engine import SUBSCORE_WEIGHTS, affected_subscores
+
+load_dotenv()
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "risk_state.db")
+
+# Change event entity -> the project view list it lives in ("project" is the row itself)
+ENTITY_TABLES = {
+    "task": "tasks",
+    "milestone": "milestones",
+    "resource": "resources",
+    "risk": "risks",
+    "project": "projects",
+}
+
+
+def apply_changes(inputs: Dict[str, Any], events: List[Dict[str, Any]]) -> Set[str]:
+    """Apply change events to a project view in place; returns the subscores they affect.
+
+    An event is {"entity": "task" | "milestone" | "resource" | "risk" |
+    "project", "action": "update" | "create" | "delete", "data": {...}}.
+    Updates merge `data` into the record with the same id (creating it when
+    unknown); only fields whose value actually changed count. Unknown
+    entities raise ValueError.
+    """
+    affected: Set[str] = set()
+    for event in events:
+        table = ENTITY_TABLES.get(str(event.get("entity", "")).lower())
+        if table is None:
+            raise ValueError(f"Unknown change entity: {event.get('entity')!r}")
+        action = str(event.get("action") or "update").lower()
+        data = event.get("data") or {}
+
+        if table == "projects":
+            changed = [k for k, v in data.items() if k != "id" and inputs.get(k) != v]
+            inputs.update(data)
+            affected |= affected_subscores(table, changed)
+            continue
+
+        records = inputs.setdefault(table, [])
+        index = next(
+            (i for i, r in enumerate(records) if "id" in data and r.get("id") == data["id"]),
+            None
+        )
+        if action == "delete":
+            if index is not None:
+                del records[index]
+                affected |= affected_subscores(table)
+        elif index is None:
+            records.append(dict(data))
+            affected |= affected_subscores(table)
+        else:
+            record = records[index]
+            changed = [k for k, v in data.items() if record.get(k) != v]
+            record.update(data)
+            affected |= affected_subscores(table, changed)
+    return affected
+
+
+def merge_result(previous: Dict[str, Any], partial: Dict[str, Any]) -> Dict[str, Any]:
+    """Previous full result with a partial score_portfolio result's subscores and signals laid over it"""
+    merged = copy.deepcopy(previous)
+    merged["subscores"].update(partial["subscores"])
+    merged["signals"].update(partial["signals"])
+    return merged
+
+
+class RiskState:
+    """Per-project record of the last risk scoring, in SQLite.
+
+    Each row keeps the project view the score was computed from, the
+    result, the day it was computed for, and the narrative summary together
+    with the result it was written for. Change events are applied to the
+    stored view so only the subscores they touch are recomputed, and the
+    narrative is regenerated only once the score has moved by at least
+    `materiality` points since it was written.
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, materiality: float = 5.0):
+        self.path = path
+        self.materiality = materiality
+
+        self._lock = threading.Lock()
+        self._stats = {
+            "events": 0,
+            "full_rescores": 0,
+            "partial_rescores": 0,
+            "unchanged": 0,
+            "summaries_generated": 0,
+            "summaries_reused": 0
+        }
+        self._recomputed = {name: 0 for name in SUBSCORE_WEIGHTS}
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS risk_state (
+                project_id INTEGER PRIMARY KEY,
+                inputs TEXT NOT NULL,
+                result TEXT NOT NULL,
+                as_of TEXT NOT NULL,
+                summary TEXT,
+                summary_result TEXT,
+                updated_at REAL NOT NULL
+            )"""
+        )
+
+    @classmethod
+    def from_env(cls) -> "RiskState":
+        """Build the store from AI_RISK_* environment variables"""
+        return cls(
+            path=os.getenv("AI_RISK_STATE_SQLITE_PATH") or DEFAULT_DB_PATH,
+            materiality=float(os.getenv("AI_RISK_MATERIALITY", "5"))
+        )
+
+    # --- blocking SQLite operations (run via asyncio.to_thread) ---
+
+    def get(self, project_id: int) -> Optional[Dict[str, Any]]:
+        """Stored state of a project (a private copy), or None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT inputs, result, as_of, summary, summary_result FROM risk_state WHERE project_id = ?",
+                (project_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        inputs, result, as_of, summary, summary_result = row
+        return {
+            "inputs": json.loads(inputs),
+            "result": json.loads(result),
+            "as_of": as_of,
+            "summary": summary,
+            "summary_result": json.loads(summary_result) if summary_result else None
+        }
+
+    def put(self, project_id: int, state: Dict[str, Any]):
+        with self._lock:
+            self._db.execute(
+                """INSERT OR REPLACE INTO risk_state
+                   (project_id, inputs, result, as_of, summary, summary_result, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    project_id,
+                    json.dumps(state["inputs"], default=str),
+                    json.dumps(state["result"]),
+                    state["as_of"],
+                    state.get("summary"),
+                    json.dumps(state["summary_result"]) if state.get("summary_result") else None,
+                    time.time()
+                )
+            )
+
+    # --- decisions and counters ---
+
+    def is_material(self, before: Optional[Dict[str, Any]], after: Dict[str, Any],
+                    threshold: Optional[float] = None) -> bool:
+        """Whether the score moved enough since `before` to warrant a new narrative"""
+        if before is None:
+            return True
+        threshold = self.materiality if threshold is None else threshold
+        pairs = [(before.get("risk_score"), after.get("risk_score"))] + [
+            (before.get("subscores", {}).get(name), after.get("subscores", {}).get(name))
+            for name in SUBSCORE_WEIGHTS
+        ]
+        for old, new in pairs:
+            if (old is None) != (new is None):
+                return True
+            if old is not None and abs(new - old) >= threshold:
+                return True
+        return False
+
+    def record(self, events: int, recomputed: Optional[Set[str]], summary: Optional[str] = None):
+        """Count one rescoring (recomputed None = full) and what happened to its narrative"""
+        with self._lock:
+            self._stats["events"] += events
+            if recomputed is None:
+                self._stats["full_rescores"] += 1
+                recomputed = set(SUBSCORE_WEIGHTS)
+            elif recomputed:
+                self._stats["partial_rescores"] += 1
+            else:
+                self._stats["unchanged"] += 1
+            for name in recomputed:
+                self._recomputed[name] += 1
+            if summary is not None:
+                self._stats[f"summaries_{summary}"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["subscores_recomputed"] = dict(self._recomputed)
+        summaries = stats["summaries_generated"] + stats["summaries_reused"]
+        stats["summary_reuse_rate"] = round(stats["summaries_reused"] / summaries, 3) if summaries else 0.0
+        stats["materiality"] = self.materiality
+        return stats
+
+
+# Global store shared by the risk endpoints
+risk_state = RiskState.from_env()
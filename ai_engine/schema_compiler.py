@@ -0,0 +1,139 @@
+# Schema compiler - turns response JSON schemas into validate-and-fill closures
+from typing import Any, Callable, Dict
+
+Validator = Callable[[Any], Any]
+
+
+class UnparseableNumber(ValueError):
+    """A number field holds text that is not a number ("abc", NaN)"""
+    pass
+
+
+def _passthrough(value: Any) -> Any:
+    return value
+
+
+def compile_schema(schema: Dict[str, Any]) -> Validator:
+    """Compile `schema` into `validate(value) -> fixed value`.
+
+    The schema is read once here; the returned closure tree does no dict
+    lookups on the schema per call. Semantics:
+
+    - object: non-dicts become {}; present properties are validated
+      recursively; missing required properties are filled with the
+      property's default (itself filled recursively); a null optional
+      property is left null so callers can still tell it was not given
+    - array: non-lists become []; items are validated with `items`
+    - string: None -> "", other scalars are stringified; an `enum` value is
+      matched case-insensitively onto its canonical spelling, else ""
+    - number / integer: None -> 0, clamped to `minimum`/`maximum`; an
+      `enum` miss falls back to the clamped 0. Unparseable text or NaN
+      raises UnparseableNumber (a ValueError, so the response fails
+      validation) rather than passing as 0 -- except in an optional
+      property, which becomes null
+    - anything else (or no type) passes through unchanged
+
+    Calling a compiled validator with None yields the field's default.
+    """
+    kind = schema.get("type")
+    if kind == "object":
+        return _compile_object(schema)
+    if kind == "array":
+        return _compile_array(schema)
+    if kind == "string":
+        return _compile_string(schema)
+    if kind in ("number", "integer"):
+        return _compile_number(schema, int if kind == "integer" else float)
+    if kind == "boolean":
+        return lambda value: bool(value) if value is not None else False
+    return _passthrough
+
+
+def _compile_object(schema: Dict[str, Any]) -> Validator:
+    properties = {name: compile_schema(sub) for name, sub in schema.get("properties", {}).items()}
+    required = tuple((name, properties.get(name, _passthrough)) for name in schema.get("required", ()))
+    # Nulls of optional properties are kept; only required ones get a default
+    nullable = {name: check for name, check in properties.items() if name not in dict(required)}
+    lookup = properties.get
+
+    def validate(value: Any) -> Dict[str, Any]:
+        if not isinstance(value, dict):
+            value = {}
+        result = {}
+        for name, current in value.items():
+            check = lookup(name)
+            if check is None or (current is None and name in nullable):
+                result[name] = current
+            elif name in nullable:
+                try:
+                    result[name] = check(current)
+                except UnparseableNumber:
+                    result[name] = None
+            else:
+                result[name] = check(current)
+        for name, check in required:
+            if name not in result:
+                result[name] = check(None)
+        return result
+
+    return validate
+
+
+def _compile_array(schema: Dict[str, Any]) -> Validator:
+    item = compile_schema(schema["items"]) if "items" in schema else _passthrough
+
+    if item is _passthrough:
+        return lambda value: list(value) if isinstance(value, list) else []
+
+    def validate(value: Any) -> list:
+        if not isinstance(value, list):
+            return []
+        return [item(v) for v in value]
+
+    return validate
+
+
+def _compile_string(schema: Dict[str, Any]) -> Validator:
+    if "enum" not in schema:
+        return lambda value: "" if value is None else value if type(value) is str else str(value)
+
+    allowed = frozenset(schema["enum"])
+    canonical = {str(option).strip().lower(): option for option in schema["enum"]}
+
+    def validate(value: Any) -> str:
+        if type(value) is str and value in allowed:
+            return value
+        return canonical.get(str(value).strip().lower(), "") if value is not None else ""
+
+    return validate
+
+
+def _compile_number(schema: Dict[str, Any], cast: Callable[[Any], Any]) -> Validator:
+    low = schema.get("minimum")
+    high = schema.get("maximum")
+    allowed = frozenset(schema["enum"]) if "enum" in schema else None
+
+    def clamp(number):
+        if low is not None and number < low:
+            return cast(low)
+        if high is not None and number > high:
+            return cast(high)
+        return number
+
+    fallback = clamp(0)
+
+    def validate(value: Any):
+        if value is None:
+            return fallback
+        try:
+            number = float(value)
+            if number != number:
+                raise ValueError("NaN")
+            number = clamp(cast(number))
+        except (TypeError, ValueError, OverflowError):
+            raise UnparseableNumber(f"Expected a number, got {value!r}") from None
+        if allowed is not None and number not in allowed:
+            return fallback
+        return number
+
+    return validate
@@ -0,0 +1,404 @@
+# Semantic cache - serves /chat answers to paraphrased questions from local embeddings
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from token_budget import count_tokens
+
+load_dotenv()
+
+# Words that carry no meaning for matching questions ("how do I ..." vs "how to ...")
+STOPWORDS = frozenset(
+    "a an and are as at be can could do does for from how i in is it me my of on or our should "
+    "the this to we what when where which who why will with would you your".split()
+)
+
+# Negations flip a question's meaning while changing a single word, so they
+# are normalized ("shouldn't" -> "should not") and weighted heavily
+NEGATIONS = frozenset(("not", "no", "never", "without", "none", "nor"))
+NEGATION_WEIGHT = 6.0
+_CONTRACTIONS = [(re.compile(r"\bwon't\b"), "will not"), (re.compile(r"\bcan(?:'t|not)\b"), "can not"),
+                 (re.compile(r"n't\b"), " not")]
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _stem(word: str) -> str:
+    """Light suffix stripping so "risks"/"risk" and "planning"/"plan" share features"""
+    for suffix in ("ing", "ed", "es", "s"):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[: -len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, stemmed content words of `text`; negations are kept (and contractions expanded)"""
+    text = text.lower().replace("\u2019", "'")
+    for pattern, replacement in _CONTRACTIONS:
+        text = pattern.sub(replacement, text)
+    return [_stem(w) for w in _WORD.findall(text) if w not in STOPWORDS]
+
+
+class HashingEmbedder:
+    """Feature-hashed word, word-pair and character-trigram vectors (NumPy only, no model download).
+
+    A lexical model: it matches rewordings that share most of their content
+    words ("how do I write a RACI?" / "how to write a RACI chart"), not
+    synonyms. SEMANTIC_CACHE_MODEL switches to a sentence-transformers model.
+    """
+
+    # Bumped whenever the features change, so stored vectors (artifact index) get re-embedded
+    name = "hashing-v2"
+    default_threshold = 0.75
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def _features(self, text: str) -> Dict[str, float]:
+        # Word pairs weigh as much as words and trigrams little: questions sharing
+        # a template ("what is the difference between X and Scrum") must stay apart
+        words = tokenize(text)
+        features: Dict[str, float] = {}
+        for word in words:
+            features["w:" + word] = features.get("w:" + word, 0.0) + 1.0
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                key = "c:" + padded[i:i + 3]
+                features[key] = features.get(key, 0.0) + 0.1
+        for first, second in zip(words, words[1:]):
+            key = f"b:{first} {second}"
+            features[key] = features.get(key, 0.0) + 1.0
+        # Any negation, and what it negates, set "escalate" and "not escalate" apart
+        for i, word in enumerate(words):
+            if word in NEGATIONS:
+                features["n:"] = features.get("n:", 0.0) + NEGATION_WEIGHT
+                if i + 1 < len(words):
+                    key = "n:" + words[i + 1]
+                    features[key] = features.get(key, 0.0) + NEGATION_WEIGHT
+        return features
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in self._features(text).items():
+            h = zlib.crc32(feature.encode())
+            # The top bit picks the sign so colliding features tend to cancel out
+            vector[h % self.dim] += (1.0 if h & 0x80000000 else -1.0) * np.log1p(weight)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+
+class SentenceTransformerEmbedder:
+    """A sentence-transformers model run on CPU (optional dependency: pip install sentence-transformers)"""
+
+    default_threshold = 0.9
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.name = model_name
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self._model.get_sentence_embedding_dimension()
+
+    def embed(self, text: str) -> np.ndarray:
+        return self._model.encode(text, normalize_embeddings=True).astype(np.float32)
+
+
+_embedders: Dict[str, Any] = {}
+
+
+def load_embedder(model: Optional[str] = None):
+    """The named sentence-transformers model, or the hashing embedder when unset or unavailable.
+
+    Embedders are shared, so the cache and the artifact index load a model once.
+    """
+    key = model or "hashing"
+    if key not in _embedders:
+        embedder = None
+        if model:
+            try:
+                embedder = SentenceTransformerEmbedder(model)
+            except Exception as e:
+                print(f"Embeddings: cannot load {model} ({str(e)}), using the hashing embedder")
+        _embedders[key] = embedder or HashingEmbedder()
+    return _embedders[key]
+
+
+class _Namespace:
+    """One tenant's vectors and answers.
+
+    Searched flat (one matrix-vector product) until `ivf_min_entries`
+    entries; from then on through an IVF index: spherical k-means
+    centroids, with only the `nprobe` closest lists scanned per lookup. The
+    index is retrained whenever the namespace has doubled since training.
+    """
+
+    def __init__(self, dim: int, ivf_min_entries: int, nprobe: int, capacity: int = 64):
+        self.ivf_min_entries = ivf_min_entries
+        self.nprobe = nprobe
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.contexts = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.last_used = np.zeros(capacity)
+        self.entries: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self.free: List[int] = list(range(capacity - 1, -1, -1))
+        self.size = 0
+
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[List[int]] = []
+        self.slot_list = np.full(capacity, -1, dtype=np.int64)
+        self.trained_size = 0
+
+    def _grow(self):
+        old = len(self.alive)
+        new = old * 2
+        self.vectors = np.vstack([self.vectors, np.zeros_like(self.vectors)])
+        self.contexts = np.concatenate([self.contexts, np.zeros(old, dtype=np.int64)])
+        self.alive = np.concatenate([self.alive, np.zeros(old, dtype=bool)])
+        self.last_used = np.concatenate([self.last_used, np.zeros(old)])
+        self.slot_list = np.concatenate([self.slot_list, np.full(old, -1, dtype=np.int64)])
+        self.entries.extend([None] * old)
+        self.free.extend(range(new - 1, old - 1, -1))
+
+    def add(self, vector: np.ndarray, context: int, entry: Dict[str, Any]) -> int:
+        if not self.free:
+            self._grow()
+        slot = self.free.pop()
+        self.vectors[slot] = vector
+        self.contexts[slot] = context
+        self.alive[slot] = True
+        self.last_used[slot] = entry["created_at"]
+        self.entries[slot] = entry
+        self.size += 1
+        if self.centroids is not None:
+            nearest = int(np.argmax(self.centroids @ vector))
+            self.lists[nearest].append(slot)
+            self.slot_list[slot] = nearest
+        if self.size >= self.ivf_min_entries and self.size >= 2 * self.trained_size:
+            self._train()
+        return slot
+
+    def remove(self, slot: int):
+        if self.slot_list[slot] >= 0:
+            self.lists[self.slot_list[slot]].remove(slot)
+            self.slot_list[slot] = -1
+        self.alive[slot] = False
+        self.entries[slot] = None
+        self.free.append(slot)
+        self.size -= 1
+
+    def lru_slot(self) -> int:
+        return int(np.argmin(np.where(self.alive, self.last_used, np.inf)))
+
+    def _train(self, iterations: int = 8):
+        slots = np.flatnonzero(self.alive)
+        data = self.vectors[slots]
+        nlist = max(1, int(np.sqrt(len(slots))))
+        rng = np.random.default_rng(len(slots))
+        centroids = data[rng.choice(len(slots), nlist, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(data @ centroids.T, axis=1)
+            members = np.zeros((nlist, len(slots)), dtype=np.float32)
+            members[assignment, np.arange(len(slots))] = 1.0
+            sums = members @ data
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # An empty list keeps its previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+        assignment = np.argmax(data @ centroids.T, axis=1)
+        self.centroids = centroids
+        self.lists = [[] for _ in range(nlist)]
+        self.slot_list[:] = -1
+        for slot, cell in zip(slots.tolist(), assignment.tolist()):
+            self.lists[cell].append(slot)
+            self.slot_list[slot] = cell
+        self.trained_size = len(slots)
+
+    def search(self, vector: np.ndarray, context: int) -> tuple:
+        """(slot, similarity) of the closest live entry with the same context, or (None, 0.0)"""
+        if self.size == 0:
+            return None, 0.0
+        if self.centroids is None:
+            # Scoring every row and masking beats gathering the matching rows first
+            similarities = self.vectors @ vector
+            similarities[~(self.alive & (self.contexts == context))] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] == -np.inf:
+                return None, 0.0
+            return best, float(similarities[best])
+        probe = np.argsort(self.centroids @ vector)[::-1][:self.nprobe]
+        candidates = np.fromiter((slot for cell in probe for slot in self.lists[cell]), dtype=np.int64)
+        candidates = candidates[self.contexts[candidates] == context]
+        if len(candidates) == 0:
+            return None, 0.0
+        similarities = self.vectors[candidates] @ vector
+        best = int(np.argmax(similarities))
+        return int(candidates[best]), float(similarities[best])
+
+
+class SemanticCache:
+    """Nearest-neighbour cache of chat answers, namespaced per tenant.
+
+    A question is embedded locally; the closest cached question asked in the
+    same context (project context, language and prior turns, compared by
+    fingerprint) is served when its cosine similarity reaches `threshold`.
+    Each namespace holds at most `max_entries` answers, evicting the least
+    recently used, and answers older than `ttl_seconds` are dropped.
+    """
+
+    def __init__(
+        self,
+        embedder=None,
+        threshold: Optional[float] = None,
+        max_entries: int = 5000,
+        ttl_seconds: float = 86400,
+        ivf_min_entries: int = 2048,
+        nprobe: int = 8
+    ):
+        self.embedder = embedder or HashingEmbedder()
+        self.threshold = self.embedder.default_threshold if threshold is None else threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.ivf_min_entries = ivf_min_entries
+        self.nprobe = nprobe
+
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "latency_saved_ms": 0.0,
+            "tokens_saved": 0,
+            "lookup_ms_total": 0.0
+        }
+
+    @classmethod
+    def from_env(cls) -> Optional["SemanticCache"]:
+        """Build the cache from SEMANTIC_CACHE_* environment variables (None when disabled)"""
+        if os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+            return None
+        threshold = os.getenv("SEMANTIC_CACHE_THRESHOLD")
+        return cls(
+            embedder=load_embedder(os.getenv("SEMANTIC_CACHE_MODEL")),
+            threshold=float(threshold) if threshold else None,
+            max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000")),
+            ttl_seconds=float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "86400")),
+            ivf_min_entries=int(os.getenv("SEMANTIC_CACHE_IVF_MIN_ENTRIES", "2048")),
+            nprobe=int(os.getenv("SEMANTIC_CACHE_NPROBE", "8"))
+        )
+
+    @staticmethod
+    def fingerprint(context: Any) -> int:
+        """Stable 63-bit id of everything besides the question that shapes the answer"""
+        digest = hashlib.blake2b(
+            json.dumps(context, sort_keys=True, default=str).encode(), digest_size=8
+        ).digest()
+        return int.from_bytes(digest, "big") >> 1
+
+    def lookup(self, tenant: str, question: str, context: Any) -> Dict[str, Any]:
+        """Probe for a cached answer; pass the returned probe to store() after a miss.
+
+        The probe carries `hit` (the cached answer, its similarity and the
+        tokens/latency it saved) or None.
+        """
+        start = time.perf_counter()
+        vector = self.embedder.embed(question)
+        fingerprint = self.fingerprint(context)
+        hit = None
+        with self._lock:
+            namespace = self._namespaces.get(tenant)
+            slot, similarity = namespace.search(vector, fingerprint) if namespace else (None, 0.0)
+            if slot is not None and similarity >= self.threshold:
+                entry = namespace.entries[slot]
+                now = time.time()
+                if now - entry["created_at"] > self.ttl_seconds:
+                    namespace.remove(slot)
+                    self._stats["expirations"] += 1
+                else:
+                    namespace.last_used[slot] = now
+                    entry["hits"] += 1
+                    hit = {
+                        "answer": entry["answer"],
+                        "similarity": round(similarity, 4),
+                        "tokens": entry["tokens"],
+                        "latency_ms": entry["latency_ms"]
+                    }
+            if hit:
+                self._stats["hits"] += 1
+                self._stats["latency_saved_ms"] += hit["latency_ms"]
+                self._stats["tokens_saved"] += hit["tokens"]
+            else:
+                self._stats["misses"] += 1
+            self._stats["lookup_ms_total"] += (time.perf_counter() - start) * 1000
+        return {"tenant": tenant, "vector": vector, "context": fingerprint, "hit": hit}
+
+    def store(self, probe: Dict[str, Any], answer: str, tokens: int = 0, latency_ms: float = 0.0):
+        """Cache the answer generated after a missed lookup"""
+        if not answer:
+            return
+        with self._lock:
+            namespace = self._namespaces.get(probe["tenant"])
+            if namespace is None:
+                namespace = self._namespaces[probe["tenant"]] = _Namespace(
+                    self.embedder.dim, self.ivf_min_entries, self.nprobe
+                )
+            while namespace.size >= self.max_entries:
+                namespace.remove(namespace.lru_slot())
+                self._stats["evictions"] += 1
+            namespace.add(probe["vector"], probe["context"], {
+                "answer": answer,
+                "tokens": tokens,
+                "latency_ms": latency_ms,
+                "created_at": time.time(),
+                "hits": 0
+            })
+            self._stats["stores"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit rate, latency and tokens saved, and namespace sizes"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["namespaces"] = len(self._namespaces)
+            stats["entries"] = sum(n.size for n in self._namespaces.values())
+            stats["ivf_namespaces"] = sum(1 for n in self._namespaces.values() if n.centroids is not None)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["avg_lookup_ms"] = round(stats.pop("lookup_ms_total") / lookups, 3) if lookups else 0.0
+        stats["latency_saved_ms"] = round(stats["latency_saved_ms"], 1)
+        stats["embedder"] = self.embedder.name
+        stats["threshold"] = self.threshold
+        return stats
+
+
+class StoreOnComplete:
+    """Stream observer (see streaming.stream_completion) that caches the finished answer"""
+
+    def __init__(self, cache: SemanticCache, probe: Dict[str, Any], prompt_tokens: int = 0):
+        self.cache = cache
+        self.probe = probe
+        self.prompt_tokens = prompt_tokens
+        self.start = time.perf_counter()
+
+    def on_delta(self, text: str) -> list:
+        return []
+
+    def on_complete(self, content: str, finish_reason: Optional[str] = None) -> Dict[str, Any]:
+        # Answers cut off at max_tokens are not worth replaying
+        if finish_reason != "stop":
+            return {}
+        latency_ms = (time.perf_counter() - self.start) * 1000
+        self.cache.store(self.probe, content, self.prompt_tokens + count_tokens(content), latency_ms)
+        return {}
+
+
+# Global cache instance (None when SEMANTIC_CACHE_ENABLED=false)
+semantic_cache = SemanticCache.from_env()
@@ -0,0 +1,51 @@
+# Single-flight - coalesces concurrent identical requests into one upstream call
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """Shares one in-flight call between all concurrent callers with the same key.
+
+    The first caller (the leader) runs the work; callers arriving while it is
+    still running await the same task and receive the same result or exception.
+    Once the task finishes the key is released, so later requests run fresh
+    (and are served by the response cache when it is enabled).
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._stats = {"calls": 0, "leaders": 0, "coalesced": 0}
+
+    @staticmethod
+    def make_key(endpoint: str, payload: Dict[str, Any]) -> str:
+        """Stable key for an endpoint and its request payload"""
+        material = json.dumps([endpoint, payload], sort_keys=True, default=str)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    async def do(self, key: str, work: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `work()` once per key across concurrent callers"""
+        self._stats["calls"] += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            self._stats["leaders"] += 1
+            task = asyncio.ensure_future(work())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self._stats["coalesced"] += 1
+
+        # Shield the shared task so one disconnecting client does not cancel
+        # the call the other waiters depend on
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        """Call counters; `coalesced` is the number of callers that shared a leader's call"""
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._in_flight)
+        return stats
+
+
+# Global instance shared by the request handlers
+singleflight = SingleFlight()
@@ -0,0 +1,284 @@
+# Stream validator - incremental JSON parsing and schema checks over streamed completions
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from json_repair import repair_json
+from schema_compiler import compile_schema
+from streaming import StreamAbort
+
+# Completed items streamed to the client, per response schema: path -> event name.
+# "*" stands for any array index.
+EMIT_PATHS = {
+    "project-setup": {
+        ("wbs", "phases", "*"): "phase",
+        ("timeline", "milestones", "*"): "milestone",
+        ("risks", "*"): "risk",
+    },
+    "risk-analysis": {
+        ("work_breakdown_structure", "phases", "*"): "phase",
+        ("key_risks", "*"): "risk",
+    },
+    "reporting": {
+        ("risk_summary", "key_risk_areas", "*"): "risk",
+        ("recommendations", "immediate_actions", "*"): "action",
+    },
+}
+
+_SCALAR = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?|true|false|null")
+
+_WHITESPACE = " \t\r\n"
+
+
+class SchemaViolation(StreamAbort):
+    """The streamed JSON cannot become a valid response; stop paying for it"""
+    pass
+
+
+def _schema_at(schema: Dict[str, Any], path: Tuple[str, ...]) -> Dict[str, Any]:
+    for step in path:
+        schema = schema.get("items", {}) if step == "*" else schema.get("properties", {}).get(step, {})
+    return schema
+
+
+def _label(path: Tuple[str, ...]) -> str:
+    return ".".join(path).replace(".*", "[]") or "$"
+
+
+def _loads(text: str) -> Any:
+    """json.loads with json_repair's local fixes (raw newlines, unknown escapes), as the final validation allows.
+
+    Kept out of the repair stats: items are parsed many times per response.
+    """
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        repaired, truncated = repair_json(text)
+        if repaired is None or truncated:
+            raise
+        return json.loads(repaired)
+
+
+class _Frame:
+    __slots__ = ("kind", "schema", "path", "start", "expect", "key", "count")
+
+    def __init__(self, kind: str, schema: Dict[str, Any], path: Tuple[str, ...], start: int):
+        self.kind = kind
+        self.schema = schema
+        self.path = path
+        self.start = start
+        self.expect = "key|end" if kind == "object" else "value|end"
+        self.key: Optional[str] = None
+        self.count = 0
+
+
+class StreamingValidator:
+    """Consumes completion deltas and validates the JSON object in them as it arrives.
+
+    Prose or a code fence before the object is skipped. Syntax errors and
+    container type mismatches against the schema (an array where the schema
+    wants an object, a string where it wants an array, ...) raise
+    SchemaViolation as soon as the offending character arrives. Everything
+    else (missing fields, wrong scalar types) is fixable and left to the
+    final validation.
+
+    Each item under one of `emit_paths` is validated with its compiled
+    sub-schema when it closes and returned from `on_delta` as an (event, data)
+    pair, so clients see WBS phases and risks while the rest is generated.
+    """
+
+    def __init__(
+        self,
+        schema: Dict[str, Any],
+        emit_paths: Dict[Tuple[str, ...], str],
+        finalize: Callable[[str], Dict[str, Any]]
+    ):
+        """`finalize` is the endpoint's ResponseValidator.validate_* method"""
+        self.schema = schema
+        self.emit_paths = emit_paths
+        self.finalize = finalize
+        self._item_validators = {path: compile_schema(_schema_at(schema, path)) for path in emit_paths}
+        self._text = ""
+        self._offset = 0
+        self._stack: List[_Frame] = []
+        self._mode = "prefix"
+        self._root_start = 0
+        self._escape = False
+        self._key_chars: Optional[List[str]] = None
+        self._scalar_chars: List[str] = []
+        self._events: List[Tuple[str, Dict[str, Any]]] = []
+        self.items_emitted = 0
+        self.complete = False
+        self.violation: Optional[str] = None
+
+    # --- observer interface used by stream_completion ---
+
+    def on_delta(self, delta: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """Consume one delta; returns the items completed by it"""
+        self._text += delta
+        self._events = []
+        for char in delta:
+            self._consume(char)
+            self._offset += 1
+        return self._events
+
+    def on_complete(self, content: str, finish_reason: Optional[str] = None) -> Dict[str, Any]:
+        """Fields for the done frame: the fully validated response"""
+        result = self.finalize(content)
+        return {
+            "status": "success" if result["valid"] else "error",
+            "data": result["data"],
+            "errors": result["errors"],
+            "items_streamed": self.items_emitted
+        }
+
+    # --- parser ---
+
+    def _violation(self, message: str):
+        self.violation = f"{message} at character {self._offset}"
+        raise SchemaViolation(self.violation)
+
+    def _consume(self, char: str):
+        mode = self._mode
+        if mode == "string":
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._mode = "structure"
+                frame = self._stack[-1]
+                if self._key_chars is not None:
+                    raw = "".join(self._key_chars)
+                    try:
+                        frame.key = next(iter(_loads('{"' + raw + '": 0}')))
+                    except json.JSONDecodeError:
+                        self._violation(f"Unreadable key {raw[:20]!r} in {_label(frame.path)}")
+                    self._key_chars = None
+                    frame.expect = "colon"
+                else:
+                    self._value_done()
+                return
+            if self._key_chars is not None:
+                self._key_chars.append(char)
+            return
+
+        if mode == "scalar":
+            if char in _WHITESPACE or char in ",}]":
+                token = "".join(self._scalar_chars)
+                if not _SCALAR.fullmatch(token):
+                    self._violation(f"Invalid literal {token[:20]!r} in {_label(self._value_path())}")
+                self._mode = "structure"
+                self._value_done()
+                self._structure(char)
+            else:
+                self._scalar_chars.append(char)
+            return
+
+        if mode == "structure":
+            self._structure(char)
+        elif mode == "prefix":
+            if char == "{":
+                self._mode = "open"
+                self._root_start = self._offset
+        elif mode == "open":
+            # '{' only opens the response when a key or '}' follows ("{the}" in prose does not)
+            if char in _WHITESPACE:
+                return
+            if char in '"}':
+                self._stack.append(_Frame("object", self.schema, (), self._root_start))
+                self._mode = "structure"
+                self._structure(char)
+            else:
+                self._mode = "prefix"
+                self._consume(char)
+
+    def _structure(self, char: str):
+        if char in _WHITESPACE:
+            return
+        frame = self._stack[-1]
+        expect = frame.expect
+        if expect == "comma|end":
+            if char == ",":
+                frame.expect = "key" if frame.kind == "object" else "value"
+            elif char == ("}" if frame.kind == "object" else "]"):
+                self._close()
+            else:
+                self._violation(f"Expected ',' or closing bracket in {_label(frame.path)}")
+        elif expect in ("key|end", "key"):
+            if char == '"':
+                self._mode = "string"
+                self._key_chars = []
+            elif char == "}" and expect == "key|end":
+                self._close()
+            else:
+                self._violation(f"Expected a quoted key in {_label(frame.path)}")
+        elif expect == "colon":
+            if char != ":":
+                self._violation(f"Expected ':' after key {frame.key!r}")
+            frame.expect = "value"
+        elif char == "]" and expect == "value|end":
+            self._close()
+        else:
+            self._start_value(char)
+
+    def _value_path(self) -> Tuple[str, ...]:
+        frame = self._stack[-1]
+        return frame.path + (frame.key if frame.kind == "object" else "*",)
+
+    def _start_value(self, char: str):
+        frame = self._stack[-1]
+        path = self._value_path()
+        if frame.kind == "object":
+            schema = frame.schema.get("properties", {}).get(frame.key, {})
+        else:
+            schema = frame.schema.get("items", {})
+        expected = schema.get("type")
+
+        if char == "{":
+            actual = "object"
+        elif char == "[":
+            actual = "array"
+        elif char == '"':
+            actual = "string"
+        elif char == "n":
+            actual = None  # null is acceptable anywhere; the fixer fills it
+        elif char == "-" or char.isdigit() or char in "tf":
+            actual = "scalar"
+        else:
+            self._violation(f"Unexpected {char!r} in {_label(path)}")
+        if expected in ("object", "array") and actual is not None and actual != expected:
+            self._violation(f"{_label(path)} must be an {expected}, got {actual}")
+
+        if actual in ("object", "array"):
+            self._stack.append(_Frame(actual, schema, path, self._offset))
+        elif actual == "string":
+            self._mode = "string"
+            self._key_chars = None
+        else:
+            self._mode = "scalar"
+            self._scalar_chars = [char]
+
+    def _value_done(self):
+        frame = self._stack[-1]
+        frame.expect = "comma|end"
+        frame.count += 1
+
+    def _close(self):
+        frame = self._stack.pop()
+        event = self.emit_paths.get(frame.path)
+        if event is not None:
+            try:
+                item = _loads(self._text[frame.start:self._offset + 1])
+            except json.JSONDecodeError as e:
+                self._violation(f"Unparseable item in {_label(frame.path)} ({e.msg})")
+            self.items_emitted += 1
+            self._events.append((event, {
+                "index": self._stack[-1].count,
+                "data": self._item_validators[frame.path](item)
+            }))
+        if self._stack:
+            self._value_done()
+        else:
+            self._mode = "done"
+            self.complete = True
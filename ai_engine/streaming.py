@@ -0,0 +1,212 @@
+# Streaming - forwards OpenAI completion deltas to clients as Server-Sent Events
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+from logger import logger
+from rate_limiter import RateLimiter, rate_limiter
+from resilience import resilient
+from response_cache import ResponseCache, response_cache
+
+# Headers that keep proxies (nginx in front of the frontend) from buffering the stream
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"
+}
+
+
+class StreamAbort(Exception):
+    """Raised by a stream observer to stop generation early"""
+    pass
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one SSE frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _estimated_usage(params: Dict[str, Any], content: str) -> Dict[str, int]:
+    # Roughly four characters per token for English text
+    prompt_chars = sum(len(str(m.get("content", ""))) for m in params.get("messages", []))
+    return {
+        "prompt_tokens": prompt_chars // 4,
+        "completion_tokens": len(content) // 4,
+        "total_tokens": (prompt_chars + len(content)) // 4
+    }
+
+
+async def stream_completion(
+    openai_client,
+    endpoint: str,
+    done_fields: Optional[Dict[str, Any]] = None,
+    observer=None,
+    forward_deltas: bool = True,
+    **params
+) -> AsyncIterator[str]:
+    """Yield `delta` frames as the completion streams in, then one `done` frame.
+
+    The `done` frame carries `tokens_used` (as the non-streaming endpoints
+    return it), time-to-first-token and any `done_fields` from the caller.
+    Streams share response cache entries with the non-streaming endpoint of
+    the same name, so a cached generation is replayed as a single delta.
+
+    An `observer` (see stream_validator.StreamingValidator) sees every delta:
+    `on_delta(text)` returns (event, data) pairs to send as extra frames, and
+    may raise StreamAbort to close the upstream connection and end with an
+    `error` frame (`aborted: true`) instead of paying for the rest of a
+    response that cannot be used. `on_complete(content, finish_reason)` adds
+    fields to the `done` frame. With `forward_deltas=False` only the observer's frames are
+    sent.
+    """
+    done_fields = done_fields or {}
+    start = time.perf_counter()
+
+    cache_key = ResponseCache.make_key(endpoint, params) if response_cache else None
+    if cache_key:
+        cached = await asyncio.to_thread(response_cache.get, cache_key) \
+            if response_cache.sqlite_path else response_cache.get(cache_key)
+        if cached is not None:
+            content = cached["choices"][0]["message"]["content"] or ""
+            if forward_deltas:
+                yield sse_event("delta", {"content": content})
+            if observer is not None:
+                try:
+                    for event, data in observer.on_delta(content):
+                        yield sse_event(event, data)
+                    finish_reason = cached["choices"][0].get("finish_reason") or "stop"
+                    done_fields = {**done_fields, **await asyncio.to_thread(observer.on_complete, content, finish_reason)}
+                except StreamAbort as e:
+                    yield sse_event("error", {"error": str(e), "aborted": True, "chars_received": len(content)})
+                    return
+                except Exception as e:
+                    # The entry may come from the non-streaming endpoint's more tolerant parse
+                    logger.log_error(endpoint, e, {"stream": True, "cached": True})
+                    print(f"Streaming Error ({endpoint}, cached): {str(e)}")
+                    yield sse_event("error", {"error": "AI generation temporarily unavailable"})
+                    return
+            yield sse_event("done", {
+                **done_fields,
+                "tokens_used": (cached.get("usage") or {}).get("total_tokens", 0),
+                "cached": True
+            })
+            return
+
+    model = params.get("model")
+    estimated = RateLimiter.estimate_tokens(params) if rate_limiter else 0
+    parts = []
+    usage = None
+    finish_reason = None
+    ttft_ms = None
+    stream = None
+    released = False
+
+    async def release(actual: Optional[int] = None):
+        """Close the upstream response and settle the token reservation, once.
+
+        Closing the HTTP response stops generation (and billing) upstream;
+        without reported usage the reservation is settled on what arrived.
+        """
+        nonlocal released
+        if released or stream is None:
+            return
+        released = True
+        try:
+            await stream.response.aclose()
+        except Exception as e:
+            print(f"Streaming Error ({endpoint}): closing upstream failed: {str(e)}")
+        if rate_limiter:
+            if actual is None:
+                actual = _estimated_usage(params, "".join(parts))["total_tokens"]
+            await rate_limiter.settle(model, estimated, actual)
+
+    try:
+        try:
+            # Retries only cover opening the stream; once deltas flow there is no replay
+            stream = await resilient.call(
+                endpoint,
+                model,
+                lambda timeout: openai_client.chat.completions.create(
+                    stream=True,
+                    timeout=timeout,
+                    # Ask the API for a trailing usage chunk so the done frame can report tokens_used
+                    extra_body={"stream_options": {"include_usage": True}},
+                    **params
+                ),
+                admit=(lambda: rate_limiter.acquire(endpoint, model, estimated)) if rate_limiter else None,
+                refund=(lambda: rate_limiter.settle(model, estimated, 0)) if rate_limiter else None
+            )
+            async for chunk in stream:
+                chunk_usage = getattr(chunk, "usage", None)
+                if chunk_usage:
+                    usage = chunk_usage if isinstance(chunk_usage, dict) else chunk_usage.model_dump()
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+                delta = choice.delta.content if choice.delta else None
+                if delta:
+                    if ttft_ms is None:
+                        ttft_ms = round((time.perf_counter() - start) * 1000, 2)
+                    parts.append(delta)
+                    if forward_deltas:
+                        yield sse_event("delta", {"content": delta})
+                    if observer is not None:
+                        for event, data in observer.on_delta(delta):
+                            yield sse_event(event, data)
+        except StreamAbort as e:
+            await release()
+            content = "".join(parts)
+            logger.log_timing(endpoint, {"ttft_ms": ttft_ms, "stream_total_ms": round((time.perf_counter() - start) * 1000, 2)})
+            logger.log_error(endpoint, e, {"stream": True, "aborted_at_chars": len(content)})
+            print(f"Streaming aborted ({endpoint}): {str(e)}")
+            yield sse_event("error", {"error": str(e), "aborted": True, "chars_received": len(content)})
+            return
+        except Exception as e:
+            await release()
+            logger.log_error(endpoint, e, {"stream": True})
+            print(f"Streaming Error ({endpoint}): {str(e)}")
+            yield sse_event("error", {"error": "AI generation temporarily unavailable"})
+            return
+
+        content = "".join(parts)
+        tokens_estimated = usage is None
+        if tokens_estimated:
+            usage = _estimated_usage(params, content)
+
+        await release(usage.get("total_tokens"))
+    finally:
+        # A client disconnect ends the generator at a yield (GeneratorExit or CancelledError)
+        await release()
+
+    total_ms = round((time.perf_counter() - start) * 1000, 2)
+    logger.log_timing(endpoint, {"ttft_ms": ttft_ms, "stream_total_ms": total_ms})
+
+    if cache_key and finish_reason == "stop":
+        payload = {
+            "id": f"stream-{cache_key[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": params.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": finish_reason
+            }],
+            "usage": usage
+        }
+        if response_cache.sqlite_path:
+            await asyncio.to_thread(response_cache.set, cache_key, payload)
+        else:
+            response_cache.set(cache_key, payload)
+
+    if observer is not None:
+        done_fields = {**done_fields, **await asyncio.to_thread(observer.on_complete, content, finish_reason)}
+
+    yield sse_event("done", {
+        **done_fields,
+        "tokens_used": usage.get("total_tokens", 0),
+        "tokens_estimated": tokens_estimated,
+        "ttft_ms": ttft_ms
+    })
@@ -0,0 +1,254 @@
+# Token budget - counts prompt tokens and shrinks project payloads to fit an input budget
+import copy
+import os
+import threading
+from datetime import date
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Tuple
+
+from logger import logger
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to a character heuristic
+    tiktoken = None
+
+# Context window per model family (longest prefix wins)
+CONTEXT_WINDOWS = {
+    "gpt-4o": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4-1106": 128000,
+    "gpt-4-32k": 32768,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo-16k": 16385,
+    "gpt-3.5-turbo": 16385,
+}
+
+# Tokens kept free for the system prompt and instruction text around the payload
+RESERVED_PROMPT_TOKENS = 1000
+
+# Relative value of top-level project fields to the model (higher is kept longer).
+# Names follow the backend schema: projects, tasks, milestones, risks, issues, resources.
+FIELD_IMPORTANCE = {
+    "title": 100, "name": 100, "status": 95, "risk_score": 90, "progress": 90,
+    "start_date": 85, "end_date": 85, "due_date": 85,
+    "budgeted_amount": 80, "spent_amount": 80, "currency_code": 75, "budget": 80,
+    "milestones": 70, "risks": 70, "issues": 65, "tasks": 60,
+    "client": 55, "description": 50, "resources": 45, "team": 45,
+    "changes": 40, "id": 30, "user_id": 10, "notes": 20, "comments": 15,
+    "created_at": 10, "updated_at": 10, "files": 5, "attachments": 5,
+}
+DEFAULT_IMPORTANCE = 35
+
+# Record statuses that mean "nothing left to do"
+CLOSED_STATUSES = {"completed", "complete", "done", "closed", "resolved", "cancelled"}
+
+
+@lru_cache(maxsize=16)
+def _encoding_for(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        try:
+            return tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            return None
+
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    """Token count for `text` under `model`'s tokenizer (heuristic without tiktoken)"""
+    encoding = _encoding_for(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # Roughly four characters per token for English text and JSON
+    return (len(text) + 3) // 4
+
+
+def count_message_tokens(messages: List[Dict[str, str]], model: str = "gpt-4") -> int:
+    """Token count for a chat messages list, including per-message framing"""
+    return sum(count_tokens(str(m.get("content", "")), model) + 4 for m in messages) + 3
+
+
+def context_window(model: str) -> int:
+    for prefix in sorted(CONTEXT_WINDOWS, key=len, reverse=True):
+        if model.startswith(prefix):
+            return CONTEXT_WINDOWS[prefix]
+    return 8192
+
+
+def _is_open(record: Dict[str, Any]) -> bool:
+    status = str(record.get("status") or "").lower()
+    if status in CLOSED_STATUSES:
+        return False
+    progress = record.get("progress")
+    return not (isinstance(progress, (int, float)) and progress >= 100)
+
+
+def _record_priority(record: Any, today: str) -> tuple:
+    """Sort key: open and overdue first, then soonest due, then highest risk"""
+    if not isinstance(record, dict):
+        return (1, 1, "", 0)
+    due = str(record.get("due_date") or record.get("target_date") or "9999-12-31")
+    is_open = _is_open(record)
+    overdue = is_open and due < today
+    risk = record.get("risk_score") if isinstance(record.get("risk_score"), (int, float)) else 0
+    return (0 if is_open else 1, 0 if overdue else 1, due, -risk)
+
+
+def summarize_records(records: list, keep: int) -> Dict[str, Any]:
+    """Replace a list of records with counts, averages and the `keep` most relevant items"""
+    today = date.today().isoformat()
+    summary: Dict[str, Any] = {"count": len(records)}
+
+    dict_records = [r for r in records if isinstance(r, dict)]
+    if dict_records:
+        open_records = [r for r in dict_records if _is_open(r)]
+        summary["open"] = len(open_records)
+        summary["overdue"] = sum(
+            1 for r in open_records
+            if str(r.get("due_date") or r.get("target_date") or "9999-12-31") < today
+        )
+        by_status: Dict[str, int] = {}
+        for r in dict_records:
+            if r.get("status") is not None:
+                by_status[str(r["status"])] = by_status.get(str(r["status"]), 0) + 1
+        if by_status:
+            summary["by_status"] = by_status
+        progress = [r["progress"] for r in dict_records if isinstance(r.get("progress"), (int, float))]
+        if progress:
+            summary["avg_progress"] = round(sum(progress) / len(progress), 1)
+
+    if keep > 0:
+        ranked = sorted(records, key=lambda r: _record_priority(r, today))
+        summary["most_relevant"] = ranked[:keep]
+    summary["omitted"] = len(records) - min(keep, len(records))
+    return summary
+
+
+def _truncate(value: str, limit: int) -> str:
+    return value if len(value) <= limit else value[:limit] + "..."
+
+
+class TokenBudgeter:
+    """Fits project payloads into an input token budget by degrading the
+    lowest-value fields first: summarize long lists, truncate long text,
+    shrink summaries further, and finally drop fields.
+    """
+
+    # (action, argument) steps applied field by field, least important field first
+    REDUCTION_STEPS = [
+        ("summarize", 20),
+        ("truncate", 400),
+        ("summarize", 5),
+        ("truncate", 120),
+        ("summarize", 0),
+        ("drop", None),
+    ]
+
+    def __init__(self, default_budget: int = None):
+        self.default_budget = default_budget or int(os.getenv("PROMPT_INPUT_TOKEN_BUDGET", "3000"))
+        self._stats: Dict[str, Dict[str, int]] = {}
+        # fit runs in worker threads (asyncio.to_thread)
+        self._lock = threading.Lock()
+
+    def budget_for(self, model: str, max_tokens: int) -> int:
+        """Configured budget, capped by what the model's context window leaves free"""
+        available = context_window(model) - max_tokens - RESERVED_PROMPT_TOKENS
+        return max(256, min(self.default_budget, available))
+
+    def fit(
+        self,
+        data: Dict[str, Any],
+        model: str,
+        max_tokens: int,
+        endpoint: str,
+        serialize: Callable[[Any], str] = str
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Return (payload that fits the budget, report with before/after token counts)"""
+        budget = self.budget_for(model, max_tokens)
+        tokens_before = count_tokens(serialize(data), model)
+        report = {
+            "budget": budget,
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_before,
+            "summarized": [],
+            "truncated": [],
+            "dropped": []
+        }
+
+        fitted = data
+        if tokens_before > budget and isinstance(data, dict):
+            fitted = copy.deepcopy(data)
+            fields = sorted(fitted.keys(), key=lambda k: FIELD_IMPORTANCE.get(k, DEFAULT_IMPORTANCE))
+            tokens = tokens_before
+            for action, arg in self.REDUCTION_STEPS:
+                for field in fields:
+                    if field not in fitted:
+                        continue
+                    if not self._reduce(fitted, field, action, arg, report):
+                        continue
+                    tokens = count_tokens(serialize(fitted), model)
+                    if tokens <= budget:
+                        break
+                if tokens <= budget:
+                    break
+            report["tokens_after"] = tokens
+
+        self._record(endpoint, report)
+        logger.log_tokens(endpoint, report)
+        return fitted, report
+
+    @staticmethod
+    def _reduce(data: Dict[str, Any], field: str, action: str, arg: Any, report: Dict[str, Any]) -> bool:
+        """Apply one reduction step to a field; returns False when it does not apply"""
+        value = data[field]
+        if action == "summarize":
+            if isinstance(value, list) and len(value) > arg:
+                data[field] = summarize_records(value, arg)
+            elif isinstance(value, dict) and "most_relevant" in value and len(value["most_relevant"]) > arg:
+                value["most_relevant"] = value["most_relevant"][:arg]
+                value["omitted"] = value["count"] - arg
+                if not arg:
+                    del value["most_relevant"]
+            else:
+                return False
+            if field not in report["summarized"]:
+                report["summarized"].append(field)
+            return True
+        if action == "truncate":
+            if isinstance(value, str) and len(value) > arg:
+                data[field] = _truncate(value, arg)
+                if field not in report["truncated"]:
+                    report["truncated"].append(field)
+                return True
+            return False
+        if action == "drop":
+            # Identity fields are what the model needs to name the project; keep them
+            if FIELD_IMPORTANCE.get(field, DEFAULT_IMPORTANCE) >= 95:
+                return False
+            del data[field]
+            report["dropped"].append(field)
+            return True
+        return False
+
+    def _record(self, endpoint: str, report: Dict[str, Any]):
+        with self._lock:
+            stats = self._stats.setdefault(
+                endpoint,
+                {"requests": 0, "reduced": 0, "tokens_before": 0, "tokens_after": 0}
+            )
+            stats["requests"] += 1
+            stats["reduced"] += int(report["tokens_after"] < report["tokens_before"])
+            stats["tokens_before"] += report["tokens_before"]
+            stats["tokens_after"] += report["tokens_after"]
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Cumulative before/after token counts per endpoint"""
+        with self._lock:
+            return {endpoint: dict(s) for endpoint, s in self._stats.items()}
+
+
+# Global budgeter shared by the endpoints
+token_budgeter = TokenBudgeter()
@@ -1,9 +1,21 @@
 # Output validation for AI responses
 import json
 import re
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from datetime import datetime
 
+import numpy as np
+
+from json_repair import loads_tolerant
+from schema_compiler import Validator, compile_schema
+
+# A JSON object opens with '{' then a key or '}' ("{the}" in prose does not qualify)
+_OBJECT_START = re.compile(r'\{\s*["}]')
+
+# Opening code fence (optionally tagged json) directly followed by an object
+_FENCED_OBJECT = re.compile(r'```(?:json|JSON)?\s*(?=\{\s*["}])')
+
+
 class ResponseValidator:
     """Validates AI responses with schema checking and auto-fill"""
     
@@ -181,101 +193,106 @@ class ResponseValidator:
     
     @staticmethod
     def extract_json(text: str) -> Optional[str]:
-        """Extract JSON from text response"""
-        # Try to find JSON block
-        json_match = re.search(r'\{[\s\S]*\}', text)
-        if json_match:
-            return json_match.group(0)
-        
-        # Try code block
-        json_match = re.search(r'```json\s*(\{[\s\S]*\})\s*```', text)
-        if json_match:
-            return json_match.group(1)
+        """Extract the outermost JSON object from a response in one linear pass.
+
+        Preference order: the whole text when it already is an object, the
+        first fenced code block holding one, then the first object in the
+        text. Braces and quotes inside JSON strings are skipped.
+        """
+        if not text:
+            return None
         
-        json_match = re.search(r'```\s*(\{[\s\S]*\})\s*```', text)
-        if json_match:
-            return json_match.group(1)
+        # Fast path: bare JSON (response_format=json_object and most replies)
+        start = len(text) - len(text.lstrip())
+        if text.startswith("{", start):
+            end = ResponseValidator._object_end(text, start)
+            if end is not None:
+                return text[start:end]
         
-        return None
+        # Fenced block (```json ... ``` or ``` ... ```), else the first object
+        # in surrounding prose. If it never closes, every later candidate is
+        # nested inside it, so a truncated reply yields None rather than one
+        # of its inner objects.
+        fence = _FENCED_OBJECT.search(text)
+        start = fence.end() if fence else None
+        if start is None:
+            candidate = _OBJECT_START.search(text)
+            if not candidate:
+                return None
+            start = candidate.start()
+        end = ResponseValidator._object_end(text, start)
+        return text[start:end] if end is not None else None
     
     @staticmethod
-    def validate_and_fix(response_data: Dict[str, Any], schema: Dict) -> Dict[str, Any]:
-        """Validate response against schema and auto-fix missing fields"""
-        validated = response_data.copy()
-        
-        # Ensure required top-level fields exist
-        for field in schema.get("required", []):
-            if field not in validated:
-                validated[field] = ResponseValidator._get_default_value(
-                    schema["properties"][field]
-                )
-        
-        # Recursively validate nested structures
-        for key, value in validated.items():
-            if key in schema.get("properties", {}):
-                validated[key] = ResponseValidator._validate_field(
-                    value,
-                    schema["properties"][key]
-                )
-        
-        return validated
+    def parse_json(response_text: str) -> Any:
+        """Parse the JSON object in a response.
+
+        Malformed JSON goes through json_repair's local tier. Raises
+        JSONDecodeError if repair fails too, and TruncatedJSONError (a
+        JSONDecodeError) for a reply cut off before its object closed, so
+        the pipeline's re-ask tier gets it instead of a partial object.
+        """
+        json_str = ResponseValidator.extract_json(response_text)
+        if json_str is None:
+            if not response_text or "{" not in response_text:
+                raise ValueError("No JSON found in response")
+            json_str = response_text
+        return loads_tolerant(json_str)
     
     @staticmethod
-    def _validate_field(value: Any, field_schema: Dict) -> Any:
-        """Validate and fix a single field"""
-        field_type = field_schema.get("type")
-        
-        if field_type == "object":
-            result = value if isinstance(value, dict) else {}
-            for subfield in field_schema.get("required", []):
-                if subfield not in result:
-                    result[subfield] = ResponseValidator._get_default_value(
-                        field_schema.get("properties", {}).get(subfield, {})
-                    )
-            return result
-        
-        elif field_type == "array":
-            if not isinstance(value, list):
-                return []
-            return [
-                ResponseValidator._validate_field(item, field_schema.get("items", {}))
-                for item in value
-            ]
-        
-        elif field_type == "string":
-            return str(value) if value is not None else ""
-        
-        elif field_type == "number":
-            return float(value) if value is not None else 0
+    def _object_end(text: str, start: int) -> Optional[int]:
+        """Index just past the brace closing the object opened at `start`, or None.
+
+        Vectorized scan over the UTF-8 bytes (quotes and braces are ASCII, so
+        they never occur inside a multi-byte character): a quote toggles string
+        state unless an odd run of backslashes precedes it, braces outside
+        strings move the depth, and the object ends where the depth first
+        returns to zero.
+        """
+        raw = text[start:].encode("utf-8")
+        codes = np.frombuffer(raw, dtype=np.uint8)
+        quote = codes == 34
+        # Measure the backslash run before each candidate escaped quote,
+        # one step back per iteration (runs are rarely longer than two)
+        escaped = np.flatnonzero(quote[1:] & (codes[:-1] == 92)) + 1
+        run = np.ones(escaped.size, dtype=np.int64)
+        active = np.arange(escaped.size)
+        while active.size:
+            before = escaped[active] - run[active] - 1
+            active = active[before >= 0]
+            active = active[codes[before[before >= 0]] == 92]
+            run[active] += 1
+        quote[escaped[run % 2 == 1]] = False
         
-        return value
+        structural = np.flatnonzero(quote | (codes == 123) | (codes == 125))
+        symbols = codes[structural]
+        in_string = np.logical_xor.accumulate(symbols == 34)
+        depth = np.cumsum(((symbols == 123).view(np.int8) - (symbols == 125).view(np.int8)) * ~in_string,
+                          dtype=np.int32)
+        closed = depth == 0
+        if not closed.any():
+            # Unbalanced (or ends inside an unterminated string): truncated output
+            return None
+        end = int(structural[closed.argmax()]) + 1
+        return start + (end if text.isascii() else len(raw[:end].decode("utf-8")))
     
     @staticmethod
-    def _get_default_value(field_schema: Dict) -> Any:
-        """Get default value for a field based on schema"""
-        field_type = field_schema.get("type")
-        
-        if field_type == "object":
-            return {}
-        elif field_type == "array":
-            return []
-        elif field_type == "string":
-            return ""
-        elif field_type == "number":
-            return 0
-        return None
+    def validate_and_fix(response_data: Dict[str, Any], schema: Dict) -> Dict[str, Any]:
+        """Validate response against schema and auto-fix missing fields"""
+        if not isinstance(response_data, dict):
+            raise ValueError("Expected a JSON object")
+        compiled = _COMPILED.get(id(schema))
+        if compiled is not None and compiled[0] is schema:
+            return compiled[1](response_data)
+        # Other schemas are compiled per call: a temporary dict's id can be reused
+        return compile_schema(schema)(response_data)
     
     @staticmethod
     def validate_project_setup(response_text: str) -> Dict[str, Any]:
         """Validate project setup response"""
         try:
-            # Extract JSON from response
-            json_str = ResponseValidator.extract_json(response_text)
-            if not json_str:
-                raise ValueError("No JSON found in response")
-            
-            # Parse JSON
-            response_data = json.loads(json_str)
+            # Extract and parse JSON (repairing it locally if needed)
+            response_data = ResponseValidator.parse_json(response_text)
             
             # Validate and fix
             validated = ResponseValidator.validate_and_fix(
@@ -305,13 +322,8 @@ class ResponseValidator:
     def validate_risk_analysis(response_text: str) -> Dict[str, Any]:
         """Validate risk analysis response"""
         try:
-            # Extract JSON from response
-            json_str = ResponseValidator.extract_json(response_text)
-            if not json_str:
-                raise ValueError("No JSON found in response")
-            
-            # Parse JSON
-            response_data = json.loads(json_str)
+            # Extract and parse JSON (repairing it locally if needed)
+            response_data = ResponseValidator.parse_json(response_text)
             
             # Validate and fix
             validated = ResponseValidator.validate_and_fix(
@@ -454,13 +466,8 @@ class ResponseValidator:
     def validate_reporting(response_text: str) -> Dict[str, Any]:
         """Validate reporting/risk analysis response"""
         try:
-            # Extract JSON from response
-            json_str = ResponseValidator.extract_json(response_text)
-            if not json_str:
-                raise ValueError("No JSON found in response")
-            
-            # Parse JSON
-            response_data = json.loads(json_str)
+            # Extract and parse JSON (repairing it locally if needed)
+            response_data = ResponseValidator.parse_json(response_text)
             
             # Validate and fix
             validated = ResponseValidator.validate_and_fix(
@@ -590,8 +597,8 @@ class ResponseValidator:
             
             json_str = json_match.group(1).strip()
             
-            # Parse JSON
-            response_data = json.loads(json_str)
+            # Parse JSON (repairing it locally if needed)
+            response_data = loads_tolerant(json_str)
             
             # Validate and fix
             validated = ResponseValidator.validate_and_fix(
@@ -620,3 +627,55 @@ class ResponseValidator:
                 "errors": [f"Validation error: {str(e)}"]
             }
 
+    
+    # JSON Schema for /analyze-risk responses
+    ANALYZE_RISK_SCHEMA = {
+        "type": "object",
+        "required": ["risk_score", "risk_summary", "recommendations"],
+        "properties": {
+            "risk_score": {"type": "integer", "minimum": 0, "maximum": 100},
+            "risk_summary": {"type": "string"},
+            "risk_categories": {
+                "type": "object",
+                "properties": {
+                    "schedule": {"type": "number"},
+                    "budget": {"type": "number"},
+                    "resource": {"type": "number"},
+                    "technical": {"type": "number"},
+                    "stakeholder": {"type": "number"}
+                }
+            },
+            "recommendations": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "action": {"type": "string"},
+                        "priority": {"type": "string", "enum": ["high", "medium", "low"]}
+                    }
+                }
+            },
+            "predictive_insights": {
+                "type": "object",
+                "properties": {
+                    "trend": {"type": "string", "enum": ["increasing", "stable", "decreasing"]},
+                    "predicted_risks": {"type": "array", "items": {"type": "string"}},
+                    "early_warnings": {"type": "array", "items": {"type": "string"}}
+                }
+            }
+        }
+    }
+
+
+# Response schemas compiled once at import, keyed by schema identity (the
+# schema is kept next to its validator so a lookup can confirm the match)
+_COMPILED: Dict[int, Tuple[Dict[str, Any], Validator]] = {
+    id(schema): (schema, compile_schema(schema))
+    for schema in (
+        ResponseValidator.RISK_ANALYSIS_SCHEMA,
+        ResponseValidator.PROJECT_SETUP_SCHEMA,
+        ResponseValidator.REPORTING_SCHEMA,
+        ResponseValidator.PMO_REPORT_SCHEMA,
+        ResponseValidator.ANALYZE_RISK_SCHEMA
+    )
+}
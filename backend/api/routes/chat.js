@@ -156,8 +156,11 @@ router.post('/chat', authenticateToken, async (req, res) => {
         {
           message,
           conversation_history: conversationHistory,
+          conversation_id: convId,
           project_context: projectContext,
-          language
+          language,
+          // Namespace for the engine's semantic cache: answers are never shared between users
+          tenant: `user:${userId}`
         },
         {
           headers: {